@@ -0,0 +1,102 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+
+"""
+This file contains the support for the generation of variants from asyncio code:
+ the delta execution, which is CPU-bound, is done in an executor (by default, the one of the event loop),
+ the number of generations running at the same time can be bounded,
+ and the concurrent requests for the same product share the same generation.
+It is used by the `agenerate` method of SPLs and the `aget_variant` method of MPLs.
+"""
+
+import asyncio
+import weakref
+
+
+class async_generator__c(object):
+  """Runs functions in an executor from asyncio code, with a concurrency limit, timeouts, and the sharing of concurrent identical requests.
+This class can be used from several event loops (e.g., successive calls to `asyncio.run`):
+ the concurrency limit and the sharing of identical requests apply to the requests of the same event loop.
+  """
+  __slots__ = (
+    "m_executor",   # concurrent.futures.Executor | None: the executor running the functions (None for the default one of the event loop)
+    "m_limit",      # int | None: the maximal number of functions running at the same time
+    "m_timeout",    # float | None: the default timeout of the requests, in seconds
+    "m_semaphores", # WeakKeyDictionary[event loop -> asyncio.Semaphore]: the semaphores enforcing the concurrency limit in every event loop
+    "m_inflight",   # dict[(event loop, object) -> list[asyncio.Task, int]]: the running requests with their number of waiters
+  )
+  def __init__(self, executor=None, max_concurrency=None, timeout=None):
+    """async_generator__c(concurrent.futures.Executor, int, float) -> async_generator__c"""
+    if((max_concurrency is not None) and (max_concurrency < 1)):
+      raise ValueError(f"ERROR: the concurrency limit must be at least 1 (found {max_concurrency})")
+    self.m_executor = executor
+    self.m_limit = max_concurrency
+    self.m_timeout = timeout
+    self.m_semaphores = weakref.WeakKeyDictionary()
+    self.m_inflight = {}
+
+  @property
+  def nb_inflight(self):
+    """The number of requests being processed"""
+    return len(self.m_inflight)
+
+  async def run(self, f, key=None, timeout=None):
+    """run(callable, object, float) -> object
+Returns the result of `f()`, computed in the executor.
+If `key` is not None, concurrent requests with the same key share the same computation of `f`.
+The request raises asyncio.TimeoutError after `timeout` seconds (by default, the timeout given at construction).
+Cancelling a request, or its timeout, does not impact the other requests sharing the same computation;
+ the computation is cancelled only when none of its requests is waiting for it anymore
+ (a function that already started in the executor runs to completion, and its result is discarded).
+    """
+    if(key is not None):
+      key = (asyncio.get_running_loop(), key)
+    entry = None if(key is None) else self.m_inflight.get(key)
+    if(entry is None):
+      entry = [asyncio.ensure_future(self._run__(f)), 0]
+      if(key is not None):
+        self.m_inflight[key] = entry
+        entry[0].add_done_callback(lambda _: self._done__(key, entry))
+    task = entry[0]
+    entry[1] += 1
+    try:
+      return await asyncio.wait_for(asyncio.shield(task), (self.m_timeout if(timeout is None) else timeout))
+    finally:
+      entry[1] -= 1
+      if((entry[1] == 0) and (not task.done())):
+        task.cancel()
+        self._done__(key, entry)
+
+  async def _run__(self, f):
+    loop = asyncio.get_running_loop()
+    if(self.m_limit is None):
+      return await loop.run_in_executor(self.m_executor, f)
+    semaphore = self.m_semaphores.get(loop)
+    if(semaphore is None):
+      semaphore = asyncio.Semaphore(self.m_limit)
+      self.m_semaphores[loop] = semaphore
+    async with semaphore:
+      return await loop.run_in_executor(self.m_executor, f)
+
+  def _done__(self, key, entry):
+    if((key is not None) and (self.m_inflight.get(key) is entry)):
+      del self.m_inflight[key]
@@ -0,0 +1,245 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+#
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+"""
+This file contains an API and a command line tool for the validation of large sets of configurations.
+Configurations are read as a stream from a CSV or a JSONL file (one configuration per row),
+ and each of them is linked to a feature model, optionally closed, and validated.
+Validation can be spread over a pool of processes, each of them receiving the feature model only once, at its creation.
+The results are produced in completion order, and the memory used by the input and output is bounded.
+
+Usage of the command line tool:
+  python -m pydop.bulk module:fm input.jsonl -o output.jsonl -j 8
+where `module:fm` is the importable path of a feature model (or of a function returning a feature model).
+"""
+
+import os
+import sys
+import csv
+import json
+import argparse
+import concurrent.futures
+
+from pydop.fm_configuration import make_configuration
+from pydop.utils import imap_bounded, import_object, enumerate_chunks
+
+
+################################################################################
+# configuration readers
+################################################################################
+
+def _parse_csv_value__(value):
+  """_parse_csv_value__(str) -> object
+Converts the content of a CSV cell into a configuration value (booleans, numbers and JSON lists are recognized)
+  """
+  tmp = value.strip()
+  lower = tmp.lower()
+  if(lower == "true"): return True
+  elif(lower == "false"): return False
+  try: return int(tmp)
+  except ValueError: pass
+  try: return float(tmp)
+  except ValueError: pass
+  if(tmp.startswith('[')):
+    try: return json.loads(tmp)
+    except ValueError: pass
+  return value
+
+def read_csv(stream):
+  """read_csv(file) -> iterator[dict]
+Yields the configurations stored in a CSV stream:
+ the first row gives the variable names, and each following row is a configuration, where empty cells are ignored
+  """
+  for row in csv.DictReader(stream):
+    yield {key: _parse_csv_value__(value) for key, value in row.items() if((key is not None) and (value is not None) and value.strip())}
+
+class invalid_row__c(object):
+  """A row of an input stream that does not describe a configuration (reported as invalid by `validate_configuration`)"""
+  __slots__ = ("m_error",) # str: the reason why the row is invalid
+  def __init__(self, error):
+    self.m_error = error
+
+def read_jsonl(stream):
+  """read_jsonl(file) -> iterator[dict | invalid_row__c]
+Yields the configurations stored in a JSONL stream:
+ each non-empty line is either a JSON object mapping variable names to values, or a JSON list of selected feature names.
+The lines that are not valid JSON or that do not describe a configuration are yielded as `invalid_row__c` objects,
+ so they are reported as invalid without stopping the stream.
+  """
+  for lineno, line in enumerate(stream, 1):
+    line = line.strip()
+    if(line):
+      try:
+        yield make_configuration(None, json.loads(line))
+      except (ValueError, TypeError) as e:
+        yield invalid_row__c(f"ERROR: line {lineno} does not describe a configuration ({e})")
+
+def read_configurations(stream, fmt):
+  """read_configurations(file, str) -> iterator[dict]
+Yields the configurations stored in the stream, with `fmt` being either "csv" or "jsonl"
+  """
+  if(fmt == "csv"): return read_csv(stream)
+  elif(fmt == "jsonl"): return read_jsonl(stream)
+  else: raise ValueError(f"ERROR: unknown configuration format \"{fmt}\" (expected \"csv\" or \"jsonl\")")
+
+
+################################################################################
+# validation
+################################################################################
+
+def load_fm(spec):
+  """load_fm(str) -> feature model
+Loads a feature model from its importable path "module:name".
+If the loaded object is a function, it is called without arguments to get the feature model.
+The feature model is checked before being returned.
+  """
+  res = import_object(spec)
+  if(callable(res) and (not hasattr(res, "close_configuration"))):
+    res = res()
+  errors = res.check()
+  if(bool(errors)):
+    raise ValueError(errors)
+  return res
+
+
+def validate_configuration(fm, conf, close=True, product=False, max_reasons=None):
+  """validate_configuration(FM, dict, bool, bool, int) -> dict
+Links the configuration to the checked feature model, closes it if `close` is True, and validates it.
+The reason why a configuration is not valid is rendered on at most `max_reasons` lines (None for no limit).
+Returns a dictionary with the following entries:
+  "valid": if the configuration is a valid product
+  "errors": (if any) the linking errors, or the reason why the configuration is not valid
+  "product": (if `product` is True and the configuration is valid) the product, as returned by `fm.export_configuration`
+  """
+  if(isinstance(conf, invalid_row__c)):
+    return {"valid": False, "errors": conf.m_error}
+  try:
+    if(close): conf, errors = fm.close_configuration(conf)
+    else: conf, errors = fm.link_configuration(conf)
+  except (KeyError, ValueError, TypeError) as e:
+    return {"valid": False, "errors": str(e)}
+  if(bool(errors)):
+    return {"valid": False, "errors": str(errors)}
+  res = fm(conf)
+  if(bool(res)):
+    if(product):
+      return {"valid": True, "product": fm.export_configuration(conf)}
+    return {"valid": True}
+  else:
+    return {"valid": False, "errors": "\n".join(res.m_reason.render(max_items=max_reasons))}
+
+
+def _validate_chunk__(fm, chunk, close, product, max_reasons):
+  res = []
+  for idx, conf in chunk:
+    tmp = validate_configuration(fm, conf, close, product, max_reasons)
+    tmp["index"] = idx
+    res.append(tmp)
+  return res
+
+## worker side: the feature model is set once per process
+
+_worker_fm__ = None
+
+def _worker_init__(fm):
+  global _worker_fm__
+  if(isinstance(fm, str)):
+    fm = load_fm(fm)
+  _worker_fm__ = fm
+
+def _worker_validate_chunk__(args):
+  global _worker_fm__
+  chunk, close, product, max_reasons = args
+  return _validate_chunk__(_worker_fm__, chunk, close, product, max_reasons)
+
+
+def validate_stream(fm, configurations, close=True, product=False, workers=None, chunksize=256, max_pending=None, max_reasons=None):
+  """validate_stream(FM | str, iterable[dict], bool, bool, int, int, int, int) -> iterator[dict]
+Validates a stream of configurations and yields the results (see `validate_configuration`) in completion order;
+ every result has an additional "index" entry, giving the position of its configuration in the input stream.
+Parameters:
+  fm: the checked feature model, or its importable path "module:name" (see `load_fm`)
+  configurations: the stream of configurations
+  close: if the configurations must be closed before validation
+  product: if the results must contain the products
+  workers: the number of worker processes (None means the number of CPUs, and 0 means no worker process)
+  chunksize: the number of configurations sent at once to a worker
+  max_pending: the maximal number of chunks being validated or waiting for validation (by default, twice the number of workers)
+  max_reasons: the maximal number of lines of the reason of an invalid configuration (None for no limit)
+  """
+  chunks = enumerate_chunks(configurations, chunksize)
+  if(workers == 0):
+    if(isinstance(fm, str)):
+      fm = load_fm(fm)
+    for chunk in chunks:
+      yield from _validate_chunk__(fm, chunk, close, product, max_reasons)
+  else:
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_worker_init__, initargs=(fm,)) as executor:
+      if(max_pending is None):
+        max_pending = 2 * (workers or os.cpu_count() or 1)
+      tasks = ((chunk, close, product, max_reasons) for chunk in chunks)
+      for results in imap_bounded(executor, _worker_validate_chunk__, tasks, max_pending):
+        yield from results
+
+
+################################################################################
+# command line tool
+################################################################################
+
+def _format_of__(path, fmt):
+  if(fmt is not None): return fmt
+  elif(path.endswith(".csv")): return "csv"
+  else: return "jsonl"
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog="python -m pydop.bulk", description="Validates a stream of configurations against a feature model.")
+  parser.add_argument("fm", help="importable path \"module:name\" of the feature model (or of a function returning it)")
+  parser.add_argument("input", help="the CSV or JSONL file containing the configurations (\"-\" for the standard input)")
+  parser.add_argument("-o", "--output", default="-", help="the JSONL file where the results are written (\"-\" for the standard output)")
+  parser.add_argument("-f", "--format", choices=("csv", "jsonl"), default=None, help="the format of the input (by default, guessed from its extension)")
+  parser.add_argument("-j", "--workers", type=int, default=None, help="the number of worker processes (0 to validate in the main process)")
+  parser.add_argument("--chunksize", type=int, default=256, help="the number of configurations sent at once to a worker")
+  parser.add_argument("--no-close", action="store_true", help="do not close the configurations before validating them")
+  parser.add_argument("--product", action="store_true", help="include the closed product of every valid configuration in the results")
+  parser.add_argument("--max-reasons", type=int, default=None, help="the maximal number of lines of the reason of an invalid configuration")
+  args = parser.parse_args(argv)
+
+  fmt = _format_of__(args.input, args.format)
+  f_in  = sys.stdin if(args.input == "-") else open(args.input, newline='')
+  f_out = sys.stdout if(args.output == "-") else open(args.output, 'w')
+  nb_valid = 0
+  nb_invalid = 0
+  try:
+    configurations = read_configurations(f_in, fmt)
+    for res in validate_stream(args.fm, configurations, not args.no_close, args.product, args.workers, args.chunksize, max_reasons=args.max_reasons):
+      if(res["valid"]): nb_valid += 1
+      else: nb_invalid += 1
+      f_out.write(json.dumps(res, default=str))
+      f_out.write("\n")
+  finally:
+    if(f_in is not sys.stdin): f_in.close()
+    if(f_out is not sys.stdout): f_out.close()
+  print(f"{nb_valid} valid, {nb_invalid} invalid", file=sys.stderr)
+  return (0 if(nb_invalid == 0) else 1)
+
+
+if(__name__ == '__main__'):
+  sys.exit(main())
@@ -0,0 +1,501 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+
+"""
+This file contains the caches used to store the intermediate results of variant generation (e.g., the delta execution plans of products),
+ the caches used to store generated variants in memory, with different eviction policies
+ (least recently used, least frequently used, time to live, and total size),
+ and the persistent cache used to store generated variants across executions.
+All the in-memory caches have the same API (`get`, `put`, `remove`, `clear`, `hits` and `misses`), and can be used by several threads at the same time.
+The persistent cache maps string keys to bytes with the same API, and can be shared by several processes:
+ it is the default backend of the cache shared by the processes using an MPL (see `mpl.MPL.set_shared_cache`).
+"""
+
+import os
+import sys
+import time
+import types
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+from pydop.utils import _empty__
+
+
+class lru_cache__c(object):
+  """Mapping with a bounded number of entries: when full, adding an entry removes the least recently used one.
+A maximal size of None means no bound, and a maximal size of 0 disables the cache.
+The cache can be used by several threads at the same time.
+  """
+  __slots__ = ("m_content", "m_maxsize", "m_hits", "m_misses", "m_lock",)
+  def __init__(self, maxsize=128):
+    """lru_cache__c(int | None) -> lru_cache__c"""
+    self.m_content = OrderedDict()
+    self.m_maxsize = maxsize
+    self.m_hits = 0
+    self.m_misses = 0
+    self.m_lock = threading.Lock()
+
+  @property
+  def maxsize(self): return self.m_maxsize
+  @property
+  def hits(self): return self.m_hits
+  @property
+  def misses(self): return self.m_misses
+
+  def get(self, key, default=None):
+    """get(object, object) -> object
+Returns the value associated to the key in parameter (`default` if there is none), and marks that entry as the most recently used
+    """
+    with self.m_lock:
+      res = self.m_content.get(key, _empty__)
+      if(res is _empty__):
+        self.m_misses += 1
+        return default
+      self.m_hits += 1
+      self.m_content.move_to_end(key)
+      return res
+
+  def put(self, key, value):
+    """put(object, object) -> None
+Associates `value` to the key in parameter, removing the least recently used entry if the cache is full
+    """
+    maxsize = self.m_maxsize
+    if(maxsize == 0): return
+    content = self.m_content
+    with self.m_lock:
+      content[key] = value
+      content.move_to_end(key)
+      if((maxsize is not None) and (len(content) > maxsize)):
+        content.popitem(last=False)
+
+  def remove(self, key):
+    """remove(object) -> bool
+Removes the entry associated to the key in parameter, and returns if there was such an entry
+    """
+    with self.m_lock:
+      return self.m_content.pop(key, _empty__) is not _empty__
+
+  def clear(self):
+    """clear() -> None
+Removes all the entries of the cache
+    """
+    with self.m_lock:
+      self.m_content.clear()
+
+  def __len__(self): return len(self.m_content)
+  def __contains__(self, key): return key in self.m_content
+
+
+class lfu_cache__c(object):
+  """Mapping with a bounded number of entries: when full, adding an entry removes the least frequently used one
+ (the least recently used one among the least frequently used ones).
+A maximal size of None means no bound, and a maximal size of 0 disables the cache.
+  """
+  __slots__ = (
+    "m_content",   # dict[object -> (object, int)]: the value and the number of uses of every entry
+    "m_freqs",     # dict[int -> OrderedDict[object -> None]]: the entries with a given number of uses, in order of last use
+    "m_min",       # int: the smallest number of uses of an entry
+    "m_maxsize", "m_hits", "m_misses", "m_lock",
+  )
+  def __init__(self, maxsize=128):
+    """lfu_cache__c(int | None) -> lfu_cache__c"""
+    self.m_content = {}
+    self.m_freqs = {}
+    self.m_min = 0
+    self.m_maxsize = maxsize
+    self.m_hits = 0
+    self.m_misses = 0
+    self.m_lock = threading.Lock()
+
+  @property
+  def maxsize(self): return self.m_maxsize
+  @property
+  def hits(self): return self.m_hits
+  @property
+  def misses(self): return self.m_misses
+
+  def _use__(self, key, value, freq):
+    # moves the entry in parameter from the frequency `freq` to `freq + 1`
+    if(freq):
+      keys = self.m_freqs[freq]
+      del keys[key]
+      if(not keys):
+        del self.m_freqs[freq]
+        if(self.m_min == freq): self.m_min = freq + 1
+    self.m_freqs.setdefault(freq + 1, OrderedDict())[key] = None
+    self.m_content[key] = (value, freq + 1)
+
+  def get(self, key, default=None):
+    """get(object, object) -> object
+Returns the value associated to the key in parameter (`default` if there is none), and counts a use of that entry
+    """
+    with self.m_lock:
+      res = self.m_content.get(key)
+      if(res is None):
+        self.m_misses += 1
+        return default
+      self.m_hits += 1
+      value, freq = res
+      self._use__(key, value, freq)
+      return value
+
+  def put(self, key, value):
+    """put(object, object) -> None
+Associates `value` to the key in parameter (which counts as a use), removing the least frequently used entry if the cache is full
+    """
+    maxsize = self.m_maxsize
+    if(maxsize == 0): return
+    with self.m_lock:
+      res = self.m_content.get(key)
+      if(res is not None):
+        self._use__(key, value, res[1])
+        return
+      if((maxsize is not None) and (len(self.m_content) >= maxsize)):
+        keys = self.m_freqs[self.m_min]
+        old, _ = keys.popitem(last=False)
+        if(not keys): del self.m_freqs[self.m_min]
+        del self.m_content[old]
+      self._use__(key, value, 0)
+      self.m_min = 1
+
+  def remove(self, key):
+    """remove(object) -> bool
+Removes the entry associated to the key in parameter, and returns if there was such an entry
+    """
+    with self.m_lock:
+      res = self.m_content.pop(key, None)
+      if(res is None): return False
+      freq = res[1]
+      keys = self.m_freqs[freq]
+      del keys[key]
+      if(not keys):
+        del self.m_freqs[freq]
+        if(self.m_min == freq): self.m_min = min(self.m_freqs, default=0)
+      return True
+
+  def clear(self):
+    """clear() -> None
+Removes all the entries of the cache
+    """
+    with self.m_lock:
+      self.m_content.clear()
+      self.m_freqs.clear()
+      self.m_min = 0
+
+  def __len__(self): return len(self.m_content)
+  def __contains__(self, key): return key in self.m_content
+
+
+class ttl_cache__c(object):
+  """Mapping whose entries expire `ttl` seconds after being added, with an optional bound on the number of entries
+ (when full, adding an entry removes the oldest one).
+The current time is given by the `timer` function (by default, `time.monotonic`).
+  """
+  __slots__ = (
+    "m_content",   # OrderedDict[object -> (object, float)]: the value and the expiration time of every entry, in order of addition
+    "m_ttl",       # float: the time to live of the entries
+    "m_timer",     # callable: the function returning the current time
+    "m_maxsize", "m_hits", "m_misses", "m_lock",
+  )
+  def __init__(self, ttl, maxsize=None, timer=time.monotonic):
+    """ttl_cache__c(float, int | None, callable) -> ttl_cache__c"""
+    self.m_content = OrderedDict()
+    self.m_ttl = ttl
+    self.m_timer = timer
+    self.m_maxsize = maxsize
+    self.m_hits = 0
+    self.m_misses = 0
+    self.m_lock = threading.Lock()
+
+  @property
+  def ttl(self): return self.m_ttl
+  @property
+  def maxsize(self): return self.m_maxsize
+  @property
+  def hits(self): return self.m_hits
+  @property
+  def misses(self): return self.m_misses
+
+  def _expire__(self, now):
+    # removes the expired entries, which are the oldest ones
+    content = self.m_content
+    while(content):
+      key, (_, limit) = next(iter(content.items()))
+      if(limit > now): break
+      del content[key]
+
+  def get(self, key, default=None):
+    """get(object, object) -> object
+Returns the value associated to the key in parameter (`default` if there is none, or if it has expired)
+    """
+    with self.m_lock:
+      self._expire__(self.m_timer())
+      res = self.m_content.get(key)
+      if(res is None):
+        self.m_misses += 1
+        return default
+      self.m_hits += 1
+      return res[0]
+
+  def put(self, key, value):
+    """put(object, object) -> None
+Associates `value` to the key in parameter, for `ttl` seconds
+    """
+    maxsize = self.m_maxsize
+    if(maxsize == 0): return
+    content = self.m_content
+    with self.m_lock:
+      now = self.m_timer()
+      self._expire__(now)
+      content[key] = (value, now + self.m_ttl)
+      content.move_to_end(key)
+      if((maxsize is not None) and (len(content) > maxsize)):
+        content.popitem(last=False)
+
+  def remove(self, key):
+    """remove(object) -> bool
+Removes the entry associated to the key in parameter, and returns if there was such an entry
+    """
+    with self.m_lock:
+      return self.m_content.pop(key, None) is not None
+
+  def clear(self):
+    """clear() -> None
+Removes all the entries of the cache
+    """
+    with self.m_lock:
+      self.m_content.clear()
+
+  def __len__(self):
+    with self.m_lock:
+      self._expire__(self.m_timer())
+      return len(self.m_content)
+  def __contains__(self, key):
+    with self.m_lock:
+      self._expire__(self.m_timer())
+      return key in self.m_content
+
+
+def deep_getsizeof(obj):
+  """deep_getsizeof(object) -> int
+Returns an estimation of the memory used by the object in parameter (in bytes):
+ the size given by `sys.getsizeof` of the object and of all the objects it contains
+ (the elements of containers, and the attributes of objects, classes and modules), each counted once.
+Functions and the modules contained in the object are not traversed (only their own size is counted).
+  """
+  root = obj
+  seen = set()
+  todo = [obj]
+  res = 0
+  while(todo):
+    obj = todo.pop()
+    if(id(obj) in seen): continue
+    seen.add(id(obj))
+    res += sys.getsizeof(obj)
+    if(isinstance(obj, (str, bytes, bytearray, int, float, complex, bool, types.FunctionType, types.BuiltinFunctionType))):
+      continue
+    elif(isinstance(obj, types.ModuleType) and (obj is not root)):
+      continue
+    elif(isinstance(obj, dict)):
+      todo.extend(obj.keys())
+      todo.extend(obj.values())
+    elif(isinstance(obj, (list, tuple, set, frozenset))):
+      todo.extend(obj)
+    else:
+      d = getattr(obj, "__dict__", None)
+      if(d is not None):
+        todo.append(dict(d) if(isinstance(obj, type)) else d) # the dictionary of classes is a read-only proxy
+      for cls in type(obj).__mro__:
+        for name in cls.__dict__.get("__slots__", ()):
+          value = getattr(obj, name, _empty__)
+          if(value is not _empty__): todo.append(value)
+  return res
+
+
+class size_cache__c(object):
+  """Mapping whose entries have a bounded total size: when full, adding an entry removes the least recently used ones.
+The size of the entries is given by the `sizeof` function (by default, `deep_getsizeof`),
+ and an entry larger than the maximal size is not stored.
+  """
+  __slots__ = (
+    "m_content",   # OrderedDict[object -> (object, int)]: the value and the size of every entry, in order of last use
+    "m_sizeof",    # callable: the function computing the size of the values
+    "m_size",      # int: the current total size of the entries
+    "m_maxsize", "m_hits", "m_misses", "m_lock",
+  )
+  def __init__(self, maxsize, sizeof=None):
+    """size_cache__c(int, callable) -> size_cache__c"""
+    self.m_content = OrderedDict()
+    self.m_sizeof = deep_getsizeof if(sizeof is None) else sizeof
+    self.m_size = 0
+    self.m_maxsize = maxsize
+    self.m_hits = 0
+    self.m_misses = 0
+    self.m_lock = threading.Lock()
+
+  @property
+  def maxsize(self): return self.m_maxsize
+  @property
+  def size(self): return self.m_size
+  @property
+  def hits(self): return self.m_hits
+  @property
+  def misses(self): return self.m_misses
+
+  def get(self, key, default=None):
+    """get(object, object) -> object
+Returns the value associated to the key in parameter (`default` if there is none), and marks that entry as the most recently used
+    """
+    with self.m_lock:
+      res = self.m_content.get(key)
+      if(res is None):
+        self.m_misses += 1
+        return default
+      self.m_hits += 1
+      self.m_content.move_to_end(key)
+      return res[0]
+
+  def put(self, key, value):
+    """put(object, object) -> None
+Associates `value` to the key in parameter, removing the least recently used entries until the total size fits in the bound
+    """
+    size = self.m_sizeof(value)
+    content = self.m_content
+    with self.m_lock:
+      old = content.pop(key, None)
+      if(old is not None): self.m_size -= old[1]
+      if(size > self.m_maxsize): return
+      content[key] = (value, size)
+      self.m_size += size
+      while(self.m_size > self.m_maxsize):
+        _, (_, old_size) = content.popitem(last=False)
+        self.m_size -= old_size
+
+  def remove(self, key):
+    """remove(object) -> bool
+Removes the entry associated to the key in parameter, and returns if there was such an entry
+    """
+    with self.m_lock:
+      res = self.m_content.pop(key, None)
+      if(res is None): return False
+      self.m_size -= res[1]
+      return True
+
+  def clear(self):
+    """clear() -> None
+Removes all the entries of the cache
+    """
+    with self.m_lock:
+      self.m_content.clear()
+      self.m_size = 0
+
+  def __len__(self): return len(self.m_content)
+  def __contains__(self, key): return key in self.m_content
+
+
+class disk_cache__c(object):
+  """Persistent mapping from string keys (e.g., hashes in hexadecimal format) to bytes, stored in a directory.
+Every entry is stored in its own file, in a sub-directory named after the first two characters of its key.
+Entries are written atomically, so the cache can be shared by several threads and processes at the same time.
+  """
+  __slots__ = ("m_directory", "m_hits", "m_misses",)
+  def __init__(self, directory):
+    """disk_cache__c(str) -> disk_cache__c"""
+    self.m_directory = os.path.abspath(directory)
+    self.m_hits = 0
+    self.m_misses = 0
+    os.makedirs(self.m_directory, exist_ok=True)
+
+  @property
+  def directory(self): return self.m_directory
+  @property
+  def hits(self): return self.m_hits
+  @property
+  def misses(self): return self.m_misses
+
+  def _path__(self, key):
+    if((not key) or (os.sep in key) or (key[0] == '.')):
+      raise ValueError(f"ERROR: invalid disk cache key \"{key}\"")
+    return os.path.join(self.m_directory, key[:2], key)
+
+  def get(self, key, default=None):
+    """get(str, object) -> bytes | object
+Returns the data associated to the key in parameter (`default` if there is none)
+    """
+    try:
+      with open(self._path__(key), "rb") as f:
+        res = f.read()
+    except FileNotFoundError:
+      self.m_misses += 1
+      return default
+    self.m_hits += 1
+    return res
+
+  def put(self, key, data):
+    """put(str, bytes) -> None
+Associates `data` to the key in parameter
+    """
+    path = self._path__(key)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp")
+    try:
+      with os.fdopen(fd, "wb") as f:
+        f.write(data)
+      os.replace(tmp, path)
+    except BaseException:
+      try: os.remove(tmp)
+      except OSError: pass
+      raise
+
+  def remove(self, key):
+    """remove(str) -> bool
+Removes the entry associated to the key in parameter, and returns if there was such an entry
+    """
+    try:
+      os.remove(self._path__(key))
+      return True
+    except FileNotFoundError:
+      return False
+
+  def clear(self):
+    """clear() -> None
+Removes all the entries of the cache
+    """
+    for name in os.listdir(self.m_directory):
+      path = os.path.join(self.m_directory, name)
+      if(os.path.isdir(path)): shutil.rmtree(path, ignore_errors=True)
+
+  def keys(self):
+    """keys() -> iterator[str]
+Yields the keys of all the entries of the cache
+    """
+    for name in os.listdir(self.m_directory):
+      path = os.path.join(self.m_directory, name)
+      if(os.path.isdir(path)):
+        for key in os.listdir(path):
+          if(not key.startswith(".")): yield key
+
+  def __len__(self): return sum(1 for _ in self.keys())
+  def __contains__(self, key): return os.path.exists(self._path__(key))
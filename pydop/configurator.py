@@ -0,0 +1,264 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+
+"""
+This file contains the class `ConfiguratorSession`, that supports the interactive configuration of a product.
+A session stores the decisions of the user (selecting or deselecting a feature, giving a value to an attribute),
+ and after each decision, propagates its consequences on the CNF translation of the feature model (see `fm_analysis`):
+ the features whose value is implied by the decisions are forced, while the others stay free.
+Each decision is a decision level of an incremental solver, so propagation only considers the variables that change,
+ and undoing a decision only cancels that level.
+"""
+
+from pydop.fm_result import decl_errors__c
+from pydop.utils import _empty__
+
+
+class ConfiguratorSession(object):
+  """ConfiguratorSession(FM) -> ConfiguratorSession
+A configuration session over a checked feature model (either a feature diagram or a frozen feature model).
+Decisions are taken with `select`, `deselect` and `set_attribute`: a decision that contradicts the previous ones raises a ValueError,
+ and leaves the session unchanged.
+The cross-tree constraints that cannot be translated in CNF (e.g., constraints over attribute values) are not propagated:
+ they are checked when the product is built.
+  """
+  __slots__ = (
+    "m_fm",          # the feature model
+    "m_compiled",    # fm_analysis.compiled_fm__c: its CNF translation
+    "m_solver",      # sat.solver__c: the solver of the session, with one decision level per decision
+    "m_decisions",   # list[tuple]: the decisions of the user (kind, key, literal, value), one per decision level
+    "m_redo",        # list[tuple]: the decisions that were undone, the last one first
+    "m_values",      # dict[path__c -> object]: the values given to the attributes
+  )
+
+  def __init__(self, fm):
+    compiled = fm.compiled()
+    self.m_fm = fm
+    self.m_compiled = compiled
+    self.m_solver = compiled.new_solver()
+    self.m_decisions = []
+    self.m_redo = []
+    self.m_values = {}
+
+  ##########################################
+  # decisions
+
+  def select(self, name):
+    """select(str) -> ConfiguratorSession
+Selects the feature in parameter
+    """
+    key, v = self._feature__(name)
+    self._decide__(("select", key, v, True))
+    return self
+
+  def deselect(self, name):
+    """deselect(str) -> ConfiguratorSession
+Deselects the feature in parameter
+    """
+    key, v = self._feature__(name)
+    self._decide__(("deselect", key, -v, False))
+    return self
+
+  def set_attribute(self, name, value):
+    """set_attribute(str, object) -> ConfiguratorSession
+Sets the value of the attribute in parameter.
+A feature whose attribute has a value that is not valid w.r.t. its domain cannot be selected.
+An attribute that already has a value can be set again only after undoing its previous decision.
+    """
+    compiled = self.m_compiled
+    key = self._resolve__(name)
+    j = compiled.attribute(key)
+    if(j is None):
+      raise KeyError(f"ERROR: \"{name}\" is not an attribute of the feature model")
+    path = compiled.m_frozen.m_att_paths[j]
+    if(path in self.m_values):
+      raise ValueError(f"ERROR: the attribute \"{name}\" already has a value ({self.m_values[path]!r})")
+    v = compiled.m_att_vars[j]
+    lit = v if(compiled.m_frozen.m_att_specs[j](value)) else -v
+    self._decide__(("set_attribute", key, lit, value))
+    return self
+
+  def undo(self):
+    """undo() -> bool
+Cancels the last decision, and returns False if there was no decision to cancel
+    """
+    if(not self.m_decisions):
+      return False
+    decision = self.m_decisions.pop()
+    self.m_solver.retract()
+    if(decision[0] == "set_attribute"):
+      del self.m_values[self._path__(decision[1])]
+    self.m_redo.append(decision)
+    return True
+
+  def redo(self):
+    """redo() -> bool
+Takes again the last cancelled decision, and returns False if there was no decision to take again
+    """
+    if(not self.m_redo):
+      return False
+    self._apply__(self.m_redo.pop()) # cannot fail: the state of the solver is the one in which the decision was taken
+    return True
+
+  def reset(self):
+    """reset() -> None
+Cancels all the decisions (they cannot be taken again with `redo`)
+    """
+    while(self.m_decisions):
+      self.m_decisions.pop()
+      self.m_solver.retract()
+    self.m_redo.clear()
+    self.m_values.clear()
+
+  ##########################################
+  # state of the session
+
+  def value(self, name):
+    """value(str) -> bool | None
+Returns if the feature in parameter is selected (True), deselected (False), or free (None)
+    """
+    return self.m_solver.value(self._feature__(name)[1])
+
+  def decisions(self):
+    """decisions() -> list[tuple[str, str, object]]
+Returns the decisions taken in this session, in order, as triplets (operation, name, value)
+    """
+    return [(kind, self._name_of__(key), value) for kind, key, _, value in self.m_decisions]
+
+  def forced(self):
+    """forced() -> dict[str, bool]
+Returns the features whose value is implied by the feature model and the decisions, but not decided by the user
+    """
+    solver = self.m_solver
+    decided = {self._path__(decision[1]) for decision in self.m_decisions if(decision[0] != "set_attribute")}
+    return {
+      name: value for level in range(solver.level + 1) for name, path, value in self._assigned__(solver.trail(level))
+      if(path not in decided)}
+
+  def changes(self):
+    """changes() -> dict[str, bool]
+Returns the features whose value was fixed by the last decision (including the decided feature)
+    """
+    if(not self.m_decisions):
+      return {}
+    return {name: value for name, _, value in self._assigned__(self.m_solver.trail(self.m_solver.level))}
+
+  def free(self):
+    """free() -> list[str]
+Returns the features whose value is neither decided nor implied
+    """
+    frozen = self.m_compiled.m_frozen
+    solver = self.m_solver
+    return [
+      str(path) for i, (name, path) in enumerate(zip(frozen.m_names, frozen.m_paths))
+      if((name is not None) and (solver.value(i + 1) is None))]
+
+  def is_complete(self):
+    """is_complete() -> bool
+Returns if all the features have a value
+    """
+    return not self.free()
+
+  def is_consistent(self):
+    """is_consistent() -> bool
+Returns if some product of the feature model satisfies all the decisions
+ (propagation alone does not detect all the inconsistencies, e.g., between two alternative groups)
+    """
+    return self._complete__() is not None
+
+  def product(self):
+    """product() -> fm_configuration.frozen_configuration__c
+Returns the product corresponding to the decisions: the free features are completed (deselecting them whenever possible),
+ and the resulting configuration is closed and validated like with the feature model's `close_configuration`.
+Raises ValueError if no valid product satisfies the decisions.
+    """
+    fm = self.m_fm
+    model = self._complete__()
+    if(model is None):
+      raise ValueError("ERROR: no product of the feature model satisfies the decisions of the session")
+    res, errors = fm.close_configuration(self.m_compiled.make_product(model, self.m_values))
+    if(bool(errors)):
+      raise ValueError(str(errors))
+    if(not bool(fm(res))):
+      raise ValueError(f"ERROR: the product of the session is not valid:\n{fm.explain(res)}")
+    return res
+
+  ##########################################
+  # internal
+
+  def _resolve__(self, name):
+    errors = decl_errors__c()
+    res = self.m_fm.m_lookup.resolve(name, None, errors, None)
+    if(errors):
+      raise KeyError(str(errors))
+    return res
+
+  def _feature__(self, name):
+    key = self._resolve__(name)
+    v = self.m_compiled.var(key)
+    if(v is None):
+      raise KeyError(f"ERROR: \"{name}\" is not a feature of the feature model")
+    return key, v
+
+  def _path__(self, key):
+    return self.m_compiled._key_path__(key)
+
+  def _name_of__(self, key):
+    return str(self._path__(key))
+
+  def _decide__(self, decision):
+    if(not self._apply__(decision)):
+      kind, key, _, value = decision
+      raise ValueError(f"ERROR: {kind}({self._name_of__(key)}, {value!r}) contradicts the previous decisions")
+    self.m_redo.clear()
+
+  def _apply__(self, decision):
+    if(not self.m_solver.assume(decision[2])):
+      return False
+    self.m_decisions.append(decision)
+    if(decision[0] == "set_attribute"):
+      self.m_values[self._path__(decision[1])] = decision[3]
+    return True
+
+  def _assigned__(self, lits):
+    # yields the (name, path, value) of the named features assigned by the literals in parameter
+    frozen = self.m_compiled.m_frozen
+    nb_nodes = len(frozen.m_paths)
+    for lit in lits:
+      i = abs(lit) - 1
+      if((i < nb_nodes) and (frozen.m_names[i] is not None)):
+        path = frozen.m_paths[i]
+        yield (str(path), path, lit > 0)
+
+  def _complete__(self):
+    # returns a model extending the decisions (with the attributes without value being not valid), or None
+    compiled = self.m_compiled
+    frozen = compiled.m_frozen
+    assumptions = [decision[2] for decision in self.m_decisions]
+    assumptions.extend(-v for path, v in zip(frozen.m_att_paths, compiled.m_att_vars) if(path not in self.m_values))
+    solver = compiled.solver() # the features are deselected by default during search
+    if(solver.solve(assumptions)):
+      return solver.model()
+    return None
+
+  def __str__(self):
+    return f"ConfiguratorSession({len(self.m_decisions)} decisions, {len(self.free())} free features)"
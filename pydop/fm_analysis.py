@@ -0,0 +1,508 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+#
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+"""
+This file contains the compilation of a feature model into a CNF problem, and the analyses based on it.
+Contrary to `to_dimacs`, the compilation follows exactly the semantics of the evaluation of feature models
+ (in particular for anonymous groups and the dependencies between a feature and its parent),
+ and supports attributes and all cross-tree constraints:
+ the validity of every attribute, and the value of every cross-tree constraint that cannot be translated (e.g., comparisons),
+ are opaque variables whose values are taken from the configuration under analysis.
+Every clause is tagged with the constraint of the feature model it comes from (its group),
+ which is used to compute minimal explanations of why a configuration is not a valid product.
+"""
+
+import itertools
+
+from pydop.fm_result import explanation__c
+from pydop.fm_constraint import Var, Lit, And, Or, Not, Xor, Conflict, Implies, Iff, Eq
+from pydop.fm_configuration import configuration__c
+from pydop.fm_frozen import frozen_fd__c
+
+from pydop.sat import solver__c
+from pydop.utils import _empty__
+
+
+################################################################################
+# translation of boolean expressions
+################################################################################
+
+def _neg__(lit):
+  return (not lit) if(isinstance(lit, bool)) else -lit
+
+class _cnf__c(object):
+  """A list of clauses, each tagged with its group (None for definitions, which are always satisfiable)"""
+  __slots__ = ("m_nb_vars", "m_clauses", "m_groups",)
+  def __init__(self):
+    self.m_nb_vars = 0
+    self.m_clauses = []
+    self.m_groups = []
+
+  def new_var(self):
+    self.m_nb_vars += 1
+    return self.m_nb_vars
+
+  def add_clause(self, clause, group=None):
+    self.m_clauses.append(list(clause))
+    self.m_groups.append(group)
+
+  ## Tseitin definitions: each function returns a literal equivalent to the formula, or a boolean
+
+  def def_and(self, lits):
+    tmp = []
+    for lit in lits:
+      if(lit is False): return False
+      elif(lit is not True): tmp.append(lit)
+    if(len(tmp) == 0): return True
+    elif(len(tmp) == 1): return tmp[0]
+    v = self.new_var()
+    for lit in tmp:
+      self.add_clause((-v, lit))
+    self.add_clause(itertools.chain((-lit for lit in tmp), (v,)))
+    return v
+
+  def def_or(self, lits):
+    return _neg__(self.def_and([_neg__(lit) for lit in lits]))
+
+  def def_iff(self, left, right):
+    if(isinstance(left, bool)): return right if(left) else _neg__(right)
+    elif(isinstance(right, bool)): return left if(right) else _neg__(left)
+    v = self.new_var()
+    self.add_clause((-v, -left, right))
+    self.add_clause((-v, left, -right))
+    self.add_clause((v, left, right))
+    self.add_clause((v, -left, -right))
+    return v
+
+  def def_at_most_one(self, lits):
+    nb_true = sum(1 for lit in lits if(lit is True))
+    tmp = [lit for lit in lits if(not isinstance(lit, bool))]
+    if(nb_true > 1): return False
+    elif(nb_true == 1): return self.def_and([-lit for lit in tmp])
+    elif(len(tmp) <= 1): return True
+    pairs = [self.def_and((tmp[i], tmp[j])) for i in range(len(tmp)) for j in range(i)]
+    return _neg__(self.def_or(pairs))
+
+  def def_exactly_one(self, lits):
+    return self.def_and((self.def_or(lits), self.def_at_most_one(lits)))
+
+  def encode(self, expr, f_var, f_opaque=None):
+    """encode(_expbool__c, callable, callable) -> int | bool
+Returns a literal equivalent to the boolean expression in parameter (or its value, if it is constant),
+ where `f_var` gives the literal of every variable of the expression.
+If the expression cannot be translated, raises NotImplementedError, or if `f_opaque` is given,
+ returns the literal `f_opaque(expr)` (this is done for every sub-expression that cannot be translated).
+    """
+    try:
+      return self._encode__(expr, f_var, f_opaque)
+    except NotImplementedError:
+      if(f_opaque is None): raise
+      return f_opaque(expr)
+
+  def _encode__(self, expr, f_var, f_opaque):
+    if(isinstance(expr, Var)):
+      return f_var(expr.m_content)
+    elif(isinstance(expr, Lit)):
+      if(isinstance(expr.m_content, bool)): return expr.m_content
+      raise NotImplementedError()
+    elif(not isinstance(expr, (Not, And, Or, Xor, Conflict, Implies, Iff, Eq))):
+      raise NotImplementedError()
+    if(isinstance(expr, (Iff, Eq))): # the operands may not be booleans: the comparison is translated only if both operands are
+      f_opaque = None
+    subs = [self.encode(sub, f_var, f_opaque) for sub in expr.m_content]
+    if(isinstance(expr, Not)): return _neg__(subs[0])
+    elif(isinstance(expr, And)): return self.def_and(subs)
+    elif(isinstance(expr, Or)): return self.def_or(subs)
+    elif(isinstance(expr, Xor)): return self.def_exactly_one(subs)
+    elif(isinstance(expr, Conflict)): return self.def_at_most_one(subs)
+    elif(isinstance(expr, Implies)): return self.def_or((_neg__(subs[0]), subs[1]))
+    elif(isinstance(expr, (Iff, Eq))): return self.def_iff(subs[0], subs[1])
+    raise NotImplementedError()
+
+
+################################################################################
+# compiled feature model
+################################################################################
+
+_AND, _ANY, _OR, _XOR = range(4) # the kind codes of frozen feature models
+
+class compiled_fm__c(object):
+  """CNF version of a checked feature model (created with the `compiled` method of feature models)"""
+  __slots__ = (
+    "m_fm",          # the compiled feature model
+    "m_frozen",      # fm_frozen.frozen_fd__c: the frozen version of the feature model
+    "m_dom",         # None, or the mapping {variable -> path} of the feature model, if it is not frozen
+    "m_index",       # dict[path__c -> int]: the index of every node
+    "m_att_index",   # dict[path__c -> int]: the index of every attribute
+    "m_cnf",         # _cnf__c: the clauses
+    "m_vtrue",       # int: a variable that is always true
+    "m_att_vars",    # list[int]: the validity variable of every attribute
+    "m_ctc_lits",    # list[int]: the literal of every cross-tree constraint
+    "m_opaque",      # list[int]: the index of the cross-tree constraints that could not be translated
+    "m_att_owner",   # list[int]: the node of every attribute
+    "m_ctc_owner",   # list[int]: the node of every cross-tree constraint
+    "m_selectors",   # dict[group -> int]: the selector variable of every group
+    "m_keys",        # None, or the mapping {path -> variable} of the feature model
+    "m_solver",      # None, or the solver used for repairs
+    "m_explainer",   # None, or the solver used for explanations
+  )
+
+  def __init__(self, fm):
+    """compiled_fm__c(_fd__c | frozen_fd__c) -> compiled_fm__c
+Compiles the checked feature model in parameter
+    """
+    self.m_fm = fm
+    if(isinstance(fm, frozen_fd__c)):
+      self.m_frozen = fm
+      self.m_dom = None
+    else:
+      self.m_frozen = fm.freeze()
+      self.m_dom = fm.m_dom
+    frozen = self.m_frozen
+    nb_nodes = len(frozen)
+    self.m_index = {path: i for i, path in enumerate(frozen.m_paths)}
+    self.m_att_index = {path: j for j, path in enumerate(frozen.m_att_paths)}
+    cnf = _cnf__c()
+    self.m_cnf = cnf
+
+    # 1. variables: node i is variable i+1
+    cnf.m_nb_vars = nb_nodes
+    self.m_vtrue = cnf.new_var()
+    cnf.add_clause((self.m_vtrue,))
+    self.m_att_vars = [cnf.new_var() for _ in frozen.m_att_paths]
+    self.m_att_owner = [i for i in range(nb_nodes) for _ in range(frozen.m_att_start[i], frozen.m_att_end[i])]
+    self.m_ctc_owner = [i for i in range(nb_nodes) for _ in range(frozen.m_ctc_start[i], frozen.m_ctc_end[i])]
+    self.m_ctc_lits = []
+    self.m_opaque = []
+    for k, ctc in enumerate(frozen.m_ctcs):
+      try:
+        lit = cnf.encode(ctc, self._var_of_path__)
+        if(lit is True): lit = self.m_vtrue
+        elif(lit is False): lit = -self.m_vtrue
+      except NotImplementedError:
+        lit = cnf.new_var()
+        self.m_opaque.append(k)
+      self.m_ctc_lits.append(lit)
+
+    # 2. semantics of the nodes
+    cnf.add_clause((1,), ("root",))
+    ancestors = [None] * nb_nodes # the nearest named ancestor of every node
+    for i in range(nb_nodes):
+      x = i + 1
+      kind = frozen.m_kinds[i]
+      named = (frozen.m_names[i] is not None)
+      subs = list(itertools.chain(
+        range(frozen.m_child_start[i] + 1, frozen.m_child_end[i] + 1),
+        self.m_att_vars[frozen.m_att_start[i]:frozen.m_att_end[i]],
+        self.m_ctc_lits[frozen.m_ctc_start[i]:frozen.m_ctc_end[i]]))
+      group = ("node", i)
+      if(kind == _AND):
+        for tag, sub in zip(self._sub_tags__(i), subs):
+          cnf.add_clause((-x, sub), tag)
+        if(not named):
+          cnf.add_clause(itertools.chain((-sub for sub in subs), (x,)), group)
+      elif(kind == _ANY):
+        if(not named):
+          cnf.add_clause((x,), group)
+      else:
+        cnf.add_clause(itertools.chain((-x,), subs), group)
+        if(kind == _XOR):
+          for a in range(len(subs)):
+            for b in range(a):
+              cnf.add_clause((-x, -subs[a], -subs[b]), group)
+        if(not named):
+          if(kind == _OR):
+            for sub in subs:
+              cnf.add_clause((x, -sub), group)
+          else:
+            for a, sub in enumerate(subs):
+              cnf.add_clause(itertools.chain((x, -sub), subs[:a], subs[a+1:]), group)
+      # dependencies: a selected feature requires its nearest named ancestor to be selected
+      parent = frozen.m_parents[i]
+      if(parent >= 0):
+        ancestors[i] = parent if(frozen.m_names[parent] is not None) else ancestors[parent]
+        if(named and (ancestors[i] is not None)):
+          cnf.add_clause((-x, ancestors[i] + 1), ("dep", i))
+
+    # 3. selectors
+    self.m_selectors = {}
+    for group in cnf.m_groups:
+      if((group is not None) and (group not in self.m_selectors)):
+        self.m_selectors[group] = cnf.new_var()
+    self.m_keys = None
+    self.m_solver = None
+    self.m_explainer = None
+
+  def _sub_tags__(self, i):
+    frozen = self.m_frozen
+    return itertools.chain(
+      (("child", j) for j in range(frozen.m_child_start[i], frozen.m_child_end[i])),
+      (("att", j) for j in range(frozen.m_att_start[i], frozen.m_att_end[i])),
+      (("ctc", k) for k in range(frozen.m_ctc_start[i], frozen.m_ctc_end[i])))
+
+  def _var_of_path__(self, path):
+    # the variables of the constraints of a frozen feature model are paths: only features can be translated
+    idx = self.m_index.get(path)
+    if(idx is None): raise NotImplementedError()
+    return idx + 1
+
+  ##########################################
+  # base API
+
+  @property
+  def nb_vars(self):
+    """The number of variables of the CNF"""
+    return self.m_cnf.m_nb_vars
+
+  def var(self, key):
+    """var(object) -> int | None
+Returns the variable corresponding to a feature of the feature model (None if `key` is not a feature)
+    """
+    idx = self.m_index.get(self._key_path__(key))
+    return (None if(idx is None) else idx + 1)
+
+  def attribute(self, key):
+    """attribute(object) -> int | None
+Returns the index of an attribute of the feature model (None if `key` is not an attribute)
+    """
+    return self.m_att_index.get(self._key_path__(key))
+
+  def solver(self):
+    """solver() -> sat.solver__c
+Returns the solver shared by the analyses of this feature model (to be used only between decision levels 0)
+    """
+    if(self.m_solver is None):
+      self.m_solver = self.new_solver()
+    return self.m_solver
+
+  def new_solver(self):
+    """new_solver() -> sat.solver__c
+Returns a new solver containing the clauses of the feature model
+ (the values of the opaque variables, i.e., attribute validity and untranslatable constraints, are free)
+    """
+    res = solver__c(self.m_cnf.m_clauses)
+    res.ensure_var(self.m_cnf.m_nb_vars)
+    return res
+
+  def _key_path__(self, key):
+    return key if(self.m_dom is None) else self.m_dom.get(key, key)
+
+  def _path_key__(self, path):
+    if(self.m_dom is None): return path
+    if(self.m_keys is None):
+      self.m_keys = {p: key for key, p in self.m_dom.items()}
+    return self.m_keys[path]
+
+  def _values__(self, conf):
+    """Returns the content of the configuration in parameter (linked to the feature model if necessary) as a mapping {path: value}"""
+    if(not isinstance(conf, configuration__c)):
+      conf, errors = self.m_fm.link_configuration(conf)
+      if(bool(errors)): raise ValueError(errors)
+    return {self._key_path__(key): value for key, value in conf.items()}
+
+  def _opaque_values__(self, values):
+    """Yields the pairs (literal, description) fixing the opaque variables w.r.t. a product (given as a mapping {path: value})"""
+    frozen = self.m_frozen
+    for j, (path, spec) in enumerate(zip(frozen.m_att_paths, frozen.m_att_specs)):
+      value = values.get(path, _empty__)
+      v = self.m_att_vars[j]
+      if(value is _empty__):
+        yield (-v, f"attribute {path} has no value")
+      elif(spec(value)):
+        yield (v, f"attribute {path} = {value!r} is valid ({spec})")
+      else:
+        yield (-v, f"attribute {path} = {value!r} is not valid ({spec})")
+    for k in self.m_opaque:
+      ctc = frozen.m_ctcs[k]
+      try: value = bool(ctc(values))
+      except Exception: value = False
+      lit = self.m_ctc_lits[k]
+      yield ((lit if(value) else -lit), f"{ctc} is {value}")
+
+  ##########################################
+  # explanations
+
+  def explain(self, conf):
+    """explain(configuration__c | dict) -> fm_result.explanation__c
+Returns a minimal explanation of why the configuration in parameter is not a valid product:
+ a minimal set of constraints of the feature model, and of values in the configuration, that cannot be satisfied together.
+The result is empty if the configuration is a valid product.
+    """
+    frozen = self.m_frozen
+    values = self._values__(conf)
+    # 1. the values of the configuration, as assumptions
+    missing = []
+    assumptions = []
+    descriptions = {}
+    for i, (name, path) in enumerate(zip(frozen.m_names, frozen.m_paths)):
+      if(name is not None):
+        value = values.get(path, _empty__)
+        if(value is _empty__):
+          missing.append(f"{path} has no value in the input configuration")
+        else:
+          lit = (i + 1) if(value) else -(i + 1)
+          assumptions.append(lit)
+          descriptions[lit] = f"{path} is {'selected' if(value) else 'not selected'}"
+    for lit, desc in self._opaque_values__(values):
+      assumptions.append(lit)
+      descriptions[lit] = desc
+    nb_values = len(assumptions)
+    assumptions.extend(self.m_selectors.values())
+
+    # 2. deletion-based minimization of an unsatisfiable subset of the assumptions
+    if(self.m_explainer is None):
+      self.m_explainer = solver__c(
+        clause if(group is None) else clause + [-self.m_selectors[group]]
+        for clause, group in zip(self.m_cnf.m_clauses, self.m_cnf.m_groups))
+    solver = self.m_explainer
+    if(solver.solve(assumptions)):
+      return explanation__c((), missing)
+    order = {lit: idx for idx, lit in enumerate(assumptions)}
+    core = sorted(solver.core(), key=order.__getitem__)
+    i = 0
+    while(i < len(core)):
+      trial = core[:i] + core[i+1:]
+      if(solver.solve(trial)):
+        i += 1
+      else: # the element is not necessary: refine the core with the one found by the solver
+        tmp = set(solver.core())
+        core = [lit for lit in trial if(lit in tmp)]
+
+    # 3. result
+    groups = {v: group for group, v in self.m_selectors.items()}
+    constraints = [self.describe(groups[lit]) for lit in core if(order[lit] >= nb_values)]
+    assignments = missing + [descriptions[lit] for lit in core if(order[lit] < nb_values)]
+    return explanation__c(constraints, assignments)
+
+  ##########################################
+  # repair
+
+  def repair(self, conf, cost=None):
+    """repair(configuration__c | dict, None | number | dict | callable) -> fm_configuration.frozen_configuration__c | None
+Returns the valid product that is the closest to the configuration in parameter (which can be partial or invalid),
+ w.r.t. the weighted Hamming distance over the features that have a value in that configuration.
+The parameter `cost` gives the weight of changing the value of a feature:
+ None means 1 for all features, a number is a weight for all features,
+ a dict maps feature names to their weight (the other features have weight 1),
+ and a function returns the weight of a feature given its path.
+The attributes keep their value (a feature whose attribute has no valid value cannot be selected)
+ and the cross-tree constraints that cannot be translated in CNF keep the value they have in `conf`.
+Returns None if no valid product satisfies these conditions.
+    """
+    frozen = self.m_frozen
+    values = self._values__(conf)
+    f_cost = self._cost_function__(cost)
+    soft = {}
+    for i, (name, path) in enumerate(zip(frozen.m_names, frozen.m_paths)):
+      if(name is not None):
+        value = values.get(path, _empty__)
+        if(value is not _empty__):
+          soft[(i + 1) if(value) else -(i + 1)] = f_cost(path)
+    assumptions = [lit for lit, _ in self._opaque_values__(values)]
+    solver = self.solver()
+    if(solver.minimize(soft, assumptions) is None):
+      return None
+    res, errors = self.m_fm.close_configuration(self.make_product(solver.model(), values))
+    if(bool(errors) or (not bool(self.m_fm(res)))):
+      return None
+    return res
+
+  def make_product(self, model, values):
+    """make_product(list[bool], dict) -> configuration__c
+Returns the configuration, linked to the feature model, that contains the value of every named feature in `model`,
+ and the value in `values` (a mapping {path: value}) of the attributes of the selected features
+    """
+    frozen = self.m_frozen
+    product = {}
+    names = {}
+    for i, (name, path) in enumerate(zip(frozen.m_names, frozen.m_paths)):
+      if(name is not None):
+        key = self._path_key__(path)
+        product[key] = model[i + 1]
+        names[key] = str(path)
+    for j, path in enumerate(frozen.m_att_paths):
+      value = values.get(path, _empty__)
+      if((value is not _empty__) and model[self.m_att_owner[j] + 1]):
+        key = self._path_key__(path)
+        product[key] = value
+        names[key] = str(path)
+    return configuration__c(product, self.m_fm.m_lookup, names) # already linked to the feature model
+
+  def _cost_function__(self, cost):
+    if(cost is None):
+      return (lambda path: 1)
+    elif(isinstance(cost, (int, float))):
+      return (lambda path: cost)
+    elif(isinstance(cost, dict)):
+      conf, errors = self.m_fm.link_configuration(cost)
+      if(bool(errors)): raise ValueError(errors)
+      weights = {self._key_path__(key): w for key, w in conf.items()}
+      return (lambda path: weights.get(path, 1))
+    elif(callable(cost)):
+      return cost
+    else:
+      raise ValueError(f"ERROR: the cost of a repair must be None, a number, a dict or a function (found {type(cost)})")
+
+  ##########################################
+  # textual descriptions
+
+  def describe(self, group):
+    """describe(tuple) -> str
+Returns a textual description of a group of clauses
+    """
+    frozen = self.m_frozen
+    kind = group[0]
+    if(kind == "root"):
+      return f"the root {self._name__(0)} must hold"
+    elif(kind == "child"):
+      j = group[1]
+      return f"{self._name__(frozen.m_parents[j])} requires {self._name__(j)}"
+    elif(kind == "att"):
+      j = group[1]
+      return f"{self._name__(self.m_att_owner[j])} requires a valid value for its attribute {frozen.m_att_paths[j]} ({frozen.m_att_specs[j]})"
+    elif(kind == "ctc"):
+      k = group[1]
+      return f"{self._name__(self.m_ctc_owner[k])} requires the constraint {frozen.m_ctcs[k]}"
+    elif(kind == "dep"):
+      i = group[1]
+      parent = frozen.m_parents[i]
+      while(frozen.m_names[parent] is None): parent = frozen.m_parents[parent]
+      return f"{self._name__(i)} requires the feature {self._name__(parent)}"
+    else: # "node"
+      i = group[1]
+      subs = ", ".join(itertools.chain(
+        (str(frozen.m_paths[j]) for j in range(frozen.m_child_start[i], frozen.m_child_end[i])),
+        (f"attribute {frozen.m_att_paths[j]}" for j in range(frozen.m_att_start[i], frozen.m_att_end[i])),
+        (str(frozen.m_ctcs[k]) for k in range(frozen.m_ctc_start[i], frozen.m_ctc_end[i]))))
+      kind = frozen.m_kinds[i]
+      if(frozen.m_names[i] is not None):
+        quantifier = "at least one" if(kind == _OR) else "exactly one"
+        return f"{self._name__(i)} requires {quantifier} of [{subs}]"
+      elif(kind == _ANY):
+        return f"{self._name__(i)} always holds"
+      else:
+        quantifier = ("all", "", "at least one", "exactly one")[kind]
+        return f"{self._name__(i)} holds iff {quantifier} of [{subs}] hold"
+
+  def _name__(self, i):
+    frozen = self.m_frozen
+    if(frozen.m_names[i] is None): return f"anonymous group {frozen.m_paths[i]}"
+    return f"feature {frozen.m_paths[i]}"
@@ -146,18 +146,96 @@ If the parameter `full` is `True`, put also the variables without names in the r
 
   ## basic manipulation
 
+  def freeze(self):
+    """freeze() -> frozen_configuration__c
+Returns the canonical immutable version of this configuration (`self` if it is already frozen)
+    """
+    return frozen_configuration__c(dict(self.m_dict), self.m_resolver, None if(self.m_names is None) else dict(self.m_names))
+
   def __eq__(self, other):
     if(isinstance(other, configuration__c)):
       return ((self.m_dict == other.m_dict) and (self.m_resolver == other.m_resolver))
     return False
 
   def __hash__(self):
-    return hash(frozenset((k,v) for k,v in itertools.chain(self.m_dict.items(), self.m_names.items())))
+    return _hash_dict__(self.m_dict)
 
   def __str__(self):
     return str(self.unlink().m_dict)
 
 
+##########################################
+# canonical immutable configurations
+
+class frozen_configuration__c(configuration__c):
+  """This class implements immutable configurations, whose hash is computed once at construction.
+Such configurations are returned by the `close_configuration` method of feature models,
+ and are meant to be used as keys in all caches indexed by products.
+The content of a frozen configuration must not be modified.
+  """
+  __slots__ = ("m_hash",)
+  def __init__(self, d, resolver=None, names=None):
+    configuration__c.__init__(self, d, resolver, names)
+    self.m_hash = _hash_dict__(d)
+
+  def freeze(self):
+    return self
+
+  def __eq__(self, other):
+    if(self is other):
+      return True
+    elif(isinstance(other, frozen_configuration__c)):
+      return ((self.m_hash == other.m_hash) and (self.m_resolver == other.m_resolver) and (self.m_dict == other.m_dict))
+    else:
+      return configuration__c.__eq__(self, other)
+
+  def __hash__(self):
+    return self.m_hash
+
+
+class product__c(frozen_configuration__c):
+  """This class implements validated products: frozen configurations stamped with the feature model that closed and validated them.
+Such products are returned by the `validate` method of SPLs, and are given to the deltas and hooks during variant generation.
+An SPL (and an MPL) trusts the products validated by its own feature model: it neither closes nor validates them again.
+  """
+  __slots__ = ("m_fm",)
+  def __init__(self, conf, fm):
+    """product__c(frozen_configuration__c, FM) -> product__c
+Creates the validated version of a closed and valid configuration of the feature model in parameter (no check is performed)
+    """
+    self.m_dict = conf.m_dict
+    self.m_resolver = conf.m_resolver
+    self.m_names = conf.m_names
+    self.m_hash = conf.m_hash
+    self.m_fm = fm
+
+  def is_product_of(self, fm):
+    """is_product_of(FM) -> bool
+Returns if this product was validated by the feature model in parameter
+    """
+    return self.m_fm is fm
+
+
+def _hashable__(value):
+  """_hashable__(object) -> object
+Returns a hashable version of a configuration value (lists, sets and dicts are converted into tuples and frozensets)
+  """
+  if(isinstance(value, (list, tuple))):
+    return tuple(map(_hashable__, value))
+  elif(isinstance(value, (set, frozenset))):
+    return frozenset(map(_hashable__, value))
+  elif(isinstance(value, dict)):
+    return frozenset((k, _hashable__(v)) for k, v in value.items())
+  else:
+    return value
+
+def _hash_dict__(d):
+  """_hash_dict__(dict) -> int
+Returns a hash of the content of a configuration dictionary that does not depend on the order of its items
+  """
+  return hash(frozenset((k, _hashable__(v)) for k, v in d.items()))
+
+
 
 ##########################################
 # Translates common product representations into dict
@@ -175,7 +253,7 @@ def make_configuration(fm, data):
       else:
         raise TypeError(f"ERROR: unexpected type in configuration (expected: str or tuple/list or size 2; found {type(el)})")
   else:
-    raise TypeError(f"ERROR unexpected configuration type (expected: dict/set/tuple/list; found {type(configuration)}")
+    raise TypeError(f"ERROR unexpected configuration type (expected: dict/set/tuple/list; found {type(data)})")
   return res
 
 
@@ -26,6 +26,7 @@ In particular, the class `_expbool__c` is an abstract super classes of all boole
 """
 
 import itertools
+import operator
 
 from pydop.fm_result import decl_errors__c, reason_tree__c, eval_result__c
 from pydop.fm_configuration import configuration__c
@@ -78,6 +79,20 @@ Evaluates the value of the boolean expression w.r.t. the product in parameter
         reason.add_reason_sub(r)
     return eval_result__c(res, reason)
  
+  def compile(self):
+    """compile() -> callable
+Returns a function computing the value of the boolean expression w.r.t. the dictionary of a configuration (its `m_dict` field),
+ without building any evaluation result nor reason:
+ for a linked expression `e` and a configuration `conf` linked to the same feature model,
+ `bool(e.compile()(conf.m_dict))` is `bool(e(conf))`.
+    """
+    return self._compile__(tuple(el.compile() for el in self.m_content))
+
+  def _compile__(self, subs):
+    # generic version: the subclasses with a common arity override it with a specialized closure
+    compute = self._compute__
+    return (lambda d: compute(tuple(f(d) for f in subs)))
+
   @staticmethod
   def _manage_parameter__(param):
     if(isinstance(param, _expbool__c)):
@@ -92,6 +107,14 @@ Evaluates the value of the boolean expression w.r.t. the product in parameter
     res.__class__ = self.__class__
     return res
 
+  def map_vars(self, f):
+    """map_vars(callable) -> _expbool__c
+Returns a copy of the boolean expression, where every variable `v` is replaced by `f(v)`
+    """
+    res = _expbool__c(tuple(map((lambda sub: sub.map_vars(f)), self.m_content)))
+    res.__class__ = self.__class__
+    return res
+
   ## feature model API
 
   def check(self): return decl_errors__c()
@@ -168,6 +191,7 @@ class Var(_expbool__c):
 The parameter is the id of the variable
     """
     self.m_content = var
+    self.m_vars = None
   def __call__(self, product, idx=None, expected=True):
     global _empty__
     res = product.get(self.m_content, _empty__)
@@ -179,10 +203,17 @@ The parameter is the id of the variable
     return eval_result__c(res, reason)
   def __str__(self): return f"Var({self.m_content})"
 
+  def compile(self):
+    key = self.m_content
+    return (lambda d: d.get(key, _empty__))
+
   def link(self, location, resolver, errors):
     resolver = lookup_wrapper__c(resolver, location)
     return Var(resolver.resolve(self.m_content, location, errors, self.m_content))
 
+  def map_vars(self, f):
+    return Var(f(self.m_content))
+
   def _vars_update(self, s):
     s.add(self.m_content)
 
@@ -199,18 +230,30 @@ class Lit(_expbool__c):
 The parameter is the wrapped object
     """
     self.m_content = var
+    self.m_vars = None
   def __call__(self, product, idx=None, expected=True):
     return eval_result__c(self.m_content, None)
   def __str__(self): return f"Lit({self.m_content})"
 
+  def compile(self):
+    value = self.m_content
+    return (lambda d: value)
+
   def link(self, location, resolver, errors):
     return self
 
+  def map_vars(self, f):
+    return self
+
   def _vars_update(self, s): pass
 
 ##########################################
 # 3. constraint over non-booleans
 
+def _compile_binary__(op, subs):
+  f_left, f_right = subs
+  return (lambda d: op(f_left(d), f_right(d)))
+
 class Lt(_expbool__c):
   """Class for the < comparison"""
   __slots__ = ()
@@ -219,6 +262,7 @@ class Lt(_expbool__c):
   def _compute__(self, values):
     return (values[0] < values[1])
   def _get_expected__(self, el, idx, expected): return None
+  def _compile__(self, subs): return _compile_binary__(operator.lt, subs)
       
 class Leq(_expbool__c):
   """Class for the <= comparison"""
@@ -228,6 +272,7 @@ class Leq(_expbool__c):
   def _compute__(self, values):
     return (values[0] <= values[1])
   def _get_expected__(self, el, idx, expected): return None
+  def _compile__(self, subs): return _compile_binary__(operator.le, subs)
 
 class Eq(_expbool__c):
   """Class for the == comparison"""
@@ -237,6 +282,7 @@ class Eq(_expbool__c):
   def _compute__(self, values):
     return (values[0] == values[1])
   def _get_expected__(self, el, idx, expected): return None
+  def _compile__(self, subs): return _compile_binary__(operator.eq, subs)
 
 class Geq(_expbool__c):
   """Class for the >= comparison"""
@@ -246,6 +292,7 @@ class Geq(_expbool__c):
   def _compute__(self, values):
     return (values[0] >= values[1])
   def _get_expected__(self, el, idx, expected): return None
+  def _compile__(self, subs): return _compile_binary__(operator.ge, subs)
 
 class Gt(_expbool__c):
   """Class for the > comparison"""
@@ -256,6 +303,7 @@ class Gt(_expbool__c):
     # print(f"Gt._compute__({values})")
     return (values[0] > values[1])
   def _get_expected__(self, el, idx, expected): return None
+  def _compile__(self, subs): return _compile_binary__(operator.gt, subs)
 
 ##########################################
 # 4. boolean operators
@@ -267,6 +315,15 @@ class And(_expbool__c):
     _expbool__c.__init__(self, args)
   def _compute__(self, values):
     return all(values)
+  def _compile__(self, subs):
+    if(len(subs) == 0): return (lambda d: True)
+    elif(len(subs) == 1):
+      f = subs[0]
+      return (lambda d: bool(f(d)))
+    elif(len(subs) == 2):
+      f_left, f_right = subs
+      return (lambda d: bool(f_left(d) and f_right(d)))
+    else: return (lambda d: all(f(d) for f in subs))
   def _get_expected__(self, el, idx, expected):
     if(expected is True): return True
     else: return None
@@ -296,6 +353,15 @@ class Or(_expbool__c):
     _expbool__c.__init__(self, args)
   def _compute__(self, values):
     return any(values)
+  def _compile__(self, subs):
+    if(len(subs) == 0): return (lambda d: False)
+    elif(len(subs) == 1):
+      f = subs[0]
+      return (lambda d: bool(f(d)))
+    elif(len(subs) == 2):
+      f_left, f_right = subs
+      return (lambda d: bool(f_left(d) or f_right(d)))
+    else: return (lambda d: any(f(d) for f in subs))
   def _get_expected__(self, el, idx, expected):
     if(expected is not False): return None
     else: return False
@@ -321,6 +387,9 @@ class Not(_expbool__c):
     _expbool__c.__init__(self, (arg,))
   def _compute__(self, values):
     return not values[0]
+  def _compile__(self, subs):
+    f = subs[0]
+    return (lambda d: not f(d))
   def _get_expected__(self, el, idx, expected):
     if(expected is True): return False
     elif(expected is False): return True
@@ -402,6 +471,9 @@ class Implies(_expbool__c):
     _expbool__c.__init__(self, (left, right,))
   def _compute__(self, values):
     return ((not values[0]) or values[1])
+  def _compile__(self, subs):
+    f_left, f_right = subs
+    return (lambda d: (not f_left(d)) or f_right(d))
   def _get_expected__(self, el, idx, expected):
     return None
   def add_to_dimacs(self, dimacs_obj):
@@ -424,6 +496,7 @@ class Iff(_expbool__c):
     _expbool__c.__init__(self, (left, right,))
   def _compute__(self, values):
     return (values[0] == values[1])
+  def _compile__(self, subs): return _compile_binary__(operator.eq, subs)
   def _get_expected__(self, el, idx, expected):
     return None
   def add_to_dimacs(self, dimacs_obj):
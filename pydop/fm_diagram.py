@@ -26,7 +26,7 @@ import inspect
 
 from pydop.fm_result import decl_errors__c, reason_tree__c, eval_result__c
 from pydop.fm_constraint import _expbool__c, Var, Lit
-from pydop.fm_configuration import configuration__c
+from pydop.fm_configuration import configuration__c, frozen_configuration__c
 
 from pydop.utils import _empty__, path__c, lookup__c, domain__c
 from pydop.utils import dimacs__c, anot
@@ -61,7 +61,7 @@ Parameters:
 
 class _fdattribute_c(object):
   """This is the super class of all attribute specification"""
-  pass
+  __slots__ = ()
 
 class Class(_fdattribute_c):
   """This specification enforce that the attribute must be of a specific class"""
@@ -163,9 +163,13 @@ class _fd__c(object):
     # the following fields are generated only at the root feature of a FD
     "m_lookup",   # mapping {name: [(feature_obj, path)]}: the keys are all the feature/attributes names in the current tree, and the list are all the elements having that name, with their relative path (in tuple format)
     "m_dom",      # mapping {feature_obj -> path}: lists all the features/attributes in the current, and give their path (in string format)
+    "m_compiled", # None, or the fm_analysis.compiled_fm__c version of the FD (computed on demand)
     # the following field is only used at the root feature of a FD during its evaluation
     "m_errors",   # a reason_tree__c object listing all the errors encountered during the evaluation of the FD
   )
+  __slots__ = __slots_main__ + (
+    "m_tags",     # None, or the mapping {name: value} of the user-defined tags of the feature (accessible as attributes)
+  )
 
   ##########################################
   # constructor API
@@ -183,13 +187,21 @@ Parameters:
     self.attributes = attributes
 
     global __fd__c_slots_core__ # all the attributes/methods that should not be redefined by the user
-    for key, value in tags.items():
+    for key in tags.keys():
       if(key in __fd__c_slots_core__):
         raise ValueError(f"ERROR: a Feature constructor keyworded parameter cannot be a reserved name (found '{key}')")
-      else:
-        setattr(self, key, value)
+    self.m_tags = (tags if(tags) else None)
     self.clean()
 
+  def __getattr__(self, name):
+    # only called when `name` is not a slot nor a method: look for a user-defined tag
+    tags = object.__getattribute__(self, "m_tags")
+    if(tags is not None):
+      res = tags.get(name, _empty__)
+      if(res is not _empty__):
+        return res
+    raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
   @staticmethod
   def _manage_constructor_args__(*args, **kwargs):
     """This static method extracts from the constructor's inputs the different fields of the Feature
@@ -212,7 +224,7 @@ Parameters:
         children.append(el)
       else:
         ctcs.append(el)
-    return name, children, ctcs, attributes, kwargs
+    return name, tuple(children), ctcs, attributes, kwargs
 
   @staticmethod
   def _manage_parameter__(param):
@@ -251,6 +263,7 @@ Returns if the feature is a leaf (i.e., has no sub-trees)
     self.m_lookup = None
     self.m_dom    = None
     self.m_errors = None
+    self.m_compiled = None
 
   def check(self):
     """check() -> decl_errors__c
@@ -303,7 +316,57 @@ Computes the lookup mapping (i.e., the mapping partial path -> feature) for this
     v_local = is_true_d.get(self, _empty__)
     if(v_local is _empty__): self._close_configuration_2__(False, is_true_d, res)
     else: self._close_configuration_2__(v_local[0], is_true_d, res)
-    return (configuration__c(res, self.m_lookup.resolve, names), errors)
+    return (frozen_configuration__c(res, self.m_lookup.resolve, names), errors)
+
+  def export_configuration(self, conf):
+    """export_configuration(configuration__c) -> dict[str, object]
+Returns the content of a configuration linked to this feature model as a dictionary
+ mapping the full path (in string format) of each of its variables to its value.
+    """
+    self._check_lookup_("export a configuration")
+    dom = self.m_dom
+    return {str(dom.get(key, key)): value for key, value in conf.items()}
+
+  def freeze(self):
+    """freeze() -> fm_frozen.frozen_fd__c
+Returns a compact and immutable version of this checked feature model,
+ where the tree is stored in parallel arrays instead of feature objects.
+    """
+    from pydop.fm_frozen import frozen_fd__c
+    self._check_lookup_("be frozen")
+    return frozen_fd__c(self)
+
+  def fingerprint(self):
+    """fingerprint() -> str
+Returns a hash of the structure of this checked feature model (see `fm_frozen.frozen_fd__c.fingerprint`)
+    """
+    return self.freeze().fingerprint()
+
+  def compiled(self):
+    """compiled() -> fm_analysis.compiled_fm__c
+Returns the translation of this checked feature model into a CNF problem (computed once, on demand)
+    """
+    if(self.m_compiled is None):
+      from pydop.fm_analysis import compiled_fm__c
+      self._check_lookup_("be compiled")
+      self.m_compiled = compiled_fm__c(self)
+    return self.m_compiled
+
+  def explain(self, conf):
+    """explain(configuration__c | dict) -> fm_result.explanation__c
+Returns a minimal explanation of why the configuration in parameter is not a valid product of this feature model
+ (i.e., a minimal subset of the constraints of the feature model and of the values of the configuration that contradict each other).
+Contrary to the reason computed by `__call__`, its size does not depend on the size of the feature model.
+    """
+    return self.compiled().explain(conf)
+
+  def repair(self, conf, cost=None):
+    """repair(configuration__c | dict, None | number | dict | callable) -> frozen_configuration__c | None
+Returns the valid product that is the closest to the (possibly partial or invalid) configuration in parameter,
+ w.r.t. the Hamming distance over its features weighted by `cost` (see `fm_analysis.compiled_fm__c.repair`).
+Returns None if there is no such product.
+    """
+    return self.compiled().repair(conf, cost)
 
   def _check_lookup_(self, op):
     # 1. check if the lookup was computed
@@ -404,12 +467,17 @@ Computes the lookup mapping (i.e., the mapping partial path -> feature) for this
         reason.add_reason_value_mismatch(att, res, expected)
         return eval_result__c(res, reason)
 
-  def _compute__(self, values, nvalue):
+  @staticmethod
+  def _compute__(values, nvalue):
     raise NotImplementedError()
-  def _get_expected__(self, el, i, expected):
+  @staticmethod
+  def _get_expected__(el, i, expected):
     raise NotImplementedError()
-  def _infer_sv__(self, is_true_d):
+  @staticmethod
+  def _infer_sv_keys__(key, subs, is_true_d):
     raise NotImplementedError()
+  def _infer_sv__(self, is_true_d):
+    return self._infer_sv_keys__(self, self.children, is_true_d)
 
 
   ##########################################
@@ -544,7 +612,7 @@ Currently, this method is only implemented for feature models without attributes
 
 
 __fd__c_slots_core__ = frozenset(itertools.chain(
-  _fd__c.__slots_main__,
+  _fd__c.__slots__,
   tuple(x[0] for x in inspect.getmembers(_fd__c, predicate=inspect.isfunction))
 ))
 
@@ -552,62 +620,77 @@ __fd__c_slots_core__ = frozenset(itertools.chain(
 # 2. FD groups
 
 class FDAnd(_fd__c):
+  __slots__ = ()
   def __init__(self, *args, **kwargs):
     _fd__c.__init__(self, *args, **kwargs)
-  def _compute__(self, values, nvalue):
+  @staticmethod
+  def _compute__(values, nvalue):
     return all(values)
-  def _get_expected__(self, el, i, expected):
+  @staticmethod
+  def _get_expected__(el, i, expected):
     return (True if(expected) else None)
-  def _infer_sv__(self, is_true_d):
-    idx, value = self._make_product_extract_utils__(is_true_d, itertools.chain((self,), self.children), expected=None)
+  @staticmethod
+  def _infer_sv_keys__(key, subs, is_true_d):
+    idx, value = _fd__c._make_product_extract_utils__(is_true_d, itertools.chain((key,), subs), expected=None)
     def get_default(el):
       val = is_true_d.get(el, _empty__)
       if((val is _empty__) or (val[1] < idx)):
         return value
       else:
         return val[0]
-    v_local = get_default(self)
-    return idx, v_local, tuple(get_default(sub) for sub in self.children)
-  def _to_dimacs_content_(self, vroot, it, dimacs_obj):
+    v_local = get_default(key)
+    return idx, v_local, tuple(get_default(sub) for sub in subs)
+  @staticmethod
+  def _to_dimacs_content_(vroot, it, dimacs_obj):
     for vsub in it:
       dimacs_obj.add_clause( (vroot, anot (vsub),) )
       dimacs_obj.add_clause( (anot (vroot), vsub,) )
 
 class FDAny(_fd__c):
+  __slots__ = ()
   def __init__(self, *args, **kwargs):
     _fd__c.__init__(self, *args, **kwargs)
-  def _compute__(self, values, nvalue):
+  @staticmethod
+  def _compute__(values, nvalue):
     return True
-  def _get_expected__(self, el, i, expected):
+  @staticmethod
+  def _get_expected__(el, i, expected):
     return None
-  def _infer_sv__(self, is_true_d):
-    # tuple((is_true_d.get(sub, (_empty__, -1))[0]) for sub in self.children)
-    idx_subs, v_subs = self._make_product_extract_utils__(is_true_d, self.children)
-    v_local, idx_local = is_true_d.get(self, (False, -1))
+  @staticmethod
+  def _infer_sv_keys__(key, subs, is_true_d):
+    # tuple((is_true_d.get(sub, (_empty__, -1))[0]) for sub in subs)
+    idx_subs, v_subs = _fd__c._make_product_extract_utils__(is_true_d, subs)
+    v_local, idx_local = is_true_d.get(key, (False, -1))
     if(idx_subs > idx_local):
       idx_local = idx_subs
       v_local = True
     return idx_local, v_local, v_subs
-  def _to_dimacs_content_(self, vroot, it, dimacs_obj):
+  @staticmethod
+  def _to_dimacs_content_(vroot, it, dimacs_obj):
     for vsub in it:
       dimacs_obj.add_clause( (vroot, anot (vsub),) )
 
 class FDOr(_fd__c):
+  __slots__ = ()
   def __init__(self, *args, **kwargs):
     _fd__c.__init__(self, *args, **kwargs)
-  def _compute__(self, values, nvalue):
+  @staticmethod
+  def _compute__(values, nvalue):
     return any(values)
-  def _get_expected__(self, el, i, expected):
+  @staticmethod
+  def _get_expected__(el, i, expected):
     return (False if(not expected) else None)
-  def _infer_sv__(self, is_true_d):
-    # tuple((is_true_d.get(sub, (_empty__, -1))[0]) for sub in self.children)
-    idx_subs, v_subs = self._make_product_extract_utils__(is_true_d, self.children)
-    v_local, idx_local = is_true_d.get(self, (False, -1))
+  @staticmethod
+  def _infer_sv_keys__(key, subs, is_true_d):
+    # tuple((is_true_d.get(sub, (_empty__, -1))[0]) for sub in subs)
+    idx_subs, v_subs = _fd__c._make_product_extract_utils__(is_true_d, subs)
+    v_local, idx_local = is_true_d.get(key, (False, -1))
     if(idx_subs > idx_local):
       idx_local = idx_subs
       v_local = True
     return idx_local, v_local, v_subs
-  def _to_dimacs_content_(self, vroot, it, dimacs_obj):
+  @staticmethod
+  def _to_dimacs_content_(vroot, it, dimacs_obj):
     vsubs = list(it)
     for vsub in vsubs:
       dimacs_obj.add_clause( (vroot, anot (vsub),) )
@@ -615,27 +698,32 @@ class FDOr(_fd__c):
     dimacs_obj.add_clause( vsubs )
 
 class FDXor(_fd__c):
+  __slots__ = ()
   def __init__(self, *args, **kwargs):
     _fd__c.__init__(self, *args, **kwargs)
-  def _compute__(self, values, nvalue):
+  @staticmethod
+  def _compute__(values, nvalue):
     res = False
     for element in values:
       if(element):
         if(res): return False
         else: res = True
     return res
-  def _get_expected__(self, el, i, expected):
+  @staticmethod
+  def _get_expected__(el, i, expected):
     return None
-  def _infer_sv__(self, is_true_d):
-    idx_subs, v_subs = self._make_product_extract_utils__(is_true_d, self.children)
-    v_local, idx_local = is_true_d.get(self, (False, -1))
+  @staticmethod
+  def _infer_sv_keys__(key, subs, is_true_d):
+    idx_subs, v_subs = _fd__c._make_product_extract_utils__(is_true_d, subs)
+    v_local, idx_local = is_true_d.get(key, (False, -1))
     if(idx_subs > idx_local):
       idx_local = idx_subs
       v_local = True
     if(idx_subs > -1):
-      v_subs = tuple((is_true_d.get(sub, (False, -1)) == (True, idx_subs)) for sub in self.children)
+      v_subs = tuple((is_true_d.get(sub, (False, -1)) == (True, idx_subs)) for sub in subs)
     return idx_local, v_local, v_subs
-  def _to_dimacs_content_(self, vroot, it, dimacs_obj):
+  @staticmethod
+  def _to_dimacs_content_(vroot, it, dimacs_obj):
     vsubs = list(it)
     for i, vsub in enumerate(vsubs):
       dimacs_obj.add_clause( (vroot, anot (vsub),) )
@@ -647,8 +735,8 @@ class FDXor(_fd__c):
 ##########################################
 # 3. FD aliases
 
-class FD(FDAnd): pass
-class FDMandatory(FDAnd): pass
-class FDOptional(FDAny): pass
-class FDAlternative(FDXor): pass
+class FD(FDAnd): __slots__ = ()
+class FDMandatory(FDAnd): __slots__ = ()
+class FDOptional(FDAny): __slots__ = ()
+class FDAlternative(FDXor): __slots__ = ()
 
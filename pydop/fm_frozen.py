@@ -0,0 +1,383 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+#
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+"""
+This file contains the class `frozen_fd__c`, a compact and immutable representation of a checked feature model.
+The nodes of the feature tree are numbered in breadth-first order (so the children of a node are contiguous),
+ and all their data is stored in parallel arrays indexed by that number.
+In a frozen feature model, every variable (feature or attribute) is identified by its full path (a `utils.path__c` object),
+ which is what the configurations linked to this feature model use as keys.
+A frozen feature model has the same API as a checked feature diagram (`link_constraint`, `link_configuration`,
+ `close_configuration`, `__call__` and `to_dimacs`), and can be used in place of it, e.g., in an SPL.
+"""
+
+import itertools
+import hashlib
+from array import array
+
+from pydop.fm_result import decl_errors__c, reason_flat__c
+from pydop.fm_result import _REASON_VALUE_MISMATCH, _REASON_VALUE_NONE, _REASON_DEPENDENCIES
+from pydop.fm_constraint import _expbool__c
+from pydop.fm_configuration import configuration__c, frozen_configuration__c
+from pydop.fm_diagram import _eval_result_fd__c, FDAnd, FDAny, FDOr, FDXor
+
+from pydop.utils import _empty__, path__c, lookup__c, dimacs__c
+
+
+################################################################################
+# node kinds
+################################################################################
+
+"""The feature group classes, in the order of their kind codes"""
+_kinds__ = (FDAnd, FDAny, FDOr, FDXor,)
+
+def _kind_of__(fd):
+  """_kind_of__(_fd__c) -> int
+Returns the kind code of the feature in parameter
+  """
+  for i, cls in enumerate(_kinds__):
+    if(isinstance(fd, cls)): return i
+  raise ValueError(f"ERROR: cannot freeze a feature of class \"{type(fd).__name__}\"")
+
+
+################################################################################
+# frozen feature model
+################################################################################
+
+class frozen_fd__c(object):
+  """Compact and immutable version of a checked feature model (created with the `_fd__c.freeze` method)"""
+  __slots__ = (
+    "m_kinds",       # array[int]: the kind code of every node
+    "m_parents",     # array[int]: the index of the parent of every node (-1 for the root)
+    "m_child_start", # array[int]: the index of the first child of every node
+    "m_child_end",   # array[int]: the index following the last child of every node
+    "m_names",       # tuple[str | None]: the name of every node
+    "m_paths",       # tuple[path__c]: the full path of every node (the key of the node in configurations)
+    "m_att_start",   # array[int]: the index of the first attribute of every node
+    "m_att_end",     # array[int]: the index following the last attribute of every node
+    "m_att_names",   # tuple[str]: the name of every attribute
+    "m_att_specs",   # tuple[_fdattribute_c]: the specification of every attribute
+    "m_att_paths",   # tuple[path__c]: the full path of every attribute (the key of the attribute in configurations)
+    "m_ctc_start",   # array[int]: the index of the first cross-tree constraint of every node
+    "m_ctc_end",     # array[int]: the index following the last cross-tree constraint of every node
+    "m_ctcs",        # tuple[_expbool__c]: the cross-tree constraints, whose variables are paths
+    "m_lookup",      # lookup__c: the name resolver of the feature model
+    "m_compiled",    # None, or the fm_analysis.compiled_fm__c version of the feature model (computed on demand)
+  )
+
+  def __init__(self, fm):
+    """frozen_fd__c(_fd__c) -> frozen_fd__c
+Creates the frozen version of the checked feature model in parameter
+    """
+    dom = fm.m_dom
+    # 1. breadth-first numbering of the nodes
+    nodes = [fm]
+    parents = [-1]
+    child_start = array('l')
+    child_end = array('l')
+    i = 0
+    while(i < len(nodes)):
+      child_start.append(len(nodes))
+      for sub in nodes[i].children:
+        nodes.append(sub)
+        parents.append(i)
+      child_end.append(len(nodes))
+      i += 1
+    # 2. fill the arrays
+    att_start, att_end = array('l'), array('l')
+    ctc_start, ctc_end = array('l'), array('l')
+    atts = []
+    ctcs = []
+    f_var = (lambda v: dom.get(v, v))
+    for node in nodes:
+      att_start.append(len(atts))
+      atts.extend(node.attributes)
+      att_end.append(len(atts))
+      ctc_start.append(len(ctcs))
+      ctcs.extend(ctc.map_vars(f_var) for ctc in node.ctcs)
+      ctc_end.append(len(ctcs))
+
+    self.m_kinds = array('b', map(_kind_of__, nodes))
+    self.m_parents = array('l', parents)
+    self.m_child_start = child_start
+    self.m_child_end = child_end
+    self.m_names = tuple(node.name for node in nodes)
+    self.m_paths = tuple(dom[node] for node in nodes)
+    self.m_att_start = att_start
+    self.m_att_end = att_end
+    self.m_att_names = tuple(att[0] for att in atts)
+    self.m_att_specs = tuple(att[1] for att in atts)
+    self.m_att_paths = tuple(dom[att] for att in atts)
+    self.m_ctc_start = ctc_start
+    self.m_ctc_end = ctc_end
+    self.m_ctcs = tuple(ctcs)
+    # 3. the lookup, where every variable is identified by its path
+    errors = decl_errors__c()
+    self.m_lookup = lookup__c()
+    for path in itertools.chain(self.m_paths, self.m_att_paths):
+      self.m_lookup.insert(path, path, errors)
+    self.m_compiled = None
+
+  ##########################################
+  # base API
+
+  def __len__(self):
+    """Returns the number of nodes in the feature model"""
+    return len(self.m_kinds)
+
+  def check(self):
+    """check() -> decl_errors__c
+A frozen feature model is always well defined: returns an empty list of errors.
+    """
+    return decl_errors__c()
+
+  def link_constraint(self, c):
+    errors = decl_errors__c()
+    c = _expbool__c._manage_parameter__(c)
+    res = c.link(path__c(()), self.m_lookup, errors)
+    return (res, errors)
+
+  def link_configuration(self, conf):
+    errors = decl_errors__c()
+    res = self._link_configuration__(conf, errors)
+    return (res, errors)
+
+  def _link_configuration__(self, conf, errors):
+    if(isinstance(conf, dict)):
+      conf = configuration__c(conf)
+    elif(not isinstance(conf, configuration__c)):
+      raise ValueError(f"ERROR: a configuration must be either a configuration__c or a dict (found {type(conf)})")
+    return conf.link(self.m_lookup)
+
+  def export_configuration(self, conf):
+    """export_configuration(configuration__c) -> dict[str, object]
+Returns the content of a configuration linked to this feature model as a dictionary
+ mapping the full path (in string format) of each of its variables to its value.
+    """
+    return {str(key): value for key, value in conf.items()}
+
+  def compiled(self):
+    """compiled() -> fm_analysis.compiled_fm__c
+Returns the translation of this feature model into a CNF problem (computed once, on demand)
+    """
+    if(self.m_compiled is None):
+      from pydop.fm_analysis import compiled_fm__c
+      self.m_compiled = compiled_fm__c(self)
+    return self.m_compiled
+
+  def fingerprint(self):
+    """fingerprint() -> str
+Returns a hash (in hexadecimal format) of the structure of this feature model:
+ its tree, the names of its features and attributes, the specification of its attributes and its cross-tree constraints.
+Two feature models with the same fingerprint have the same products, which are stored with the same keys.
+    """
+    h = hashlib.sha256()
+    for data in (self.m_kinds, self.m_parents, self.m_att_start, self.m_att_end, self.m_ctc_start, self.m_ctc_end):
+      h.update(data.tobytes())
+      h.update(b"\0")
+    for data in (self.m_names, self.m_att_names, self.m_att_specs, self.m_ctcs):
+      for el in data:
+        h.update(str(el).encode())
+        h.update(b"\0")
+      h.update(b"\1")
+    return h.hexdigest()
+
+  def explain(self, conf):
+    """explain(configuration__c | dict) -> fm_result.explanation__c
+Returns a minimal explanation of why the configuration in parameter is not a valid product of this feature model
+    """
+    return self.compiled().explain(conf)
+
+  def repair(self, conf, cost=None):
+    """repair(configuration__c | dict, None | number | dict | callable) -> frozen_configuration__c | None
+Returns the valid product that is the closest to the (possibly partial or invalid) configuration in parameter,
+ w.r.t. the Hamming distance over its features weighted by `cost` (see `fm_analysis.compiled_fm__c.repair`).
+Returns None if there is no such product.
+    """
+    return self.compiled().repair(conf, cost)
+
+  ##########################################
+  # call API
+
+  def __call__(self, conf, expected=True):
+    reason = reason_flat__c(self._ref_name__)
+    value, nvalue, snodes = self._eval__(0, conf, expected, reason)
+    paths = self.m_paths
+    return _eval_result_fd__c(value, (reason if(reason) else None), nvalue, tuple(paths[j] for j in snodes))
+
+  def _ref_name__(self, ref):
+    # references of reasons: the nodes, followed by the attributes
+    nb_nodes = len(self.m_kinds)
+    return self.m_paths[ref] if(ref < nb_nodes) else self.m_att_paths[ref - nb_nodes]
+
+  def _eval__(self, i, conf, expected, reason):
+    """Evaluates the node `i`: returns its value, its nvalue and its selected named sub-nodes, and adds its errors to `reason`"""
+    kind = _kinds__[self.m_kinds[i]]
+    f_expected = kind._get_expected__
+    start = len(reason.m_codes)
+
+    nvalue_subs = []
+    value_subs = True
+    snodes = []
+    for j in range(self.m_child_start[i], self.m_child_end[i]):
+      v, nv, sn = self._eval__(j, conf, f_expected(j, j, expected), reason)
+      nvalue_subs.append(nv)
+      value_subs = value_subs and v
+      snodes.extend(sn)
+    for j in range(self.m_att_start[i], self.m_att_end[i]):
+      nvalue_subs.append(self._eval_attribute__(i, j, conf, f_expected(j, j, expected), reason))
+    ctc_start = self.m_ctc_start[i]
+    for j in range(ctc_start, self.m_ctc_end[i]):
+      res = self.m_ctcs[j](conf, j - ctc_start, f_expected(j, j, expected))
+      nvalue_subs.append(res.m_value)
+      if((res.m_reason is not None) and bool(res.m_reason)):
+        reason.add_reason_tree(res.m_reason)
+    nvalue_sub = kind._compute__(nvalue_subs, None)
+
+    # check consistency with name
+    has_reason = True
+    if(self.m_names[i] is not None):
+      path = self.m_paths[i]
+      nvalue_local = conf.get(path, _empty__)
+      if(nvalue_local is _empty__):
+        reason.add_reason(_REASON_VALUE_NONE, i)
+      elif((not nvalue_local) and snodes):
+        reason.add_reason(_REASON_DEPENDENCIES, i, tuple(snodes))
+      elif(nvalue_local and (not nvalue_sub)):
+        reason.add_reason(_REASON_VALUE_MISMATCH, i, True, False)
+      else:
+        has_reason = False
+        if(nvalue_local): snodes.append(i)
+    else:
+      nvalue_local = nvalue_sub
+      has_reason = False
+
+    value = value_subs and (not has_reason)
+
+    if((nvalue_local != expected) or (not value)):
+      if((nvalue_local != expected)):
+        reason.add_reason(_REASON_VALUE_MISMATCH, i, nvalue_local, expected)
+      reason.close_node(i, start)
+    else: # no error: the reasons of the sub-nodes are not kept
+      reason.truncate(start)
+
+    return (value, nvalue_local, snodes)
+
+  def _eval_attribute__(self, i, j, conf, expected, reason):
+    att_path = self.m_att_paths[j]
+    value = conf.get(att_path, _empty__)
+    start = len(reason.m_codes)
+    if(value is _empty__):
+      reason.add_reason(_REASON_VALUE_NONE, len(self.m_kinds) + j)
+      reason.close_node(i, start)
+      return False
+    else:
+      res = self.m_att_specs[j](value)
+      if(expected != res):
+        reason.add_reason(_REASON_VALUE_MISMATCH, len(self.m_kinds) + j, res, expected)
+        reason.close_node(i, start)
+      return res
+
+  ##########################################
+  # configuration closure
+
+  def close_configuration(self, *confs):
+    errors = decl_errors__c()
+    is_true_d = {}
+    names = {}
+    for i, conf in enumerate(confs):
+      conf = self._link_configuration__(conf, errors)
+      conf_dict = conf.m_dict
+      for k, v in conf_dict.items():
+        is_true_d[k] = (v, i)
+        names[k] = conf.m_names.get(k, k)
+    self._close_configuration_1__(0, is_true_d)
+    res = {}
+    v_local = is_true_d.get(self.m_paths[0], _empty__)
+    if(v_local is _empty__): self._close_configuration_2__(0, False, is_true_d, res)
+    else: self._close_configuration_2__(0, v_local[0], is_true_d, res)
+    return (frozen_configuration__c(res, self.m_lookup.resolve, names), errors)
+
+  def _infer_sv__(self, i, is_true_d):
+    subs = self.m_paths[self.m_child_start[i]:self.m_child_end[i]]
+    return _kinds__[self.m_kinds[i]]._infer_sv_keys__(self.m_paths[i], subs, is_true_d)
+
+  def _make_product_update__(self, i, is_true_d, idx, v_local, v_subs):
+    if(v_local is not _empty__):
+      is_true_d[self.m_paths[i]] = (v_local, idx)
+    for sub, v_sub in zip(self.m_paths[self.m_child_start[i]:self.m_child_end[i]], v_subs):
+      if(v_sub is not _empty__):
+        is_true_d[sub] = (v_sub, idx)
+
+  def _close_configuration_1__(self, i, is_true_d):
+    idx, v_local, v_subs = self._infer_sv__(i, is_true_d)
+    self._make_product_update__(i, is_true_d, idx, v_local, v_subs)
+    for j in range(self.m_child_start[i], self.m_child_end[i]):
+      self._close_configuration_1__(j, is_true_d)
+    idx, v_local, v_subs = self._infer_sv__(i, is_true_d)
+    self._make_product_update__(i, is_true_d, idx, v_local, v_subs)
+
+  def _close_configuration_2__(self, i, v_local, is_true_d, res):
+    _, _, v_subs = self._infer_sv__(i, is_true_d)
+    res[self.m_paths[i]] = v_local
+    for j, v_sub in zip(range(self.m_child_start[i], self.m_child_end[i]), v_subs):
+      if(v_sub is _empty__):
+        self._close_configuration_2__(j, False, is_true_d, res)
+      else:
+        self._close_configuration_2__(j, v_sub, is_true_d, res)
+    # if feature selected, need to include the attribute
+    if(v_local):
+      for att_path in self.m_att_paths[self.m_att_start[i]:self.m_att_end[i]]:
+        v = is_true_d.get(att_path, _empty__)
+        if(v is not _empty__):
+          res[att_path] = v[0]
+
+  ##########################################
+  # DIMACS API
+
+  def to_dimacs(self):
+    """to_dimacs() -> utils.dimacs__c
+Translates the feature model in a CNF problem in the dimacs format.
+Like for feature diagrams, this method is only implemented for feature models without attributes (otherwise, NotImplementedError is raised).
+    """
+    dimacs_obj = dimacs__c()
+    root = self.m_paths[0]
+    vroot = dimacs_obj.get(root)
+    dimacs_obj.add_comment(f"root feature {root} => {vroot}")
+    dimacs_obj.add_clause( (vroot,) ) # the root must be true
+    self._to_dimacs__(0, dimacs_obj)
+    return dimacs_obj
+
+  def _to_dimacs__(self, i, dimacs_obj):
+    path = self.m_paths[i]
+    if(i != 0):
+      dimacs_obj.add_comment(f"feature {path} => {dimacs_obj.get(path)}")
+    # manages content, cross-tree-constraints and attributes
+    it = itertools.chain(
+      map(dimacs_obj.get, self.m_paths[self.m_child_start[i]:self.m_child_end[i]]),
+      map((lambda ctc: ctc.add_to_dimacs(dimacs_obj)), self.m_ctcs[self.m_ctc_start[i]:self.m_ctc_end[i]])
+    )
+    if(self.m_att_start[i] != self.m_att_end[i]):
+      raise NotImplementedError()
+    _kinds__[self.m_kinds[i]]._to_dimacs_content_(dimacs_obj.get(path), it, dimacs_obj)
+    # iterate over content
+    for j in range(self.m_child_start[i], self.m_child_end[i]):
+      self._to_dimacs__(j, dimacs_obj)
@@ -27,6 +27,7 @@ and a wrapper class `eval_result__c` around `bool` that stores a tree of errors
 
 
 import itertools
+from array import array
 
 # from pydop.utils import _path_to_str__
 
@@ -192,65 +193,284 @@ class _reason_dependencies__c(object):
     return f"{self.m_ref} should be True due to dependencies (found: {tmp})"
 
 
+## compact representation of the local reasons: (code, ref, data_1, data_2)
+
+_REASON_VALUE_MISMATCH = 0 # (code, ref, value, expected)
+_REASON_VALUE_NONE     = 1 # (code, ref, None, None)
+_REASON_DEPENDENCIES   = 2 # (code, ref, deps, None)
+
+_reason_classes__ = (_reason_value_mismatch__c, _reason_value_none__c, _reason_dependencies__c)
+_reason_kinds__ = ("value_mismatch", "value_none", "dependencies")
+
+def _reason_to_str__(entry, f_ref):
+  code, ref, a, b = entry
+  if(code == _REASON_VALUE_MISMATCH):
+    if(b is None): return f"{f_ref(ref)} is {a}"
+    else: return f"{f_ref(ref)} is {a} (expected: {b})"
+  elif(code == _REASON_VALUE_NONE):
+    return f"{f_ref(ref)} has no value in the input configuration"
+  else:
+    tmp = ', '.join(f"\"{f_ref(el)}\"" for el in a)
+    return f"{f_ref(ref)} should be True due to dependencies (found: {tmp})"
+
+def _reason_to_object__(entry, f_ref):
+  code, ref, a, b = entry
+  if(code == _REASON_VALUE_MISMATCH): return _reason_value_mismatch__c(f_ref(ref), a, b)
+  elif(code == _REASON_VALUE_NONE): return _reason_value_none__c(f_ref(ref))
+  else: return _reason_dependencies__c(f_ref(ref), tuple(map(f_ref, a)))
+
+def _json_value__(value):
+  if((value is None) or isinstance(value, (bool, int, float, str))): return value
+  elif(isinstance(value, (tuple, list))): return [_json_value__(el) for el in value]
+  else: return str(value)
+
+def _reason_to_dict__(entry, f_ref):
+  code, ref, a, b = entry
+  res = {"kind": _reason_kinds__[code], "ref": str(f_ref(ref))}
+  if(code == _REASON_VALUE_MISMATCH):
+    res["value"] = _json_value__(a)
+    if(b is not None): res["expected"] = _json_value__(b)
+  elif(code == _REASON_DEPENDENCIES):
+    res["dependencies"] = [str(f_ref(el)) for el in a]
+  return res
+
+def _identity__(ref): return ref
+
+def _compose__(outer, inner):
+  if(inner is None): return outer
+  return (lambda ref: outer(inner(ref)))
+
+
+## rendering, shared by all the reason representations
+## a reason node `n` provides `n._view__(f_ref)`, returning its name, its local reasons with their name function, and its sub nodes with theirs
+
+def _reason_lines__(node, f_ref, indent, depth, max_depth):
+  ref, local, f_local, subs = node._view__(f_ref)
+  count = len(local) + len(subs)
+  if(count == 0):
+    return
+  elif((max_depth is not None) and (depth >= max_depth)):
+    yield f"{indent}{ref}: ... ({count} reasons)"
+  elif(count == 1):
+    prefix = f"{indent}{ref}: "
+    if(local):
+      yield prefix + _reason_to_str__(local[0], f_local)
+    else:
+      sub, f_sub = subs[0]
+      for line in _reason_lines__(sub, f_sub, indent, depth + 1, max_depth):
+        yield prefix + line
+        prefix = ""
+  else:
+    yield f"{indent}{ref}: ("
+    indent_more = f"{indent} "
+    for entry in local:
+      yield indent_more + _reason_to_str__(entry, f_local)
+    for sub, f_sub in subs:
+      yield from _reason_lines__(sub, f_sub, indent_more, depth + 1, max_depth)
+    yield f"{indent})"
+
+def _reason_dict__(node, f_ref, depth, max_depth):
+  ref, local, f_local, subs = node._view__(f_ref)
+  res = {"ref": str(ref)}
+  if((max_depth is not None) and (depth >= max_depth)):
+    res["truncated"] = len(local) + len(subs)
+  else:
+    res["reasons"] = [_reason_to_dict__(entry, f_local) for entry in local]
+    res["subs"] = [_reason_dict__(sub, f_sub, depth + 1, max_depth) for sub, f_sub in subs]
+  return res
+
+class _reason_render__c(object):
+  """Rendering API of the reason representations"""
+  __slots__ = ()
+  def render(self, max_depth=None, max_items=None):
+    """render(int, int) -> iterator[str]
+Yields the lines of the textual representation of the reason, one at a time.
+Parameters:
+  max_depth: the nodes below that depth are summarized by their number of reasons
+  max_items: the maximal number of lines generated (a last line "..." indicates that the output was truncated)
+    """
+    lines = _reason_lines__(self, _identity__, "", 0, max_depth)
+    if(max_items is None):
+      yield from lines
+    else:
+      yield from itertools.islice(lines, max_items)
+      if(next(lines, None) is not None):
+        yield "..."
+
+  def write(self, stream, max_depth=None, max_items=None):
+    """write(file, int, int) -> None
+Writes the textual representation of the reason in the stream in parameter (see `render`)
+    """
+    for line in self.render(max_depth, max_items):
+      stream.write(line)
+      stream.write("\n")
+
+  def to_dict(self, max_depth=None):
+    """to_dict(int) -> dict
+Returns the reason as a JSON-compatible dictionary {"ref": str, "reasons": list[dict], "subs": list[dict]},
+ where the nodes below `max_depth` are replaced by {"ref": str, "truncated": number of reasons}
+    """
+    return _reason_dict__(self, _identity__, 0, max_depth)
+
+  def __str__(self): return "\n".join(self.render())
+
+
 ## main class
 
-class reason_tree__c(object):
-  __slots__ = ("m_ref", "m_local", "m_subs", "m_count",)
+class reason_tree__c(_reason_render__c):
+  __slots__ = ("m_ref", "m_local", "m_subs", "m_count", "m_updater",)
   def __init__(self, name, idx):
     self.m_ref = f"[{idx}]" if(name is None) else name
-    self.m_local = []
+    self.m_local = []  # list of compact local reasons
     self.m_subs = []
     self.m_count = 0
+    self.m_updater = None # the ref updater, applied lazily when the tree is rendered
 
   def add_reason_value_mismatch(self, ref, val, expected=None):
-    # print(f"add_reason_value_mismatch({ref.name}, {val}, {expected})")
-    self.m_local.append(_reason_value_mismatch__c(ref, val, expected))
+    self.m_local.append((_REASON_VALUE_MISMATCH, ref, val, expected))
     self.m_count += 1
     return self
   def add_reason_value_none(self, ref):
-    # print(f"add_reason_value_none({ref})")
-    self.m_local.append(_reason_value_none__c(ref))
+    self.m_local.append((_REASON_VALUE_NONE, ref, None, None))
     self.m_count += 1
     return self
   def add_reason_dependencies(self, ref, deps):
-    # print(f"add_reason_dependencies({ref}, {deps})")
-    self.m_local.append(_reason_dependencies__c(ref, deps))
-    self.m_count += 1  
+    self.m_local.append((_REASON_DEPENDENCIES, ref, deps, None))
+    self.m_count += 1
     return self
   def add_reason_sub(self, sub):
-    # print(f"add_reason_sub({sub})")
     if((isinstance(sub, eval_result__c)) and (sub.m_reason is not None) and (bool(sub.m_reason))):
       self.m_subs.append(sub.m_reason)
       self.m_count += 1
     return self
 
   def update_ref(self, updater):
-    self.m_ref = updater(self.m_ref)
-    for el in itertools.chain(self.m_local, self.m_subs):
-      el.update_ref(updater)
+    """update_ref(callable) -> None
+Renames all the references in the tree with `updater` (the renaming is done lazily, when the tree is rendered)
+    """
+    self.m_updater = _compose__(updater, self.m_updater)
+
+  def _view__(self, f_ref):
+    if(self.m_updater is not None):
+      f_ref = _compose__(f_ref, self.m_updater)
+    return (f_ref(self.m_ref), self.m_local, f_ref, tuple((sub, f_ref) for sub in self.m_subs))
 
   def _tostring__(self, indent):
-    if(self.m_count == 0):
-      return ""
-    elif(self.m_count == 1):
-      if(self.m_local):
-        return f"{indent}{self.m_ref}: {self.m_local[0]}"
-      else:
-        return f"{indent}{self.m_ref}: {self.m_subs[0]._tostring__(indent)}"
-    else:
-      res = f"{indent}{self.m_ref}: (\n"
-      indent_more = f"{indent} "
-      for e in self.m_local:
-        res += f"{indent_more}{e}\n"
-      for s in self.m_subs:
-        res += s._tostring__(indent_more) + "\n"
-      res += f"{indent})"
-      return res
+    return "\n".join(_reason_lines__(self, _identity__, indent, 0, None))
 
   def __len__(self): return self.m_count
-  def __iter__(self): return itertools.chain(iter(self.m_local), iter(self.m_subs))
+  def __iter__(self):
+    f_ref = _identity__ if(self.m_updater is None) else self.m_updater
+    return itertools.chain((_reason_to_object__(entry, f_ref) for entry in self.m_local), iter(self.m_subs))
   def __bool__(self): return (self.m_count != 0)
-  def __str__(self): return self._tostring__("")
+
+
+## flat representation
+
+_FLAT_NODE = 3 # a node, closing the entries of its subtree
+_FLAT_TREE = 4 # a sub reason stored as a reason_tree__c
+
+class reason_flat__c(_reason_render__c):
+  """Compact reason tree, stored in flat arrays (used for the evaluation of frozen feature models).
+The entries are stored in post-order: the entries of the subtree of a node (its sub nodes, then its local reasons) precede it,
+ and every node stores the number of these entries.
+The references are integers, which are converted into names only when the reason is rendered.
+  """
+  __slots__ = ("m_codes", "m_refs", "m_sizes", "m_data", "m_names",)
+  def __init__(self, names):
+    """reason_flat__c(callable) -> reason_flat__c
+Creates an empty reason, where `names` converts the integer references into names
+    """
+    self.m_codes = array('b')
+    self.m_refs  = array('l')
+    self.m_sizes = array('l')
+    self.m_data  = []
+    self.m_names = names
+
+  ## construction API
+
+  def add_reason(self, code, ref, a=None, b=None):
+    """add_reason(int, int, object, object) -> None
+Adds a local reason to the node currently being built
+    """
+    self.m_codes.append(code)
+    self.m_refs.append(ref)
+    self.m_sizes.append(0)
+    self.m_data.append(None if((a is None) and (b is None)) else (a, b))
+
+  def add_reason_tree(self, tree):
+    """add_reason_tree(reason_tree__c) -> None
+Adds a sub reason, in the form of a reason tree, to the node currently being built
+    """
+    self.m_codes.append(_FLAT_TREE)
+    self.m_refs.append(-1)
+    self.m_sizes.append(0)
+    self.m_data.append(tree)
+
+  def close_node(self, ref, start):
+    """close_node(int, int) -> None
+Closes the node `ref`, whose entries start at position `start`
+    """
+    size = len(self.m_codes) - start
+    self.m_codes.append(_FLAT_NODE)
+    self.m_refs.append(ref)
+    self.m_sizes.append(size)
+    self.m_data.append(None)
+
+  def truncate(self, start):
+    """truncate(int) -> None
+Removes all the entries from position `start`
+    """
+    del self.m_codes[start:]
+    del self.m_refs[start:]
+    del self.m_sizes[start:]
+    del self.m_data[start:]
+
+  ## reason API
+
+  def update_ref(self, updater):
+    self.m_names = _compose__(updater, self.m_names)
+
+  def _view__(self, f_ref):
+    return _flat_node__c(self, len(self.m_codes) - 1)._view__(f_ref)
+
+  def __len__(self):
+    if(not self.m_codes): return 0
+    _, local, _, subs = self._view__(_identity__)
+    return len(local) + len(subs)
+  def __bool__(self): return (len(self.m_codes) != 0)
+
+class _flat_node__c(object):
+  """View on a node of a reason_flat__c"""
+  __slots__ = ("m_flat", "m_pos",)
+  def __init__(self, flat, pos):
+    self.m_flat = flat
+    self.m_pos = pos
+
+  def _view__(self, f_ref):
+    flat = self.m_flat
+    codes, refs, sizes, data = flat.m_codes, flat.m_refs, flat.m_sizes, flat.m_data
+    f_names = (lambda ref: f_ref(flat.m_names(ref)))
+    local = []
+    subs = []
+    pos = self.m_pos - 1
+    start = self.m_pos - sizes[self.m_pos]
+    while(pos >= start):
+      code = codes[pos]
+      if(code == _FLAT_NODE):
+        subs.append((_flat_node__c(flat, pos), f_ref))
+        pos -= sizes[pos] + 1
+      else:
+        if(code == _FLAT_TREE):
+          subs.append((data[pos], _identity__))
+        else:
+          a, b = (None, None) if(data[pos] is None) else data[pos]
+          if(code == _REASON_DEPENDENCIES): a = tuple(map(flat.m_names, a))
+          local.append((code, flat.m_names(refs[pos]), a, b))
+        pos -= 1
+    local.reverse()
+    subs.reverse()
+    return (f_names(refs[self.m_pos]), local, f_ref, subs)
 
 
 ################################################################################
@@ -265,3 +485,25 @@ class eval_result__c(object):
 
   def value(self): return self.m_value
   def __bool__(self): return self.value()
+
+
+################################################################################
+# explanation
+################################################################################
+
+class explanation__c(object):
+  """Minimal explanation of why a configuration is not a valid product (computed with the `explain` method of feature models)"""
+  __slots__ = ("m_constraints", "m_assignments",)
+  def __init__(self, constraints, assignments):
+    self.m_constraints = tuple(constraints) # the constraints of the feature model involved in the explanation
+    self.m_assignments = tuple(assignments) # the values of the configuration involved in the explanation
+
+  @property
+  def constraints(self): return self.m_constraints
+  @property
+  def assignments(self): return self.m_assignments
+
+  def __len__(self): return len(self.m_constraints) + len(self.m_assignments)
+  def __iter__(self): return itertools.chain(iter(self.m_constraints), iter(self.m_assignments))
+  def __bool__(self): return (len(self) != 0)
+  def __str__(self): return "\n".join(self)
@@ -0,0 +1,133 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+
+"""
+This file contains the lazy variants, returned by the `generate_lazy` method of SPLs.
+A lazy variant is a proxy around a variant whose activated deltas are executed only when needed:
+ every delta can declare (with the `targets` parameter of `SPL.delta`) the names of the elements of the variant it accesses
+ (e.g., the classes and functions of a module that it adds, modifies, removes or reads),
+ and accessing an element of a lazy variant (e.g., `variant.name` or `variant[name]`) executes only the deltas targeting it,
+ together with the ones that must be executed before them (i.e., the previous deltas sharing a target with them).
+The deltas without declared targets are executed when the lazy variant is created,
+ together with all the deltas executed before them.
+The functions `materialize` and `pending` give access to the underlying variant and to the deltas not executed yet.
+"""
+
+
+class lazy_variant__c(object):
+  """Proxy around a variant, executing the pending deltas targeting an element when that element is accessed"""
+  __slots__ = (
+    "m_variant",  # object: the underlying variant
+    "m_pending",  # list[spl.delta_info_cls]: the deltas not executed yet, in execution order
+    "m_conf",     # fm_configuration.product__c: the product of the variant
+    "m_apply",    # callable: the function executing a delta (see `spl._apply_delta__`)
+  )
+  def __init__(self, variant, pending, conf, apply_f):
+    """lazy_variant__c(object, iterable[spl.delta_info_cls], product__c, callable) -> lazy_variant__c"""
+    object.__setattr__(self, "m_variant", variant)
+    object.__setattr__(self, "m_pending", list(pending))
+    object.__setattr__(self, "m_conf", conf)
+    object.__setattr__(self, "m_apply", apply_f)
+
+  def __getattr__(self, name):
+    if(name in lazy_variant__c.__slots__): # not initialized yet (e.g., during a copy)
+      raise AttributeError(name)
+    _execute__(self, (name,))
+    return getattr(self.m_variant, name)
+
+  def __setattr__(self, name, value):
+    _execute__(self, (name,))
+    setattr(self.m_variant, name, value)
+
+  def __delattr__(self, name):
+    _execute__(self, (name,))
+    delattr(self.m_variant, name)
+
+  def __getitem__(self, key):
+    _execute__(self, (key,))
+    return self.m_variant[key]
+
+  def __setitem__(self, key, value):
+    _execute__(self, (key,))
+    self.m_variant[key] = value
+
+  def __delitem__(self, key):
+    _execute__(self, (key,))
+    del self.m_variant[key]
+
+  def __repr__(self):
+    return f"lazy_variant__c({self.m_variant!r}, pending={pending(self)})"
+
+
+def _execute__(variant, names):
+  # executes the pending deltas targeting one of the names in parameter, and the previous pending deltas they depend on
+  deltas = variant.m_pending
+  if(not deltas):
+    return
+  # 1. select the deltas, starting from the last one
+  required = set(names)
+  selected = []
+  for i in range(len(deltas) - 1, -1, -1):
+    targets = deltas[i].targets
+    if(not required.isdisjoint(targets)):
+      selected.append(i)
+      required.update(targets)
+  # 2. execute them in order
+  selected.reverse()
+  _run__(variant, selected)
+
+def _run__(variant, selected):
+  # executes the pending deltas at the positions in parameter (in increasing order), and removes them from the pending deltas:
+  # if one of them raises an exception, the deltas executed so far (including the failing one) are removed
+  if(not selected):
+    return
+  deltas = variant.m_pending
+  done = set()
+  res = variant.m_variant
+  apply_f = variant.m_apply
+  conf = variant.m_conf
+  try:
+    for i in selected:
+      done.add(i)
+      res = apply_f(deltas[i], res, conf)
+  finally:
+    object.__setattr__(variant, "m_variant", res)
+    object.__setattr__(variant, "m_pending", [info for i, info in enumerate(deltas) if(i not in done)])
+
+
+def materialize(variant):
+  """materialize(object) -> object
+Executes all the pending deltas of the lazy variant in parameter, and returns the underlying variant.
+If the parameter is not a lazy variant, it is returned as is.
+  """
+  if(isinstance(variant, lazy_variant__c)):
+    _run__(variant, range(len(variant.m_pending)))
+    return variant.m_variant
+  return variant
+
+def pending(variant):
+  """pending(object) -> tuple[str]
+Returns the names of the deltas not executed yet in the lazy variant in parameter (an empty tuple if it is not a lazy variant)
+  """
+  if(isinstance(variant, lazy_variant__c)):
+    return tuple(info.name for info in variant.m_pending)
+  return ()
@@ -21,7 +21,11 @@
 # email: michael.lienhardt@onera.fr
 
 
+import pickle
+import hashlib
+
 from pydop.spl import SPL
+from pydop.cache import lru_cache__c, disk_cache__c
 from pydop.utils import _empty__
 
 ###############################################################################
@@ -29,14 +33,26 @@ from pydop.utils import _empty__
 ###############################################################################
 
 def default_factory(spl_id, *args, **kwargs):
-  return SPL(*args, **kwars)
+  return SPL(*args, **kwargs)
+
+
 
+def default_cache_factory(spl_id):
+  return lru_cache__c(None)
 
 
 class MPL(object):
-  __slots__ = ("m_spl_factory", "m_reg",)
-  def __init__(self, spl_factory=default_factory):
+  __slots__ = ("m_spl_factory", "m_cache_factory", "m_shared", "m_reg",)
+  def __init__(self, spl_factory=default_factory, cache_factory=default_cache_factory):
+    """MPL(callable, callable) -> MPL
+Constructs an empty multi product line, where
+  spl_factory: the function creating the SPLs of the `new` method
+  cache_factory: the function called with the id of every added SPL, returning the cache storing its variants
+    (e.g., `lambda spl_id: cache.lfu_cache__c(64)`, see the `cache` module; by default, the cache is not bounded)
+    """
     self.m_spl_factory = spl_factory
+    self.m_cache_factory = cache_factory
+    self.m_shared = None
     self.m_reg = {}
 
   def _check_name__(self, name):
@@ -52,29 +68,78 @@ class MPL(object):
   def add(self, spl_id, spl):
     self._check_name__(spl_id)
     self._check_name__(spl)
-    return self._add__(spl_id, res)
+    return self._add__(spl_id, spl)
 
   def __setitem__(self, spl_id, spl):
     return self.add(spl_id, spl)
 
   def _add__(self, spl_id, spl):
-    res = _wrapper__c(spl)
+    res = _wrapper__c(spl, self.m_cache_factory(spl_id), spl_id, self.m_shared)
     self.m_reg[spl_id] = res
     self.m_reg[res] = res
     return res
 
+  ## cache management
+  def set_shared_cache(self, backend, dumps=None, loads=None):
+    """set_shared_cache(str | cache backend | None, callable, callable) -> None
+Stores the variants generated by the SPLs of this MPL (without base module in parameter) in a cache shared between processes,
+ so that a variant generated by a process (or a previous execution) is only loaded by the other ones.
+The variants are stored under the key given by the `stable_key` method of the SPLs of this MPL,
+ which requires the ids of the SPLs to have a stable representation (e.g., strings).
+Parameters:
+  backend: the directory of an on-disk cache (see `cache.disk_cache__c`), or any object mapping string keys to bytes
+    with the same `get`, `put`, `remove` and `clear` methods; or None to disable the shared cache
+  dumps: the function converting a variant into bytes (by default, `pickle.dumps`)
+  loads: the function converting bytes back into a variant (by default, `pickle.loads`)
+    """
+    if(backend is None):
+      shared = None
+    else:
+      if(isinstance(backend, str)):
+        backend = disk_cache__c(backend)
+      shared = (backend, (pickle.dumps if(dumps is None) else dumps), (pickle.loads if(loads is None) else loads))
+    self.m_shared = shared
+    for spl in set(self.m_reg.values()):
+      spl.m_shared = shared
+
+  @property
+  def shared_cache(self): return (None if(self.m_shared is None) else self.m_shared[0])
+
+  def invalidate(self, spl_id=None, conf=None):
+    """invalidate(object, dict | configuration__c) -> None
+Removes the stored variant of the product `conf` of the SPL `spl_id`,
+ all the stored variants of that SPL if `conf` is None, and all the stored variants if `spl_id` is None
+ (the shared cache, if any, is not modified: see `set_shared_cache`)
+    """
+    if(spl_id is None):
+      for spl in set(spl for spl in self.m_reg.values()):
+        spl.invalidate()
+    else:
+      self.m_reg[spl_id].invalidate(conf)
+
   ## getters
   def get_spl(self, spl_id, default=None):
-    return self.m_reg.get(key, default)
+    return self.m_reg.get(spl_id, default)
 
   def get_variant(self, spl_id, conf, default=None):
     global _empty__
-    spl = self.m_reg.get(key, _empty__)
+    spl = self.m_reg.get(spl_id, _empty__)
     if(spl is not _empty__):
       return spl(conf)
     else:
       return default
 
+  async def aget_variant(self, spl_id, conf, default=None, timeout=None):
+    """aget_variant(object, dict | configuration__c, object, float) -> object
+Asynchronous version of `get_variant`: the variant is generated with the `agenerate` method of the SPL
+    """
+    global _empty__
+    spl = self.m_reg.get(spl_id, _empty__)
+    if(spl is not _empty__):
+      return await spl.acall(conf, timeout=timeout)
+    else:
+      return default
+
   def __getitem__(self, key):
     global _empty__
     if(isinstance(key, (tuple, list)) and (len(key) == 2)):
@@ -96,21 +161,86 @@ class MPL(object):
 # SPL wrapper that stores variants
 
 class _wrapper__c(object):
-  __slots__ = ("m_obj", "m_reg",)
-  def __init__(self, obj):
+  __slots__ = (
+    "m_obj",     # SPL: the wrapped SPL
+    "m_reg",     # the cache of the generated variants, indexed by frozen products (see the `cache` module)
+    "m_id",      # the id of the SPL in its MPL
+    "m_shared",  # None, or tuple[cache backend, callable, callable]: the cache shared between processes, with the dumps and loads functions
+  )
+  def __init__(self, obj, cache=None, spl_id=None, shared=None):
     self.m_obj = obj
-    self.m_reg = {}
+    self.m_reg = lru_cache__c(None) if(cache is None) else cache
+    self.m_id = spl_id
+    self.m_shared = shared
+
+  @property
+  def cache(self): return self.m_reg
+
+  def stable_key(self, conf):
+    """stable_key(dict | configuration__c) -> str
+Returns the key of the variant of the product in parameter in the shared cache (a hash in hexadecimal format),
+ which does not depend on the process: it combines the id of the SPL with its `variant_key`,
+ i.e., the fingerprint of the feature model, the full paths and values of the product, and the code of the activated deltas.
+    """
+    h = hashlib.sha256()
+    h.update(repr(self.m_id).encode())
+    h.update(b"\0")
+    h.update(self.m_obj.variant_key(conf).encode())
+    return h.hexdigest()
+
+  def _shared_get__(self, key):
+    # returns the variant of the product in parameter stored in the shared cache (`_empty__` if there is none), and the key of that variant
+    backend, _, loads = self.m_shared
+    stable = self.stable_key(key)
+    data = backend.get(stable)
+    return (_empty__ if(data is None) else loads(data)), stable
+
+  def invalidate(self, conf=None):
+    """invalidate(dict | configuration__c) -> None
+Removes the stored variant of the product in parameter, or all the stored variants if `conf` is None
+    """
+    if(conf is None):
+      self.m_reg.clear()
+    else:
+      conf, errors = self.m_obj.close_configuration(conf)
+      if(bool(errors)):
+        raise ValueError(errors)
+      self.m_reg.remove(conf.freeze())
 
   def __call__(self, conf, core=None):
     global _empty__
     conf, errors = self.m_obj.close_configuration(conf)
     if(bool(errors)):
       raise ValueError(errors)
-    key = tuple(sorted(conf.items(), key=(lambda e: id(e[0]))))
+    key = conf.freeze()
+    res = self.m_reg.get(key, _empty__)
+    if(res is _empty__):
+      shared = self.m_shared if(core is None) else None
+      if(shared is not None):
+        res, stable = self._shared_get__(key)
+      if(res is _empty__):
+        res = self.m_obj(conf, core)
+        if(shared is not None):
+          shared[0].put(stable, shared[1](res))
+      self.m_reg.put(key, res)
+    return res
+
+  async def acall(self, conf, core=None, timeout=None):
+    global _empty__
+    conf, errors = self.m_obj.close_configuration(conf)
+    if(bool(errors)):
+      raise ValueError(errors)
+    key = conf.freeze()
     res = self.m_reg.get(key, _empty__)
     if(res is _empty__):
-      res = self.m_obj(conf, core)
-      self.m_reg[key] = res
+      shared = self.m_shared if(core is None) else None
+      if(shared is not None):
+        res, stable = self._shared_get__(key)
+      if(res is _empty__):
+        res = await self.m_obj.agenerate(key, core, timeout)
+        if(shared is not None):
+          shared[0].put(stable, shared[1](res))
+      self.m_reg.put(key, res)
     return res
 
   def __getattr__(self, name):
@@ -27,6 +27,7 @@
 #  - VariantModule, that corresponds to one module (it is possible to add/remove/modify classes/functions/other)
 # Moreover, classes can be modified by adding/removing/modifying fields and methods to/from them
 # It is also possible to call the unbound "original" function during the modification of a method to call the previous definition of that method
+# Finally, the operations done on a variant can be recorded, and replayed on another variant (see `_wrapper__c.replay`)
 
 import sys
 import importlib
@@ -532,14 +533,11 @@ class _replace_original__c(ast.NodeTransformer):
     source = source.split('\n', 1)[1]
     node = ast.parse(source)
     node = self.visit(node)
-    if(self.m_name_new is None):
-      name_original = name
-    else:
-      name_original = self.m_name_new
+    if(self.m_name_new is not None):
       ast.fix_missing_locations(node)
       exec(compile(node, '<ast>', 'exec'), globals() | nonlocals, locals())
       function = locals()[self.m_name_original]
-    return function, name_original
+    return function, self.m_name_new # the name of the original function is None when it is not referenced
 
 ################################################################################
 # registry: ensures that all modifications are done to local objects
@@ -547,25 +545,20 @@ class _replace_original__c(ast.NodeTransformer):
 ################################################################################
 
 class _registry__c(object):
-  __slots__ = ("m_ids", "m_originals", "m_original_count",)
+  __slots__ = ("m_ids", "m_originals", "m_original_count", "m_log",)
   def __init__(self, variant):
     self.m_ids = {}
     self.m_originals = []
     self._register_obj__(variant)
     self.m_original_count = 0
+    self.m_log = None # the list of the recorded operations (None when not recording)
 
   def _check_replica__(self, wrapper):
     obj = wrapper.m_obj
     obj_id = id(obj)
     obj_replica = self.m_ids.get(obj_id)
     if(obj_replica is None): # the object is not local: need to do a copy
-      if(inspect.isclass(obj)):
-        obj_replica = type(obj.__name__, obj.__bases__, dict(obj.__dict__))
-      elif(isinstance(obj, _module_class_)):
-        obj_replica = type(obj)(obj.__name__, obj.__doc__)
-        obj_replica.__dict__.update(obj.__dict__)
-      else:
-        obj_replica = copy.copy(obj)
+      obj_replica = _replicate__(obj)
       # need to put the new object in the father (which may need to be duplicated also)
       if(wrapper.m_parent is not None):
         new_root = self._check_replica__(wrapper.m_parent)
@@ -588,6 +581,93 @@ class _registry__c(object):
     self.m_original_count += 1
     return res
 
+  def _share__(self, root):
+    # all the objects of the variant, except its root, are now shared with another variant: they must be copied before being modified
+    self.m_ids = {id(root): root}
+
+
+def _replicate__(obj):
+  # returns a shallow copy of the object in parameter
+  if(inspect.isclass(obj)):
+    return type(obj.__name__, obj.__bases__, dict(obj.__dict__))
+  elif(isinstance(obj, _module_class_)):
+    res = type(obj)(obj.__name__, obj.__doc__)
+    res.__dict__.update(obj.__dict__)
+    return res
+  else:
+    return copy.copy(obj)
+
+
+################################################################################
+# operation recording and replay:
+#  an operation log is a tuple of entries (operation, path, arguments),
+#  where path is the tuple of the names leading from the root of the variant to the modified object,
+#  and the arguments are the resolved values given to the operation (e.g., functions where "original" is already replaced).
+# The classes of the variant used as superclasses are referenced by their path (see `_class_ref__`),
+#  so that a replayed variant does not inherit from the classes of the variant where the log was recorded
+################################################################################
+
+_OP_ADD            = 0 # (name, value, bases): bases are the references of the superclasses of value if it is a class, and None otherwise
+_OP_REMOVE         = 1 # (name,)
+_OP_MODIFY         = 2 # (name, value, name_original, bases)
+_OP_ADD_EXTENDS    = 3 # (bases,)
+_OP_REMOVE_EXTENDS = 4 # (bases,)
+_OP_SET_EXTENDS    = 5 # (bases,)
+
+def _replay_entry__(obj, op, args):
+  # performs the operation on the object in parameter, whose arguments are resolved (i.e., without class references)
+  if(op == _OP_ADD):
+    setattr(obj, args[0], args[1])
+  elif(op == _OP_REMOVE):
+    delattr(obj, args[0])
+  elif(op == _OP_MODIFY):
+    name, value, name_original = args[:3]
+    if(name_original != name):
+      setattr(obj, name_original, getattr(obj, name))
+    setattr(obj, name, value)
+  elif(op == _OP_ADD_EXTENDS):
+    obj.__bases__ += tuple(el for el in args[0] if(el not in obj.__bases__))
+  elif(op == _OP_REMOVE_EXTENDS):
+    bases_rm = frozenset(args[0])
+    obj.__bases__ = tuple(el for el in obj.__bases__ if(el not in bases_rm))
+  else:
+    obj.__bases__ = args[0]
+
+def _find_path__(root, obj):
+  # returns the path of the object in parameter in the variant `root` (None if it is not part of it),
+  #  looking into the classes of the variant and its sub-modules
+  seen = {id(root)}
+  todo = [(root, ())]
+  for current, path in todo:
+    for name, value in vars(current).items():
+      if(value is obj):
+        return path + (name,)
+      elif(id(value) in seen):
+        continue
+      elif(inspect.isclass(value) or (isinstance(value, _module_class_) and ((not path) or value.__name__.startswith(f"{current.__name__}.")))):
+        seen.add(id(value))
+        todo.append((value, path + (name,)))
+  return None
+
+def _class_ref__(wrapper, cls):
+  # returns the reference of a class in an operation log on the variant of the wrapper in parameter:
+  #  (True, path) if the class is part of the variant, and (False, class) otherwise
+  if(isinstance(cls, _wrapper__c)):
+    if(cls.m_reg is wrapper.m_reg):
+      return (True, cls._path__())
+    cls = cls.m_obj
+  root = wrapper
+  while(root.m_parent is not None):
+    root = root.m_parent
+  path = _find_path__(root.m_obj, cls)
+  return (False, cls) if(path is None) else (True, path)
+
+def _class_refs__(wrapper, value):
+  # returns the references of the superclasses of the value in parameter, or None if it is not a class
+  if(inspect.isclass(value)):
+    return tuple(_class_ref__(wrapper, el) for el in value.__bases__)
+  return None
+
 
 def _hasattr_no_follow__(obj, name):
   try:
@@ -604,7 +684,7 @@ class _wrapper__c(object):
     "m_obj",    # the wrapped object
   )
   def __new__(cls, *args): # Necessary, when a wrapper is used as a superclass
-    print(f"_wrapper__c.__new__({cls}, {args})")
+    # print(f"_wrapper__c.__new__({cls}, {args})")
     if((len(args) == 4) and (isinstance(args[0], _registry__c))):
       return super(_wrapper__c, cls).__new__(cls)
     else:
@@ -633,6 +713,94 @@ class _wrapper__c(object):
   def __call__(self, *args, **kwargs):
     return self.m_obj(*args, **kwargs)
 
+  def _path__(self):
+    # returns the names leading from the root of the variant to the wrapped object
+    path = []
+    wrapper = self
+    while(wrapper.m_parent is not None):
+      path.append(wrapper.m_name)
+      wrapper = wrapper.m_parent
+    return tuple(reversed(path))
+
+  def _is_recording__(self):
+    return self.m_reg.m_log is not None
+
+  def _record__(self, op, *args):
+    log = self.m_reg.m_log
+    if(log is not None):
+      log.append((op, self._path__(), args))
+
+  def _resolve__(self, refs):
+    # returns the classes referenced in an operation log, in this variant
+    res = []
+    for is_path, ref in refs:
+      if(is_path):
+        obj = self.m_obj
+        for name in ref:
+          obj = getattr(obj, name)
+        res.append(obj)
+      else:
+        res.append(ref)
+    return tuple(res)
+
+  def _rebase__(self, value, refs):
+    # returns the class in parameter, or a copy of it inheriting from the classes of this variant referenced in its log entry
+    if(refs is not None):
+      bases = self._resolve__(refs)
+      if(bases != value.__bases__):
+        return type(value.__name__, bases, dict(value.__dict__))
+    return value
+
+  def start_recording(self):
+    """start_recording() -> None
+Starts recording the operations (add, remove, modify and the *_extends operations) done on this variant (which must not be a part of a variant)
+    """
+    if(self.m_parent is not None):
+      raise Exception(f"ERROR: only the operations of a complete variant can be recorded (\"{self.m_name}\" found)")
+    self.m_reg.m_log = []
+
+  def stop_recording(self):
+    """stop_recording() -> tuple
+Stops recording the operations done on this variant, and returns their log, which can be given to the `replay` method of another variant
+    """
+    res = self.m_reg.m_log
+    self.m_reg.m_log = None
+    return () if(res is None) else tuple(res)
+
+  def replay(self, log):
+    """replay(tuple) -> None
+Performs again on this variant (which must not be a part of a variant) the operations of a log returned by `stop_recording`.
+The values of the log (e.g., the added classes and functions) are shared with the variant where they were recorded,
+ and are copied before being modified, like with the `snapshot` method.
+    """
+    if(self.m_parent is not None):
+      raise Exception(f"ERROR: operations can only be replayed on a complete variant (\"{self.m_name}\" found)")
+    for op, path, args in log:
+      wrapper = self
+      for name in path:
+        wrapper = _wrapper__c(self.m_reg, wrapper, name, getattr(wrapper.m_obj, name))
+      obj = self.m_reg._check_replica__(wrapper)
+      if(op in (_OP_ADD, _OP_MODIFY)):
+        args = (args[0], self._rebase__(args[1], args[-1])) + args[2:-1]
+      elif(op in (_OP_ADD_EXTENDS, _OP_REMOVE_EXTENDS, _OP_SET_EXTENDS)):
+        args = (self._resolve__(args[0]),)
+      _replay_entry__(obj, op, args)
+    if(self.m_reg.m_log is not None):
+      self.m_reg.m_log.extend(log)
+
+  def snapshot(self):
+    """snapshot() -> _wrapper__c
+Returns a copy of this variant (which must not be a part of a variant) that shares all its objects with it:
+ a shared object is copied the first time it is modified, in either of the two variants
+    """
+    if(self.m_parent is not None):
+      raise Exception(f"ERROR: only a complete variant can be copied (\"{self.m_name}\" found)")
+    self.m_reg._share__(self.m_obj)
+    obj = _replicate__(self.m_obj)
+    reg = _registry__c(obj)
+    reg.m_original_count = self.m_reg.m_original_count
+    return _wrapper__c(reg, None, None, obj)
+
   def add(self, param1, param2=_obj__):
     if(param2 == _obj__):
       name  = param1.__name__
@@ -647,10 +815,14 @@ class _wrapper__c(object):
     else:
       self.m_reg._check_replica__(self)
       # self.m_reg._register_obj__(value)
+      if(self._is_recording__()):
+        self._record__(_OP_ADD, name, value, _class_refs__(self, value))
       return setattr(self.m_obj, name, value)
 
   def remove(self, name):
     if(_hasattr_no_follow__(self.m_obj, name)):
+      self.m_reg._check_replica__(self)
+      self._record__(_OP_REMOVE, name)
       delattr(self.m_obj, name)
     else:
       name_kind = self.m_obj.__class__.__name__
@@ -665,12 +837,16 @@ class _wrapper__c(object):
       name  = param1
       value = param2
     if(_hasattr_no_follow__(self.m_obj, name)):
+      self.m_reg._check_replica__(self)
+      name_original = name
       if(inspect.isfunction(value)):
         # print("modify", value.__name__, ":", inspect.getclosurevars(value).nonlocals)
-        value, name_original = _replace_original__c(self.m_reg)(value, inspect.getclosurevars(value).nonlocals)
-        if(name_original != name):
-          setattr(self.m_obj, name_original, getattr(self.m_obj, name))
-      setattr(self.m_obj, name, value) 
+        value, name_new = _replace_original__c(self.m_reg)(value, inspect.getclosurevars(value).nonlocals)
+        if(name_new is not None):
+          name_original = name_new
+      if(self._is_recording__()):
+        self._record__(_OP_MODIFY, name, value, name_original, _class_refs__(self, value))
+      _replay_entry__(self.m_obj, _OP_MODIFY, (name, value, name_original))
     else:
       name_kind = self.m_obj.__class__.__name__
       name_obj  = self.m_obj.__name__
@@ -678,26 +854,34 @@ class _wrapper__c(object):
 
   def add_extends(self, *args):
     if(inspect.isclass(self.m_obj)):
+      self.m_reg._check_replica__(self)
+      if(self._is_recording__()):
+        self._record__(_OP_ADD_EXTENDS, tuple(_class_ref__(self, el) for el in args))
       bases = tuple((el.m_obj if(isinstance(el, _wrapper__c)) else el) for el in args)
-      bases = tuple(filter(lambda x: x not in self.m_obj.__bases__, bases))
-      self.m_obj.__bases__ += bases
+      _replay_entry__(self.m_obj, _OP_ADD_EXTENDS, (bases,))
     else:
       raise Exception(f"ERROR: delta operation \"add_extends\" can only be applied on classes (\"{type(self.m_obj)}\" found)")
 
   def remove_extends(self, *args):
     if(inspect.isclass(self.m_obj)):
+      self.m_reg._check_replica__(self)
       bases_rm = frozenset((el.m_obj if(isinstance(el, _wrapper__c)) else el) for el in args)
       bases = frozenset(self.m_obj.__bases__)
       bases_error = bases_rm - bases
       if(bases_error):
         raise Exception(f"ERROR: trying to remove non-superclasses {bases_error}")
       else:
-        self.m_obj.__bases__ = tuple(el for el in self.m_obj.__bases__ if(el not in bases_rm))
+        if(self._is_recording__()):
+          self._record__(_OP_REMOVE_EXTENDS, tuple(_class_ref__(self, el) for el in args))
+        _replay_entry__(self.m_obj, _OP_REMOVE_EXTENDS, (bases_rm,))
     else:
       raise Exception(f"ERROR: delta operation \"remove_extends\" can only be applied on classes (\"{type(self.m_obj)}\" found)")
 
   def set_extends(self, *args):
     if(inspect.isclass(self.m_obj)):
+      self.m_reg._check_replica__(self)
+      if(self._is_recording__()):
+        self._record__(_OP_SET_EXTENDS, tuple(_class_ref__(self, el) for el in args))
       bases = tuple((el.m_obj if(isinstance(el, _wrapper__c)) else el) for el in args)
       self.m_obj.__bases__ = bases
     else:
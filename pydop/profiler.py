@@ -0,0 +1,240 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+#
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+
+"""
+This file contains the profiler of variant generation, which records statistics for every delta of an SPL:
+ the number of times it was executed, the time spent executing it, the time spent evaluating its guard and,
+ optionally, the memory it allocated (measured with the `tracemalloc` module;
+ before python 3.9, the peak memory of a delta is approximated by the memory it allocated and did not release).
+It is enabled with the `enable_profiling` method of SPLs: when the profiler is disabled, variant generation is not impacted.
+"""
+
+import json
+import time
+import tracemalloc
+
+_has_reset_peak__ = hasattr(tracemalloc, "reset_peak") # tracemalloc.reset_peak exists since python 3.9
+
+
+class delta_stats__c(object):
+  """The statistics of a delta (times are in seconds, and memory in bytes)"""
+  __slots__ = (
+    "m_name",
+    "m_count",        # int: the number of executions of the delta
+    "m_total",        # float: the cumulative execution time of the delta
+    "m_max",          # float: the maximal execution time of the delta
+    "m_guard_count",  # int: the number of evaluations of the guard of the delta
+    "m_guard_total",  # float: the cumulative evaluation time of the guard of the delta
+    "m_memory",       # int: the cumulative size of the memory allocated by the delta and not released
+    "m_memory_peak",  # int: the maximal size of the memory used at the same time during an execution of the delta
+  )
+  def __init__(self, name):
+    """delta_stats__c(str) -> delta_stats__c"""
+    self.m_name = name
+    self.m_count = 0
+    self.m_total = 0.0
+    self.m_max = 0.0
+    self.m_guard_count = 0
+    self.m_guard_total = 0.0
+    self.m_memory = 0
+    self.m_memory_peak = 0
+
+  @property
+  def name(self): return self.m_name
+  @property
+  def count(self): return self.m_count
+  @property
+  def total(self): return self.m_total
+  @property
+  def max(self): return self.m_max
+  @property
+  def mean(self): return (self.m_total / self.m_count) if(self.m_count) else 0.0
+  @property
+  def guard_count(self): return self.m_guard_count
+  @property
+  def guard_total(self): return self.m_guard_total
+  @property
+  def memory(self): return self.m_memory
+  @property
+  def memory_peak(self): return self.m_memory_peak
+
+  def to_dict(self):
+    """to_dict() -> dict[str, object]
+Returns the content of these statistics as a dictionary
+    """
+    return {
+      "name": self.m_name, "count": self.m_count, "total": self.m_total, "max": self.m_max, "mean": self.mean,
+      "guard_count": self.m_guard_count, "guard_total": self.m_guard_total,
+      "memory": self.m_memory, "memory_peak": self.m_memory_peak,
+    }
+
+
+class profile__c(object):
+  """The statistics of all the deltas of an SPL, indexed by their name.
+This class also implements the profiled versions of the guard evaluation and of the delta execution used by the SPL.
+  """
+  __slots__ = (
+    "m_stats",      # dict[str -> delta_stats__c]: the statistics of the deltas
+    "m_memory",     # bool: if the memory allocated by the deltas is measured
+    "m_tracing",    # bool: if `tracemalloc` was started by this profiler
+    "m_variants",   # int: the number of generated variants
+  )
+  def __init__(self, memory=False):
+    """profile__c(bool) -> profile__c"""
+    self.m_stats = {}
+    self.m_memory = memory
+    self.m_tracing = False
+    self.m_variants = 0
+
+  @property
+  def memory(self): return self.m_memory
+  @property
+  def nb_variants(self): return self.m_variants
+
+  def start(self):
+    """start() -> None
+Starts `tracemalloc` if the memory must be measured and it is not already running
+    """
+    if(self.m_memory and (not tracemalloc.is_tracing())):
+      tracemalloc.start()
+      self.m_tracing = True
+
+  def stop(self):
+    """stop() -> None
+Stops `tracemalloc` if it was started by this profiler
+    """
+    if(self.m_tracing):
+      tracemalloc.stop()
+      self.m_tracing = False
+
+  def reset(self):
+    """reset() -> None
+Removes all the statistics
+    """
+    self.m_stats.clear()
+    self.m_variants = 0
+
+  def _get__(self, name):
+    res = self.m_stats.get(name)
+    if(res is None):
+      res = delta_stats__c(name)
+      self.m_stats[name] = res
+    return res
+
+  ##########################################
+  # profiled versions of the SPL functions
+
+  def check(self, info, conf, conf_dict):
+    """check(spl.delta_info_cls, frozen_configuration__c, dict) -> bool
+Evaluates the guard of the delta in parameter on the product in parameter, and records the evaluation time
+    """
+    check = info.check
+    start = time.perf_counter()
+    res = info.guard(conf) if(check is None) else check(conf_dict)
+    duration = time.perf_counter() - start
+    stats = self._get__(info.name)
+    stats.m_guard_count += 1
+    stats.m_guard_total += duration
+    return res
+
+  def apply(self, apply_f, info, variant, conf):
+    """apply(callable, spl.delta_info_cls, object, frozen_configuration__c) -> object
+Executes the delta in parameter with `apply_f` (e.g., `spl._apply_delta__`), and records its execution time and allocated memory
+    """
+    memory = self.m_memory and tracemalloc.is_tracing()
+    if(memory):
+      if(_has_reset_peak__): tracemalloc.reset_peak()
+      mem_start = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    res = apply_f(info, variant, conf)
+    duration = time.perf_counter() - start
+    stats = self._get__(info.name)
+    stats.m_count += 1
+    stats.m_total += duration
+    if(duration > stats.m_max):
+      stats.m_max = duration
+    if(memory):
+      current, peak = tracemalloc.get_traced_memory()
+      if(not _has_reset_peak__): # the peak may predate the delta: it is approximated by the memory still allocated
+        peak = max(current, mem_start)
+      stats.m_memory += current - mem_start
+      stats.m_memory_peak = max(stats.m_memory_peak, peak - mem_start)
+    return res
+
+  def add_variants(self, nb):
+    """add_variants(int) -> None
+Counts `nb` additional generated variants
+    """
+    self.m_variants += nb
+
+  ##########################################
+  # access and dump
+
+  def __len__(self): return len(self.m_stats)
+  def __iter__(self): return iter(self.m_stats.values())
+  def __contains__(self, name): return name in self.m_stats
+  def __getitem__(self, name): return self.m_stats[name]
+
+  def sorted(self, key="total", limit=None):
+    """sorted(str, int) -> list[delta_stats__c]
+Returns the statistics of the deltas sorted in decreasing order of the field `key` (e.g., "total", "max", "count" or "memory"),
+ limited to the `limit` first ones (None for no limit)
+    """
+    res = sorted(self.m_stats.values(), key=(lambda stats: getattr(stats, key)), reverse=True)
+    return res if(limit is None) else res[:limit]
+
+  def to_dict(self):
+    """to_dict() -> dict[str, object]
+Returns the content of this profile as a dictionary
+    """
+    return {"variants": self.m_variants, "deltas": [stats.to_dict() for stats in self.sorted()]}
+
+  def to_json(self, **kwargs):
+    """to_json(**kwargs) -> str
+Returns the content of this profile in JSON format (the keyworded arguments are given to `json.dumps`)
+    """
+    return json.dumps(self.to_dict(), **kwargs)
+
+  def table(self, key="total", limit=None):
+    """table(str, int) -> str
+Returns the statistics of the deltas as a text table, sorted as with the `sorted` method (times are given in milliseconds)
+    """
+    headers = ["delta", "count", "total (ms)", "mean (ms)", "max (ms)", "guards", "guards (ms)"]
+    if(self.m_memory):
+      headers.extend(("memory (B)", "peak (B)"))
+    rows = []
+    for stats in self.sorted(key, limit):
+      row = [
+        stats.m_name, str(stats.m_count), f"{stats.m_total * 1000:.3f}", f"{stats.mean * 1000:.3f}", f"{stats.m_max * 1000:.3f}",
+        str(stats.m_guard_count), f"{stats.m_guard_total * 1000:.3f}"]
+      if(self.m_memory):
+        row.extend((str(stats.m_memory), str(stats.m_memory_peak)))
+      rows.append(row)
+    widths = [max(len(row[i]) for row in ([headers] + rows)) for i in range(len(headers))]
+    lines = []
+    for row in [headers] + rows:
+      lines.append("  ".join((cell.ljust(width) if(i == 0) else cell.rjust(width)) for i, (cell, width) in enumerate(zip(row, widths))))
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+  def __str__(self):
+    return self.table()
@@ -0,0 +1,429 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+#
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+"""
+This file contains a small incremental SAT solver, implemented in pure python.
+Variables are positive integers and literals are non-zero integers (`-v` being the negation of `v`), like in the DIMACS format.
+The solver is a DPLL procedure with two watched literals per clause, without clause learning:
+ the literals on which a refuted branch depends are recorded, which gives backjumping and precise unsatisfiable cores.
+It supports
+ - adding clauses between two calls to `solve`
+ - solving under assumptions, and extracting the assumptions responsible for unsatisfiability (`core`)
+ - finding a model minimizing the weight of the falsified soft literals (`minimize`)
+ - manual decision levels (`assume` and `retract`), for interactive propagation
+"""
+
+
+def _lidx__(lit):
+  """Index of a literal in the per-literal tables of the solver"""
+  return (lit << 1) if(lit > 0) else (((-lit) << 1) | 1)
+
+
+class solver__c(object):
+  """Incremental SAT solver"""
+  __slots__ = (
+    "m_nb_vars",   # the number of variables of the solver
+    "m_clauses",   # list[list[int]]: the clauses (the two first literals of a clause are watched)
+    "m_watches",   # list[list[int]]: for each literal, the clauses watching it
+    "m_values",    # list[bool | None]: for each literal, its current value
+    "m_reasons",   # list[int | None]: for each variable, the clause that implied its value (None for decisions, assumptions and facts)
+    "m_phases",    # list[bool]: for each variable, the value tried first during search
+    "m_trail",     # list[int]: the assigned literals, in assignment order
+    "m_trail_lim", # list[int]: for each decision level, the position in the trail of its first literal
+    "m_flipped",   # list[bool]: for each decision level, if its decision has already been flipped during search
+    "m_qhead",     # int: the position in the trail of the next literal to propagate
+    "m_next",      # int: all variables below this one are assigned
+    "m_ok",        # bool: False if the clauses are unsatisfiable
+    "m_model",     # list[bool | None]: the last model found
+    "m_core",      # list[int]: the assumptions responsible for the last unsatisfiable result
+  )
+
+  def __init__(self, clauses=()):
+    self.m_nb_vars = 0
+    self.m_clauses = []
+    self.m_watches = [[], []]
+    self.m_values = [None, None]
+    self.m_reasons = [None]
+    self.m_phases = [False]
+    self.m_trail = []
+    self.m_trail_lim = []
+    self.m_flipped = []
+    self.m_qhead = 0
+    self.m_next = 1
+    self.m_ok = True
+    self.m_model = None
+    self.m_core = None
+    for clause in clauses:
+      self.add_clause(clause)
+
+  ##########################################
+  # problem construction
+
+  def new_var(self):
+    """new_var() -> int
+Creates a new variable and returns it
+    """
+    self.m_nb_vars += 1
+    self.m_watches.append([])
+    self.m_watches.append([])
+    self.m_values.append(None)
+    self.m_values.append(None)
+    self.m_reasons.append(None)
+    self.m_phases.append(False)
+    return self.m_nb_vars
+
+  def ensure_var(self, v):
+    """ensure_var(int) -> None
+Ensures that the variable `v` exists in the solver
+    """
+    while(self.m_nb_vars < v):
+      self.new_var()
+
+  @property
+  def nb_vars(self): return self.m_nb_vars
+
+  def set_phase(self, v, value):
+    """set_phase(int, bool) -> None
+Sets the value that is tried first for the variable `v` during search
+    """
+    self.ensure_var(v)
+    self.m_phases[v] = value
+
+  def add_clause(self, clause):
+    """add_clause(iterable[int]) -> bool
+Adds a clause to the solver (this cancels all the current decision levels).
+Returns False if the solver became trivially unsatisfiable.
+    """
+    self._backtrack__(0)
+    if(not self.m_ok): return False
+    lits = []
+    for lit in clause:
+      self.ensure_var(abs(lit))
+      value = self.m_values[_lidx__(lit)]
+      if((value is True) or (-lit in lits)): return True # clause already satisfied, or tautology
+      elif((value is None) and (lit not in lits)): lits.append(lit)
+    if(len(lits) == 0):
+      self.m_ok = False
+    elif(len(lits) == 1):
+      self._assign__(lits[0], None)
+      self.m_ok = (self._propagate__() is None)
+    else:
+      idx = len(self.m_clauses)
+      self.m_clauses.append(lits)
+      self.m_watches[_lidx__(lits[0])].append(idx)
+      self.m_watches[_lidx__(lits[1])].append(idx)
+    return self.m_ok
+
+  ##########################################
+  # solving
+
+  def solve(self, assumptions=()):
+    """solve(iterable[int]) -> bool
+Checks if the clauses of the solver, together with the assumptions in parameter, are satisfiable.
+In that case, the model found is available with the `model` method;
+ otherwise, the `core` method gives a subset of the assumptions that is sufficient for unsatisfiability
+ (the assumptions on which the refutation depends, which is not necessarily minimal).
+    """
+    self.m_model = None
+    self.m_core = None
+    if(not self._start__(assumptions)):
+      return False
+    base = len(self.m_trail_lim)
+    res = self._search__(base)
+    if(res is True):
+      self.m_model = self._current_model__()
+    else:
+      self.m_core = [lit for lit in dict.fromkeys(assumptions) if(lit in res)]
+    self._backtrack__(0)
+    return (res is True)
+
+  def minimize(self, soft, assumptions=()):
+    """minimize(dict[int, int], iterable[int]) -> int | None
+Looks for a model of the clauses of the solver (together with the assumptions in parameter)
+ that minimizes the sum of the weights of the soft literals in parameter (given as a mapping {literal: weight}) that are false.
+Returns that sum, or None if there is no model.
+The search is a branch and bound, where the soft literals are decided first, with their preferred value.
+    """
+    self.m_model = None
+    self.m_core = None
+    for lit in soft: self.ensure_var(abs(lit))
+    if(not self._start__(assumptions)):
+      return None
+    penalties = {-lit: w for lit, w in soft.items() if(w > 0)} # the cost of assigning a literal
+    phases = self.m_phases
+    saved = [(abs(lit), phases[abs(lit)]) for lit in penalties]
+    for lit in penalties: phases[abs(lit)] = (lit < 0)
+    soft_vars = [abs(lit) for lit in penalties] # decided first, so the cost of a branch is known early
+    base = len(self.m_trail_lim)
+    costs = [0] # costs[k]: the cost of the k first literals of the trail
+    best = None
+    try:
+      while(True):
+        confl = self._propagate__()
+        if(confl is None):
+          trail = self.m_trail
+          while(len(costs) <= len(trail)):
+            costs.append(costs[-1] + penalties.get(trail[len(costs)-1], 0))
+          cost = costs[len(trail)]
+          if((best is None) or (cost < best)):
+            v = next((v for v in soft_vars if(self.m_values[v << 1] is None)), 0) or self._pick__()
+            if(v != 0):
+              self._new_level__(v if(phases[v]) else -v)
+              continue
+            best = cost
+            self.m_model = self._current_model__()
+            if(best == 0): break
+        # conflict, bound reached or model found: flip the last non-flipped decision
+        if(not self._flip__(base)): break
+        del costs[self.m_trail_lim[-1] + 1:]
+    finally:
+      for v, phase in saved: phases[v] = phase
+      self._backtrack__(0)
+    return best
+
+  def model(self):
+    """model() -> list[bool]
+Returns the last model found, as a list mapping every variable to its value (the index 0 is not used)
+    """
+    return self.m_model
+
+  def core(self):
+    """core() -> list[int]
+Returns the assumptions responsible for the last unsatisfiable result
+    """
+    return self.m_core
+
+  def _start__(self, assumptions):
+    """Propagates the facts and the assumptions, each in its own decision level (returns False in case of conflict)"""
+    self._backtrack__(0)
+    if((not self.m_ok) or (self._propagate__() is not None)):
+      self.m_ok = False
+      self.m_core = []
+      return False
+    for lit in assumptions:
+      self.ensure_var(abs(lit))
+      value = self.m_values[_lidx__(lit)]
+      if(value is False):
+        self.m_core = self._analyze_final__((-lit,)) + [lit]
+        self._backtrack__(0)
+        return False
+      elif(value is None):
+        self._new_level__(lit)
+        confl = self._propagate__()
+        if(confl is not None):
+          self.m_core = self._analyze_final__(self.m_clauses[confl])
+          self._backtrack__(0)
+          return False
+    return True
+
+  def _search__(self, base):
+    """Searches a model above the level `base`: returns True if one is found,
+ and otherwise, the set of the assumptions (i.e., the decisions below `base`) responsible for the unsatisfiability
+    """
+    deps = {} # for each flipped decision, the assumptions and decisions on which the refutation of its first branch depends
+    while(True):
+      confl = self._propagate__()
+      if(confl is None):
+        v = self._pick__()
+        if(v == 0): return True
+        self._new_level__(v if(self.m_phases[v]) else -v)
+        continue
+      conflict = set(self._analyze_final__(self.m_clauses[confl], deps))
+      while(True): # the decisions on which the conflict does not depend are refuted as well (backjumping)
+        if(len(self.m_trail_lim) <= base):
+          return conflict
+        lit = self.m_trail[self.m_trail_lim[-1]]
+        flipped = self.m_flipped[-1]
+        self._backtrack__(len(self.m_trail_lim) - 1)
+        deps.pop(abs(lit), None)
+        if((not flipped) and (lit in conflict)):
+          conflict.discard(lit)
+          self._new_level__(-lit)
+          self.m_flipped[-1] = True
+          deps[abs(lit)] = conflict
+          break
+
+  def _flip__(self, base):
+    """Chronological backtracking: flips the last non-flipped decision above the level `base` (returns False if there is none)"""
+    while(len(self.m_trail_lim) > base):
+      lit = self.m_trail[self.m_trail_lim[-1]]
+      flipped = self.m_flipped[-1]
+      self._backtrack__(len(self.m_trail_lim) - 1)
+      if(not flipped):
+        self._new_level__(-lit)
+        self.m_flipped[-1] = True
+        return True
+    return False
+
+  def _current_model__(self):
+    return [None] + [self.m_values[v << 1] for v in range(1, self.m_nb_vars + 1)]
+
+  def _pick__(self):
+    v = self.m_next
+    values = self.m_values
+    while((v <= self.m_nb_vars) and (values[v << 1] is not None)):
+      v += 1
+    self.m_next = v
+    return (v if(v <= self.m_nb_vars) else 0)
+
+  ##########################################
+  # manual decision levels
+
+  def value(self, lit):
+    """value(int) -> bool | None
+Returns the current value of the literal (None if it is not assigned)
+    """
+    if(abs(lit) > self.m_nb_vars): return None
+    return self.m_values[_lidx__(lit)]
+
+  def assume(self, lit):
+    """assume(int) -> bool
+Opens a new decision level where `lit` is true, and propagates it.
+In case of conflict, the level is canceled and False is returned.
+    """
+    self.ensure_var(abs(lit))
+    if(not self.m_ok): return False
+    if(len(self.m_trail_lim) == 0) and (self._propagate__() is not None):
+      self.m_ok = False
+      return False
+    value = self.m_values[_lidx__(lit)]
+    if(value is False): return False
+    elif(value is True): # already implied: open an empty level, so every `assume` is matched by one `retract`
+      self.m_trail_lim.append(len(self.m_trail))
+      self.m_flipped.append(False)
+      return True
+    self._new_level__(lit)
+    if(self._propagate__() is not None):
+      self._backtrack__(len(self.m_trail_lim) - 1)
+      return False
+    return True
+
+  def retract(self):
+    """retract() -> None
+Cancels the last decision level opened with `assume`
+    """
+    if(self.m_trail_lim):
+      self._backtrack__(len(self.m_trail_lim) - 1)
+
+  @property
+  def level(self):
+    """The current number of decision levels"""
+    return len(self.m_trail_lim)
+
+  def trail(self, level=None):
+    """trail(int) -> list[int]
+Returns the literals assigned at the given decision level (by default, the current level)
+    """
+    if(level is None): level = len(self.m_trail_lim)
+    start = (0 if(level == 0) else self.m_trail_lim[level-1])
+    end = (self.m_trail_lim[level] if(level < len(self.m_trail_lim)) else len(self.m_trail))
+    return self.m_trail[start:end]
+
+  ##########################################
+  # internal
+
+  def _new_level__(self, lit):
+    self.m_trail_lim.append(len(self.m_trail))
+    self.m_flipped.append(False)
+    self._assign__(lit, None)
+
+  def _assign__(self, lit, reason):
+    self.m_values[_lidx__(lit)] = True
+    self.m_values[_lidx__(-lit)] = False
+    self.m_reasons[abs(lit)] = reason
+    self.m_trail.append(lit)
+
+  def _backtrack__(self, level):
+    if(len(self.m_trail_lim) > level):
+      lim = self.m_trail_lim[level]
+      values = self.m_values
+      for lit in self.m_trail[lim:]:
+        v = abs(lit)
+        values[v << 1] = None
+        values[(v << 1) | 1] = None
+        if(v < self.m_next): self.m_next = v
+      del self.m_trail[lim:]
+      del self.m_trail_lim[level:]
+      del self.m_flipped[level:]
+      self.m_qhead = len(self.m_trail)
+
+  def _propagate__(self):
+    """Unit propagation: returns the index of a conflicting clause, or None"""
+    values = self.m_values
+    clauses = self.m_clauses
+    watches = self.m_watches
+    trail = self.m_trail
+    while(self.m_qhead < len(trail)):
+      false_lit = -trail[self.m_qhead]
+      self.m_qhead += 1
+      ws = watches[_lidx__(false_lit)]
+      kept = []
+      i = 0
+      nb = len(ws)
+      while(i < nb):
+        ci = ws[i]
+        i += 1
+        clause = clauses[ci]
+        if(clause[0] == false_lit):
+          clause[0] = clause[1]
+          clause[1] = false_lit
+        first = clause[0]
+        if(values[_lidx__(first)] is True):
+          kept.append(ci)
+          continue
+        # look for a new literal to watch
+        found = False
+        for k in range(2, len(clause)):
+          lit = clause[k]
+          if(values[_lidx__(lit)] is not False):
+            clause[1] = lit
+            clause[k] = false_lit
+            watches[_lidx__(lit)].append(ci)
+            found = True
+            break
+        if(found): continue
+        kept.append(ci)
+        if(values[_lidx__(first)] is False): # conflict
+          kept.extend(ws[i:])
+          watches[_lidx__(false_lit)] = kept
+          return ci
+        self._assign__(first, ci)
+      watches[_lidx__(false_lit)] = kept
+    return None
+
+  def _analyze_final__(self, lits, deps=None):
+    """Returns the assumptions (and the decisions) that imply the negation of all the literals in parameter,
+ where the flipped decisions in `deps` are replaced by the literals on which they depend
+    """
+    seen = set(abs(lit) for lit in lits)
+    res = []
+    start = (self.m_trail_lim[0] if(self.m_trail_lim) else len(self.m_trail))
+    for i in range(len(self.m_trail) - 1, start - 1, -1):
+      lit = self.m_trail[i]
+      v = abs(lit)
+      if(v in seen):
+        reason = self.m_reasons[v]
+        if(reason is None):
+          if((deps is not None) and (v in deps)): res.extend(deps[v])
+          else: res.append(lit)
+        else:
+          seen.update(abs(l) for l in self.m_clauses[reason])
+    return res
@@ -33,14 +33,23 @@ This file contains
     In J. Syst. Softw. 195 (2023), 111510.
 """
 
+import os
 import itertools
 import inspect
+import copy
+import pickle
+import hashlib
+import functools
+import concurrent.futures
 from collections import namedtuple
 
 import networkx as nx
 
 from pydop.fm_result import decl_errors__c, eval_result__c
-from pydop.fm_configuration import configuration__c
+from pydop.fm_configuration import configuration__c, product__c
+from pydop.cache import lru_cache__c, disk_cache__c
+from pydop.utils import imap_bounded, import_object, enumerate_chunks
+from pydop.spl_analysis import spl_analysis__c
 
 
 ###############################################################################
@@ -59,15 +68,52 @@ This CK is constructed with ith the `delta` method which in turns calls the `add
 The `order` object is accessible from the SPL with the `ordering` attribute.
 
 Variant generation is done by simply calling the SPL with a valid product.
+The `validate` method returns a validated product (a `fm_configuration.product__c` object)
+ that this SPL will neither close nor validate again.
+The list of deltas executed for a product (its plan) is given by the `plan` method;
+ the plans of the last generated products are cached, so generating again the same product
+ neither validates it nor evaluates the delta guards.
+Moreover, the guards that can only be true if one of their features is selected are indexed by these features,
+ so computing a plan only evaluates the guards of the selected features, and the other guards.
+Finally, the generated variants can be stored in a persistent cache (see the `set_disk_cache` method),
+ to be reused across executions, and the execution of the deltas can be profiled (see the `enable_profiling` method)
+ or observed with callbacks (see the `add_hook` method).
+With variants supporting it, the operations done by the deltas of a plan can also be recorded, and replayed
+ to generate the same plan again (see the `set_replay` method).
   """
 
-  __slots__ = ("m_fm", "m_bm_factory", "m_reg",)
+  __slots__ = (
+    "m_fm", "m_bm_factory", "m_reg", "m_plans", "m_plans_revision",
+    "m_async",          # aio.async_generator__c: the configuration of `agenerate` (created on demand)
+    "m_disk",           # None, or tuple[cache.disk_cache__c, dumps, loads]: the persistent cache of the variants
+    "m_fingerprints",   # dict[object -> str]: the fingerprints of the feature model, base module factory and delta functions
+    "m_profile",        # None, or profiler.profile__c: the statistics of the deltas (when profiling is enabled)
+    "m_hooks",          # None, or hooks__c: the callbacks called during variant generation (when at least one is registered)
+    "m_replay",         # None, or list[revision, cache.lru_cache__c]: the operation logs of the last generated plans (when replay is enabled)
+    "m_analyze",        # bool: if the guards of the deltas are analyzed at registration
+    "m_simplify",       # bool: if the guards of the deltas are simplified w.r.t. the feature model at registration
+    "m_analysis",       # None, or spl_analysis.spl_analysis__c: the analysis of the guards (created at the first registration)
+    "m_dead",           # set[str]: the deltas that are never activated (detected at registration), which are never evaluated
+    "m_always",         # set[str]: the deltas that are always activated (detected at registration), whose guards are not evaluated
+    "m_folded",         # tuple[delta_info_cls]: the always activated deltas executed in the base module (see `fold_always_active`)
+    "m_folded_base",    # the base module on which the folded deltas were executed (meaningful only if there are folded deltas)
+    "m_guard_index",    # dict[feature -> list[delta_info_cls]]: the deltas whose guard is false when none of their features is selected
+    "m_guard_always",   # list[delta_info_cls]: the deltas whose guard must always be evaluated (e.g., constant or negated guards)
+    "m_guard_indexed",  # set[str]: the names of the deltas in the two previous fields
+    "m_guard_order",    # tuple[revision, dict[str -> int], list[delta_info_cls]]: the position of each delta in the ordering, and the non indexed deltas
+  )
 
-  def __init__(self, fm, dreg, bm_factory=None):
+  def __init__(self, fm, dreg, bm_factory=None, plan_cache_size=128, analyze_guards=False, simplify_guards=False):
     """parameters:
   fm: the feature model of the SPL (can be an object of any class with the same API of the `fm_diagram._fd__c` class)
   dreg: the ordering object of the SPL (can be an object of any class with an `add` and `__iter__` methods like the `spl.RegistryCategory` class)
   bm_factory: an optional factory (i.e., a function () -> object) generating the base module of the SPL
+  plan_cache_size: the number of plans kept in cache (None for no bound, 0 to disable the cache).
+    Plans are cached only if the ordering object has a `revision` attribute, changing every time the ordering is modified.
+  analyze_guards: if True, the guard of every registered delta is checked against the feature model with a solver (see `spl_analysis`):
+    the deltas that are never activated are never evaluated, and the deltas that are always activated have a constant guard.
+  simplify_guards: if True, the guard of every registered delta is simplified w.r.t. the feature model (see `spl_analysis.spl_analysis__c.simplify`):
+    e.g., the checks of the mandatory parents of a feature are removed.
     """
     # 1. ensures that the feature model is correctly constructed
     errors = fm.check()
@@ -77,9 +123,36 @@ Variant generation is done by simply calling the SPL with a valid product.
     self.m_fm = fm
     self.m_reg = dreg
     self.m_bm_factory = bm_factory
+    self.m_plans = lru_cache__c(plan_cache_size)
+    self.m_plans_revision = None
+    self.m_guard_index = {}
+    self.m_guard_always = []
+    self.m_guard_indexed = set()
+    self.m_guard_order = None
+    self.m_async = None
+    self.m_disk = None
+    self.m_fingerprints = {}
+    self.m_profile = None
+    self.m_hooks = None
+    self.m_replay = None
+    self.m_analyze = analyze_guards
+    self.m_simplify = simplify_guards
+    self.m_analysis = None
+    self.m_dead = set()
+    self.m_always = set()
+    self.m_folded = ()
+    self.m_folded_base = None
 
   @property
   def ordering(self): return self.m_reg
+  @property
+  def dead_deltas(self):
+    """The names of the deltas that are never activated (detected at registration)"""
+    return frozenset(self.m_dead)
+  @property
+  def always_active_deltas(self):
+    """The names of the deltas that are always activated (detected at registration)"""
+    return frozenset(self.m_always)
 
 
   def link_constraint(self, c):
@@ -91,9 +164,24 @@ Variant generation is done by simply calling the SPL with a valid product.
     return self.m_fm.link_configuration(conf)
 
   def close_configuration(self, *confs):
-    """Simple alias to the `close_configuration` method of the feature model"""
+    """Simple alias to the `close_configuration` method of the feature model
+ (a product validated by this SPL is returned as is)
+    """
+    if((len(confs) == 1) and self._is_trusted__(confs[0])):
+      return (confs[0], decl_errors__c())
     return self.m_fm.close_configuration(*confs)
 
+  def validate(self, conf):
+    """validate(dict | configuration__c) -> fm_configuration.product__c
+Closes and validates the configuration in parameter, and returns it as a validated product,
+ that this SPL (and the MPLs containing it) will neither close nor validate again.
+Raises an exception if the configuration is not a valid product of this SPL.
+    """
+    return self._plan__(conf)[0]
+
+  def _is_trusted__(self, conf):
+    return isinstance(conf, product__c) and conf.is_product_of(self.m_fm)
+
   def __call__(self, conf, bm=None):
     """Variant Generation
 parameters:
@@ -101,41 +189,509 @@ parameters:
   bm: an optional base module. If this parameter is provided, the bm_factory will not be used.
       Moreover, if bm and bm_factory are not provided, the bm is set to None
 """
-    # 1. check that the conf parameter is a valid product of the SPL
+    # 1. get the plan of the product (checking that the conf parameter is a valid product of the SPL)
+    conf, plan = self._plan__(conf)
+    # 2. look for the variant in the persistent cache
+    disk = self.m_disk if(bm is None) else None
+    if(disk is not None):
+      cache, dumps, loads = disk
+      key = self._variant_key__(conf, plan)
+      data = cache.get(key)
+      if(data is not None):
+        return loads(data)
+    # 3. generate the variant
+    # 3.1. get the base module
+    variant = self._base_module__(bm)
+
+    # 3.2. execute the activated delta
+    hooks = self.m_hooks
+    if((hooks is None) and (self.m_profile is None) and (self.m_replay is None)):
+      for info in plan:
+        variant = _apply_delta__(info, variant, conf)
+    else:
+      if(hooks is not None):
+        plan = hooks.plan(conf, plan)
+      if((self.m_replay is not None) and (bm is None)):
+        variant = self._replay__(plan, variant, conf)
+      else:
+        apply_f = self._apply_function__(1)
+        for info in plan:
+          variant = apply_f(info, variant, conf)
+      if(hooks is not None):
+        variant = hooks.variant(variant, conf)
+    if(disk is not None):
+      cache.put(key, dumps(variant))
+    return variant
+
+  def generate_many(self, confs, snapshot=None):
+    """generate_many(iterable[dict | configuration__c]) -> list[object]
+generate_many(iterable[dict | configuration__c], callable) -> list[object]
+Generates the variants of all the products in parameter, and returns them in the same order.
+The plans of the products are organized in a trie, so the deltas of a common prefix of several plans are executed only once:
+ at a branching point, every branch but the last continues from a snapshot of the intermediate variant.
+Deltas taking the product in parameter are shared only between identical products.
+Parameters:
+  confs: the products
+  snapshot: the function copying an intermediate variant.
+    By default, the `snapshot` method of the variant's class is used if it exists (e.g., for `operations.modules` variants),
+    and `copy.deepcopy` otherwise.
+    """
+    if(snapshot is None):
+      snapshot = _snapshot__
+    # 1. build the trie of the plans:
+    #  a node is a pair (dict[step -> (delta_info_cls, node)], list[index of the products ending at that node])
+    #  and a step is a pair (delta name, product if the delta takes the product in parameter and None otherwise)
+    root = ({}, [])
+    nb_products = 0
+    hooks = self.m_hooks
+    products = [] # the products, stored only if the on_variant hooks must be called
+    for idx, conf in enumerate(confs):
+      conf, plan = self._plan__(conf)
+      if(hooks is not None):
+        plan = hooks.plan(conf, plan)
+        products.append(conf)
+      nb_products += 1
+      node = root
+      for info in plan:
+        step = (info.name, (conf if(info.nb_args > 1) else None))
+        sub = node[0].get(step)
+        if(sub is None):
+          sub = ({}, [])
+          node[0][step] = (info, sub)
+        else:
+          sub = sub[1]
+        node = sub
+      node[1].append(idx)
+    res = [None] * nb_products
+    if(nb_products == 0):
+      return res
+    # 2. execute the trie
+    apply_f = self._apply_function__(nb_products)
+    variant = self._base_module__(None)
+    stack = [(root, variant)]
+    while(stack):
+      (children, ends), variant = stack.pop()
+      for idx in ends:
+        res[idx] = snapshot(variant) if(children or (idx != ends[-1])) else variant
+      last = len(children) - 1
+      for i, ((_, conf), (info, sub)) in enumerate(children.items()):
+        branch = variant if(i == last) else snapshot(variant)
+        stack.append((sub, apply_f(info, branch, conf))) # conf is None if the delta does not take the product
+    if(hooks is not None):
+      res = [hooks.variant(variant, conf) for variant, conf in zip(res, products)]
+    return res
+
+  def generate_lazy(self, conf, bm=None):
+    """generate_lazy(dict | configuration__c, object) -> lazy.lazy_variant__c
+Lazy variant generation: returns a proxy around the variant of the product in parameter (see the `lazy` module),
+ where the activated deltas with declared targets are executed only when an element they target is accessed.
+The deltas without declared targets, and all the deltas before them, are executed immediately.
+The profiler and the delta hooks are used when the deltas are executed,
+ but the "on_variant" hooks are not called, and the persistent cache is not used.
+    """
+    from pydop.lazy import lazy_variant__c
+    conf, plan = self._plan__(conf)
+    hooks = self.m_hooks
+    if(hooks is not None):
+      plan = hooks.plan(conf, plan)
+    variant = self._base_module__(bm)
+    split = 0
+    for i, info in enumerate(plan):
+      if(info.targets is None):
+        split = i + 1
+    apply_f = self._apply_function__(1)
+    for info in plan[:split]:
+      variant = apply_f(info, variant, conf)
+    return lazy_variant__c(variant, plan[split:], conf, apply_f)
+
+  def generate_parallel(self, confs, workers=None, factory=None, serializer=None, chunksize=1, max_pending=None):
+    """generate_parallel(iterable[dict | configuration__c], int, str, callable, int, int) -> iterator[tuple[int, object]]
+Generates the variants of the products in parameter in a pool of processes,
+ and yields the pairs (index of the product in `confs`, variant) in completion order.
+Every worker process receives the SPL only once, at its creation.
+Parameters:
+  confs: the products
+  workers: the number of worker processes (None means the number of CPUs, and 0 means no worker process)
+  factory: the importable path "module:name" of this SPL, or of a function returning it (see `load_spl`).
+    By default, the SPL itself is given to the worker processes, which requires it to be picklable
+    (e.g., deltas defined at the top level of a module), unless the processes are forked.
+  serializer: a function applied by the workers on every variant to send it back (e.g., returning the source of a generated module).
+    By default, the variants are sent as they are, and must be picklable (the serializer itself must be picklable).
+  chunksize: the number of products sent at once to a worker (the variants of a chunk are generated with `generate_many`)
+  max_pending: the maximal number of chunks being generated or waiting for generation (by default, twice the number of workers)
+    """
+    chunks = enumerate_chunks((self._portable__(conf) for conf in confs), chunksize)
+    if(workers == 0):
+      spl = self if(factory is None) else load_spl(factory)
+      for chunk in chunks:
+        yield from _generate_chunk__(spl, chunk, serializer)
+    else:
+      with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_worker_init__, initargs=(self if(factory is None) else factory,)) as executor:
+        if(max_pending is None):
+          max_pending = 2 * (workers or os.cpu_count() or 1)
+        tasks = ((chunk, serializer) for chunk in chunks)
+        for results in imap_bounded(executor, _worker_generate_chunk__, tasks, max_pending):
+          yield from results
+
+  def configure_async(self, executor=None, max_concurrency=None, timeout=None):
+    """configure_async(concurrent.futures.Executor, int, float) -> None
+Configures the `agenerate` method:
+  executor: the executor running the variant generations (by default, the executor of the event loop).
+    With a process pool, the SPL and its variants must be picklable.
+  max_concurrency: the maximal number of variant generations running at the same time (None for no bound)
+  timeout: the default timeout of a variant generation, in seconds (None for no timeout)
+    """
+    from pydop.aio import async_generator__c
+    self.m_async = async_generator__c(executor, max_concurrency, timeout)
+
+  async def agenerate(self, conf, bm=None, timeout=None):
+    """agenerate(dict | configuration__c, object, float) -> object
+Asynchronous version of the variant generation (see `__call__` and `configure_async`):
+ the deltas are executed in an executor, so the event loop is not blocked.
+Concurrent requests for the same product (without base module in parameter) share the same generation, and thus the same variant.
+Raises asyncio.TimeoutError if the generation takes more than `timeout` seconds (by default, the timeout set by `configure_async`).
+    """
+    if(self.m_async is None):
+      self.configure_async()
     if(not isinstance(conf, configuration__c)):
       conf, errors = self.close_configuration(conf)
       if(bool(errors)):
         raise ValueError(errors)
-    is_product = self.m_fm(conf)
-    # 2. generate the variant
-    if(bool(is_product)):
-      # 2.1. get the base module
-      variant = bm
-      if((variant is None) and (self.m_bm_factory is not None)):
-        variant = self.m_bm_factory()
-
-      # 2.2. iterate over all delta and execute the activated ones
-      for delta_f, guard, _, nb_args in self.m_reg:
-        act = guard(conf)
-        # print(f"checking delta \"{delta_f.__name__}\" ({guard}) -> {type(act)}:{bool(act)}")
-        if(act):
-          # executes the delta with the correct numbers of parameters
-          # and manages its return value: if not None, it is the updated version of the variant
-          # print(f"BEGIN {delta_f.__name__}")
-          if(nb_args == 0):
-            tmp_variant = delta_f()
-          elif(nb_args == 1):
-            tmp_variant = delta_f(variant)
-          else:
-            tmp_variant = delta_f(variant, conf)
-          if(tmp_variant is not None):
-            variant = tmp_variant
-          # print(f"END {delta_f.__name__}")
+    key = None if(bm is not None) else conf.freeze()
+    return await self.m_async.run(functools.partial(self, conf, bm), key, timeout)
+
+  def set_disk_cache(self, directory, dumps=None, loads=None):
+    """set_disk_cache(str | cache.disk_cache__c | None, callable, callable) -> None
+Stores the variants generated by this SPL (without base module in parameter) in a persistent cache,
+ so that generating a product again, even in another execution, only loads its stored variant.
+The variants are stored under the key given by the `variant_key` method.
+Parameters:
+  directory: the directory of the cache (or the cache itself), or None to disable the cache
+  dumps: the function converting a variant into bytes (by default, `pickle.dumps`)
+  loads: the function converting bytes back into a variant (by default, `pickle.loads`)
+    """
+    if(directory is None):
+      self.m_disk = None
+      return
+    if(not hasattr(self.m_fm, "fingerprint")):
+      raise ValueError(f"ERROR: the feature model of the SPL (of class \"{type(self.m_fm).__name__}\") has no fingerprint")
+    if(not isinstance(directory, disk_cache__c)):
+      directory = disk_cache__c(directory)
+    self.m_disk = (directory, (pickle.dumps if(dumps is None) else dumps), (pickle.loads if(loads is None) else loads))
 
+  @property
+  def disk_cache(self): return (None if(self.m_disk is None) else self.m_disk[0])
+
+  def variant_key(self, conf):
+    """variant_key(dict | configuration__c) -> str
+Returns the key of the variant of the product in parameter in the persistent cache (a hash in hexadecimal format).
+This key combines the fingerprint of the feature model, the content of the product,
+ the code of the base module factory, and the name and code of the activated deltas in their execution order.
+Hence, modifying a delta only changes the keys of the products activating it.
+Note that the values captured by the deltas (e.g., global variables or closures) are not part of the key.
+    """
+    return self._variant_key__(*self._plan__(conf))
+
+  def _variant_key__(self, conf, plan):
+    fingerprints = self.m_fingerprints
+    h = hashlib.sha256()
+    # 1. the feature model
+    res = fingerprints.get(self.m_fm)
+    if(res is None):
+      res = self.m_fm.fingerprint()
+      fingerprints[self.m_fm] = res
+    h.update(res.encode())
+    # 2. the product
+    for name, value in sorted(self.m_fm.export_configuration(conf).items()):
+      h.update(f"\0{name}\0{_stable_repr__(value)}".encode())
+    # 3. the base module factory and the deltas
+    h.update(b"\1")
+    h.update(_fingerprint_function__(self.m_bm_factory, fingerprints).encode())
+    for info in itertools.chain(self.m_folded, plan): # the folded deltas are executed first: folding does not change the key
+      h.update(f"\0{info.name}\0{info.nb_args}\0".encode())
+      h.update(_fingerprint_function__(info.delta, fingerprints).encode())
+    return h.hexdigest()
+
+  def enable_profiling(self, memory=False):
+    """enable_profiling(bool) -> profiler.profile__c
+Starts recording statistics on the deltas of this SPL (see the `profiler` module), and returns the object containing them.
+If `memory` is True, the memory allocated by every delta is also measured, with the `tracemalloc` module
+ (which is started if needed, and significantly slows down the execution).
+Note that the guards are evaluated only when a plan is computed: the plans in cache are not evaluated again.
+    """
+    from pydop.profiler import profile__c
+    self.disable_profiling()
+    self.m_profile = profile__c(memory)
+    self.m_profile.start()
+    return self.m_profile
+
+  def disable_profiling(self):
+    """disable_profiling() -> profiler.profile__c | None
+Stops recording statistics on the deltas of this SPL, and returns the recorded statistics (None if profiling was not enabled)
+    """
+    res = self.m_profile
+    if(res is not None):
+      res.stop()
+      self.m_profile = None
+    return res
+
+  @property
+  def profile(self): return self.m_profile
+
+  def add_hook(self, event, f):
+    """add_hook(str, callable) -> callable
+Registers the callback `f` (which is returned) for the event in parameter, among:
+  "on_plan": called as f(product, plan) when the plan of a product is about to be executed;
+    if the call does not return None, its result (a list of deltas) replaces the plan
+  "before_delta": called as f(delta_info, variant, product) before the execution of a delta
+  "after_delta": called as f(delta_info, variant, product) after the execution of a delta;
+    if the call does not return None, its result replaces the variant
+  "on_variant": called as f(variant, product) when the generation of a variant is completed;
+    if the call does not return None, its result replaces the variant
+  "on_error": called as f(exception, delta_info, variant, product) when the execution of a delta raises an exception,
+    which is propagated after all the callbacks have been called
+The callbacks of an event are called in their registration order.
+The hooks are called by `__call__` and `generate_many`, but not when a variant is loaded from the persistent cache.
+Note that in `generate_many`, the product given to the delta hooks is None for the deltas not taking the product in parameter,
+ as their execution may be shared between several products.
+When no hook is registered, variant generation is not impacted.
+    """
+    if(self.m_hooks is None):
+      self.m_hooks = hooks__c()
+    self.m_hooks.add(event, f)
+    return f
+
+  def remove_hook(self, event, f):
+    """remove_hook(str, callable) -> None
+Unregisters the callback `f` for the event in parameter
+    """
+    hooks = self.m_hooks
+    if(hooks is None):
+      raise ValueError(f"ERROR: no hook registered for the event \"{event}\"")
+    hooks.remove(event, f)
+    if(not bool(hooks)):
+      self.m_hooks = None
+
+  def set_replay(self, cache_size=128):
+    """set_replay(int | None) -> None
+Enables (or disables, with a cache size of 0) the replay of plans:
+ when a plan is executed on a base module whose class supports recording (like the `operations.modules` variants),
+ the operations done by its deltas are recorded, and the next generations of the same plan
+ replay these operations instead of executing the deltas again.
+The logs of the last `cache_size` plans are kept (None for no bound),
+ where the plans containing a delta taking the product in parameter are specific to their product.
+The deltas are assumed to only modify the variant with its operations (add, remove, modify, etc):
+ the plans where a delta returns a new variant are never replayed.
+When a plan is replayed, the profiler and the delta hooks are not used.
+    """
+    if(cache_size == 0): self.m_replay = None
+    else: self.m_replay = [None, lru_cache__c(cache_size)]
+
+  def _replay__(self, plan, variant, conf):
+    # executes the plan on the variant, by replaying its recorded operations if possible
+    cls = type(variant)
+    if(not hasattr(cls, "replay")):
+      apply_f = self._apply_function__(1)
+      for info in plan:
+        variant = apply_f(info, variant, conf)
       return variant
+    # 1. get the log of the plan
+    revision = getattr(self.m_reg, "revision", None)
+    if(revision != self.m_replay[0]):
+      self.m_replay[1].clear()
+      self.m_replay[0] = revision
+    logs = self.m_replay[1]
+    key = (tuple(info.name for info in plan), (conf if(any((info.nb_args > 1) for info in plan)) else None))
+    log = logs.get(key)
+    if(log is not None):
+      cls.replay(variant, log)
+      return variant
+    # 2. execute and record the plan
+    apply_f = self._apply_function__(1)
+    res = variant
+    cls.start_recording(variant)
+    try:
+      for info in plan:
+        res = apply_f(info, res, conf)
+    finally:
+      log = cls.stop_recording(variant)
+    if((revision is not None) and (res is variant)):
+      logs.put(key, log)
+    return res
+
+  def _apply_function__(self, nb_variants):
+    # returns the function executing a delta, with the profiling and the hooks if enabled
+    res = _apply_delta__
+    profile = self.m_profile
+    if(profile is not None):
+      res = functools.partial(profile.apply, res)
+      profile.add_variants(nb_variants)
+    if(self.m_hooks is not None):
+      res = functools.partial(self.m_hooks.apply, res)
+    return res
+
+  def _portable__(self, conf):
+    # the configurations linked to the feature model are exported with the full names of their variables
+    #  (without the leading "/"), to be linked again by the worker processes
+    if(isinstance(conf, configuration__c) and (conf.m_resolver is not None)):
+      return {name[1:]: value for name, value in self.m_fm.export_configuration(conf).items()}
+    return conf
+
+  def plan(self, conf):
+    """plan(dict | configuration__c) -> list[delta_info_cls]
+Returns the deltas activated by the product in parameter, in their execution order, without executing them
+    """
+    return list(self._plan__(conf)[1])
+
+  def _plan__(self, conf):
+    # returns the pair (validated product, plan) for the configuration in parameter, using the cache if possible
+    # 1. get the canonical product
+    trusted = self._is_trusted__(conf)
+    if(not isinstance(conf, configuration__c)):
+      conf, errors = self.close_configuration(conf)
+      if(bool(errors)):
+        raise ValueError(errors)
+    key = conf.freeze()
+    revision = getattr(self.m_reg, "revision", None)
+    if(revision is not None):
+      if(revision != self.m_plans_revision):
+        self.m_plans.clear()
+        self.m_plans_revision = revision
+      res = self.m_plans.get(key)
+      if(res is not None): # the product was already validated
+        return res
+    # 2. check that the conf parameter is a valid product of the SPL
+    if(not trusted):
+      is_product = self.m_fm(key)
+      if(not bool(is_product)):
+        raise Exception(f"The given configuration is not a valid product for this SPL:\n{is_product.m_reason}")
+      key = product__c(key, self.m_fm)
+    # 3. compute the plan
+    conf_dict = key.m_dict
+    candidates = self.m_reg if(revision is None) else self._candidates__(conf_dict, revision)
+    profile = self.m_profile
+    if(profile is None):
+      plan = []
+      for info in candidates:
+        check = info.check
+        act = info.guard(key) if(check is None) else check(conf_dict)
+        # print(f"checking delta \"{info.name}\" ({info.guard}) -> {type(act)}:{bool(act)}")
+        if(act):
+          plan.append(info)
     else:
-      raise Exception(f"The given configuration is not a valid product for this SPL:\n{is_product.m_reason}")
+      plan = [info for info in candidates if(profile.check(info, key, conf_dict))]
+    plan = tuple(plan)
+    if(revision is not None):
+      self.m_plans.put(key, (key, plan))
+    return key, plan
+
+
+  def _candidates__(self, conf_dict, revision):
+    # returns the deltas, in execution order, whose guard can be true for the product in parameter
+    order = self.m_guard_order
+    if((order is None) or (order[0] != revision)):
+      positions = {}
+      extra = []
+      for i, info in enumerate(self.m_reg):
+        positions[info.name] = i
+        if(info.name not in self.m_guard_indexed): # registered without the `delta` method
+          extra.append(info)
+      order = (revision, positions, extra)
+      self.m_guard_order = order
+    _, positions, extra = order
+    res = {}
+    for key, infos in self.m_guard_index.items():
+      if(conf_dict.get(key, False)):
+        for info in infos:
+          res[info.name] = info
+    for info in itertools.chain(self.m_guard_always, extra):
+      res[info.name] = info
+    return sorted(res.values(), key=(lambda info: positions[info.name]))
 
+  def _analyze_guard__(self, info):
+    # checks the guard of the delta in parameter against the feature model:
+    #  if the delta is always activated, its guard is replaced by a constant
+    analysis = self._analysis__()
+    if(analysis.is_dead(info)):
+      self.m_dead.add(info.name)
+    elif(analysis.is_always_active(info)):
+      self.m_always.add(info.name)
+      info = info._replace(check=_always__)
+    return info
+
+  def _analysis__(self):
+    # returns the analysis of the guards of this SPL, created on the first call
+    if(self.m_analysis is None):
+      self.m_analysis = spl_analysis__c(self)
+    return self.m_analysis
+
+  def fold_always_active(self):
+    """fold_always_active() -> list[str]
+Executes once, on the base module, the deltas that are always activated (see the `analyze_guards` parameter of the constructor)
+ and that are executed before all the other deltas, and do not take the product in parameter.
+The result becomes the base module of the SPL (every variant starting from a snapshot of it, see `generate_many`),
+ and these deltas are not executed anymore, except on the base modules given in parameter of variant generation.
+Returns the names of the folded deltas.
+    """
+    if(getattr(self.m_reg, "revision", None) is None):
+      raise Exception("ERROR: folding deltas requires an ordering object with a `revision` attribute")
+    folded = set(info.name for info in self.m_folded)
+    prefix = []
+    for info in self.m_reg:
+      if((info.name in self.m_dead) or (info.name in folded)):
+        continue
+      elif((info.name in self.m_always) and (info.nb_args < 2)):
+        prefix.append(info)
+      else:
+        break
+    if(prefix):
+      base = self._base_module__(None)
+      for info in prefix:
+        base = _apply_delta__(info, base, None)
+      self.m_folded_base = base
+      self.m_folded = self.m_folded + tuple(prefix)
+      names = set(info.name for info in prefix)
+      self.m_guard_always = [info for info in self.m_guard_always if(info.name not in names)]
+      self.m_plans.clear()
+    return [info.name for info in prefix]
+
+  def _base_module__(self, bm):
+    # returns the base module of a new variant: the one in parameter, on which the folded deltas are executed,
+    #  or a snapshot of the folded base module, or a new one from the factory
+    if(bm is not None):
+      for info in self.m_folded:
+        bm = _apply_delta__(info, bm, None)
+      return bm
+    elif(self.m_folded):
+      return _snapshot__(self.m_folded_base)
+    elif(self.m_bm_factory is not None):
+      return self.m_bm_factory()
+    return None
+
+  def _index_guard__(self, info):
+    # adds the delta in parameter to the guard index:
+    #  its guard must be compiled, only contain features, and be false when all of them are not selected
+    #  (the deltas that are never activated are not added)
+    self.m_guard_indexed.add(info.name)
+    if(info.name in self.m_dead):
+      return
+    keys = getattr(info.guard, "vars", None)
+    indexed = ((info.check is not None) and (keys is not None) and self._are_features__(keys))
+    if(indexed):
+      try: indexed = not info.check({key: False for key in keys})
+      except Exception: indexed = False
+    if(indexed):
+      for key in keys:
+        self.m_guard_index.setdefault(key, []).append(info)
+    else:
+      self.m_guard_always.append(info)
+
+  def _are_features__(self, keys):
+    # the variables of the guards are features if the CNF translation of the feature model has a variable for them
+    if(not hasattr(self.m_fm, "compiled")):
+      return False
+    compiled = self.m_fm.compiled()
+    return all((compiled.var(key) is not None) for key in keys)
 
   def delta(self, guard, *args, **kwargs):
     """Delta Registration: this method registers a function as a delta of the SPL, and setup the SPL's CK.
@@ -146,13 +702,20 @@ Parameters:
   args: additional non keyworded arguments for the `order` object
   kwargs: additional keyworded arguments for the `order` object
           moreover, the keyword `"name"` sets the name of the delta (by default, the name of the function is used)
+          and the keyword `"targets"` (which is not given to the `order` object) declares the names of the elements
+          of the variant that the delta adds, modifies, removes or reads (a name or an iterable of names, see `generate_lazy`)
     """
+    targets = kwargs.pop("targets", None)
+    if(targets is not None):
+      targets = frozenset((targets,) if(isinstance(targets, str)) else targets)
     def __inner(delta_f):
       nonlocal guard
-      # 1. ensures that the guard is well formed
+      # 1. ensures that the guard is well formed (and simplifies it, if enabled)
       guard, errors = self.m_fm.link_constraint(guard)
       if(bool(errors)):
         raise Exception(f"ERROR in guard of delta {delta_f.__name__}:\n{str(errors)}")
+      if(self.m_simplify):
+        guard = self._analysis__().simplify(guard)
 
       # 2. ensures the delta has the correct numbers of parameters
       sig = inspect.signature(delta_f)
@@ -160,14 +723,172 @@ Parameters:
       if (nb_args > 2):
         raise Exception(f"number of argument for delta {delta_f.__name__} must be <= 2.")
 
-      # 3. registers the delta
+      # 3. compiles the guard (if supported by its class), to evaluate it without building a reason
+      compile_f = getattr(guard, "compile", None)
+      check = None if(compile_f is None) else compile_f()
+
+      # 4. registers the delta
       delta_name = kwargs.get("name", delta_f.__name__) # get the name of the delta
-      self.m_reg.add(delta_info_cls(delta_f, guard, delta_name, nb_args), *args, **kwargs)
+      info = delta_info_cls(delta_f, guard, delta_name, nb_args, check, targets)
+      if(self.m_analyze):
+        info = self._analyze_guard__(info)
+      self.m_reg.add(info, *args, **kwargs)
+      self._index_guard__(info)
 
       return delta_f
     return __inner
 
-delta_info_cls = namedtuple("delta_info_cls", ("delta", "guard", "name", "nb_args"))
+##########################################
+# parallel generation
+
+def load_spl(spec):
+  """load_spl(str) -> SPL
+Loads an SPL from its importable path "module:name".
+If the loaded object is a function, it is called without arguments to get the SPL.
+  """
+  res = import_object(spec)
+  if(callable(res) and (not isinstance(res, SPL))):
+    res = res()
+  return res
+
+def _generate_chunk__(spl, chunk, serializer):
+  variants = spl.generate_many(conf for _, conf in chunk)
+  if(serializer is not None):
+    variants = map(serializer, variants)
+  return list(zip((idx for idx, _ in chunk), variants))
+
+## worker side: the SPL is set once per process
+
+_worker_spl__ = None
+
+def _worker_init__(spl):
+  global _worker_spl__
+  if(isinstance(spl, str)):
+    spl = load_spl(spl)
+  _worker_spl__ = spl
+
+def _worker_generate_chunk__(args):
+  global _worker_spl__
+  chunk, serializer = args
+  return _generate_chunk__(_worker_spl__, chunk, serializer)
+
+
+##########################################
+# delta execution
+
+def _apply_delta__(info, variant, conf):
+  # executes the delta with the correct numbers of parameters
+  # and manages its return value: if not None, it is the updated version of the variant
+  nb_args = info.nb_args
+  if(nb_args == 0):
+    tmp_variant = info.delta()
+  elif(nb_args == 1):
+    tmp_variant = info.delta(variant)
+  else:
+    tmp_variant = info.delta(variant, conf)
+  return variant if(tmp_variant is None) else tmp_variant
+
+def _always__(conf_dict):
+  # the compiled guard of the deltas that are always activated
+  return True
+
+def _fingerprint_function__(f, fingerprints):
+  # returns the hash of the code of the function in parameter, and stores it in the `fingerprints` dictionary
+  if(f is None):
+    return ""
+  res = fingerprints.get(f)
+  if(res is None):
+    h = hashlib.sha256()
+    code = getattr(f, "__code__", None)
+    if(code is None): # e.g., a class or a callable object
+      h.update(getattr(f, "__qualname__", type(f).__qualname__).encode())
+      code = getattr(getattr(f, "__call__", None), "__code__", None)
+    if(code is not None):
+      _fingerprint_code__(code, h)
+    res = h.hexdigest()
+    fingerprints[f] = res
+  return res
+
+def _fingerprint_code__(code, h):
+  h.update(code.co_code)
+  for data in (code.co_names, code.co_varnames, code.co_freevars):
+    h.update(("\0".join(data) + "\1").encode())
+  for const in code.co_consts:
+    if(inspect.iscode(const)): _fingerprint_code__(const, h)
+    elif(isinstance(const, frozenset)): h.update(f"frozenset:{_stable_repr__(const)}\0".encode())
+    else: h.update(f"{type(const).__name__}:{const!r}\0".encode())
+
+def _stable_repr__(value):
+  # returns the representation of the value in parameter, where the elements of sets and dictionaries are sorted (i.e., independent of the hash seed)
+  if(isinstance(value, (set, frozenset))):
+    return f"{type(value).__name__}({{{', '.join(sorted(map(_stable_repr__, value)))}}})"
+  elif(isinstance(value, dict)):
+    return f"{type(value).__name__}({{{', '.join(sorted(f'{_stable_repr__(k)}: {_stable_repr__(v)}' for k, v in value.items()))}}})"
+  elif(isinstance(value, (list, tuple))):
+    return f"{type(value).__name__}([{', '.join(map(_stable_repr__, value))}])"
+  else:
+    return repr(value)
+
+class hooks__c(object):
+  """The callbacks of the events of variant generation (see `SPL.add_hook`)"""
+  __slots__ = ("m_on_plan", "m_before_delta", "m_after_delta", "m_on_variant", "m_on_error",)
+  events = ("on_plan", "before_delta", "after_delta", "on_variant", "on_error",)
+
+  def __init__(self):
+    for event in self.events:
+      setattr(self, "m_" + event, [])
+
+  def _get__(self, event):
+    if(event not in self.events):
+      raise ValueError(f"ERROR: unknown event \"{event}\" (expected one of {', '.join(self.events)})")
+    return getattr(self, "m_" + event)
+
+  def add(self, event, f):
+    self._get__(event).append(f)
+
+  def remove(self, event, f):
+    callbacks = self._get__(event)
+    if(f not in callbacks):
+      raise ValueError(f"ERROR: hook {f} is not registered for the event \"{event}\"")
+    callbacks.remove(f)
+
+  def __bool__(self):
+    return any(getattr(self, "m_" + event) for event in self.events)
+
+  def plan(self, conf, plan):
+    for f in self.m_on_plan:
+      tmp = f(conf, plan)
+      if(tmp is not None): plan = tmp
+    return plan
+
+  def apply(self, apply_f, info, variant, conf):
+    for f in self.m_before_delta:
+      f(info, variant, conf)
+    try:
+      variant = apply_f(info, variant, conf)
+    except Exception as e:
+      for f in self.m_on_error:
+        f(e, info, variant, conf)
+      raise
+    for f in self.m_after_delta:
+      tmp = f(info, variant, conf)
+      if(tmp is not None): variant = tmp
+    return variant
+
+  def variant(self, variant, conf):
+    for f in self.m_on_variant:
+      tmp = f(variant, conf)
+      if(tmp is not None): variant = tmp
+    return variant
+
+def _snapshot__(variant):
+  f = getattr(type(variant), "snapshot", None)
+  if(f is None): return copy.deepcopy(variant)
+  else: return f(variant)
+
+# check: the compiled version of the guard (a function taking the dictionary of a linked configuration), or None
+# targets: the names of the elements of the variant accessed by the delta (a frozenset), or None if unknown (see `SPL.generate_lazy`)
+delta_info_cls = namedtuple("delta_info_cls", ("delta", "guard", "name", "nb_args", "check", "targets"), defaults=(None, None))
 
 
 ###############################################################################
@@ -178,11 +899,20 @@ delta_info_cls = namedtuple("delta_info_cls", ("delta", "guard", "name", "nb_arg
 # Generic graph
 
 class RegistryGraph(object):
-  """Implements a delta ordering using a networkx graph"""
-  __slots__ = ("m_content",)
+  """Implements a delta ordering using a networkx graph.
+The linearization of the graph is computed once (see the `freeze` method), and is reset when the ordering is modified.
+  """
+  __slots__ = ("m_content", "m_revision", "m_linearization",)
 
   def __init__(self):
     self.m_content = nx.DiGraph()
+    self.m_revision = 0
+    self.m_linearization = None
+
+  @property
+  def revision(self):
+    """The number of modifications of the ordering (used to invalidate the caches depending on it)"""
+    return self.m_revision
 
   def add(self, delta_info, *args, **kwargs):
     """Adds a delta to the order
@@ -197,6 +927,8 @@ Parameters:
     if((tmp is not None) and (tmp.get("spec") is not None)):
       raise Exception(f"ERROR: delta \"{name}\" already declared")
     # 2. add the delta
+    self.m_revision += 1
+    self.m_linearization = None
     self.m_content.add_node(name, spec=delta_info)
     # 3. add the ordering relation
     for prev in itertools.chain(self._manage_element__(args), self._manage_element__(kwargs.get("after", ()))):
@@ -213,6 +945,8 @@ Example:
    - and "d3" must be executed before "d4" and "d5"
     """
     if(len(args) > 1):
+      self.m_revision += 1
+      self.m_linearization = None
       ds_previous = tuple(self._manage_element__(args[0]))
       for tmp in args[1:]:
         ds_next = tuple(self._manage_element__(tmp))
@@ -232,13 +966,35 @@ Example:
     elif(inspect.isfunction(el)):
       yield el.__name__
 
+  def freeze(self):
+    """freeze() -> tuple[delta_info_cls]
+Returns all the registered deltas in an order compatible with the user specification (computed only once per modification of the ordering).
+Raises an Exception if the ordering contains a cycle, or references deltas that are not declared.
+    """
+    if(self.m_linearization is None):
+      content = self.m_content
+      undeclared = tuple(name for name, spec in content.nodes(data="spec") if(spec is None))
+      if(undeclared):
+        names = ", ".join(f"\"{name}\"" for name in undeclared)
+        raise Exception(f"ERROR: delta{'s' if(len(undeclared) > 1) else ''} {names} not declared")
+      try:
+        order = tuple(nx.topological_sort(content))
+      except nx.NetworkXUnfeasible:
+        cycle = " -> ".join(f"\"{d1}\"" for d1, _ in nx.find_cycle(content))
+        raise Exception(f"ERROR: the delta ordering contains a cycle ({cycle})")
+      self.m_linearization = tuple(content.nodes[name]["spec"] for name in order)
+    return self.m_linearization
+
   def __iter__(self):
-    """Yields all the registered deltas in an order compatible with the user specification"""
-    for name in nx.topological_sort(self.m_content):
-      spec = self.m_content.nodes[name].get("spec")
-      if(spec is None):
-        raise Exception(f"ERROR: delta \"{name}\" not declared")
-      yield spec
+    """Iterates over all the registered deltas in an order compatible with the user specification (see `freeze`)"""
+    return iter(self.freeze())
+
+  def is_ordered(self, d1, d2):
+    """is_ordered(str, str) -> bool
+Returns if the ordering forces one of the two deltas in parameter to be executed before the other
+    """
+    content = self.m_content
+    return nx.has_path(content, d1, d2) or nx.has_path(content, d2, d1)
 
 
 ##########################################
@@ -246,13 +1002,19 @@ Example:
 
 class RegistryCategory(object):
   """Implements a delta ordering by associating to each delta a category (the categories are totally ordered by the user)"""
-  __slots__ = ("m_content", "m_categories", "m_get", "m_delta_names")
+  __slots__ = ("m_content", "m_categories", "m_get", "m_delta_names", "m_revision",)
 
   def __init__(self, categories, get_category):
     self.m_categories = tuple(categories)
     self.m_get = get_category
     self.m_content = {c: [] for c in self.m_categories}
     self.m_delta_names = set()
+    self.m_revision = 0
+
+  @property
+  def revision(self):
+    """The number of modifications of the ordering (used to invalidate the caches depending on it)"""
+    return self.m_revision
 
   def add(self, delta_info, *args, **kwargs):
     """Adds a delta to the order
@@ -273,6 +1035,7 @@ Parameters:
     # 3. add the delta
     l.append(delta_info)
     self.m_delta_names.add(name)
+    self.m_revision += 1
 
 
   def __iter__(self):
@@ -281,3 +1044,15 @@ Parameters:
       for el in self.m_content[cat]:
         yield el
 
+  def is_ordered(self, d1, d2):
+    """is_ordered(str, str) -> bool
+Returns if the ordering forces one of the two deltas in parameter to be executed before the other,
+ i.e., if they are in different categories (the deltas of a category can be executed in any order)
+    """
+    cat1 = cat2 = None
+    for cat, l in self.m_content.items():
+      for info in l:
+        if(info.name == d1): cat1 = cat
+        if(info.name == d2): cat2 = cat
+    return (cat1 is not None) and (cat2 is not None) and (cat1 != cat2)
+
@@ -0,0 +1,409 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+
+"""
+This file contains static analyses of the deltas of an SPL w.r.t. its feature model.
+The guards of the deltas are translated into the CNF version of the feature model (see `fm_analysis.compiled_fm__c`),
+ where the sub-expressions that cannot be translated (e.g., comparisons over attributes) are opaque variables:
+ the analyses are thus conservative.
+
+The analyses detect the deltas that are never activated (dead) or always activated, simplify guards w.r.t. the feature model,
+ and the conflicts between deltas, which are computed from their footprints, i.e., the elements of the variant they write and use.
+An element is identified by its path from the root of the variant (a tuple of names), and footprints are either
+ computed from the `targets` declared at the registration of the deltas (every target is considered as written),
+ or recorded from the execution of the deltas on module variants (see `record_footprints`).
+"""
+
+import itertools
+from collections import namedtuple
+
+from pydop.fm_analysis import _cnf__c, _neg__
+from pydop.fm_constraint import _expbool__c, Var, Lit, Not, And, Or, Xor, Conflict, Implies, Iff
+
+
+################################################################################
+# footprints
+################################################################################
+
+# writes: the paths of the elements added, modified or removed by a delta
+# uses: the paths of the elements used by a delta to reach the elements it writes
+footprint_cls = namedtuple("footprint_cls", ("writes", "uses"))
+
+def footprint_of_targets(targets):
+  """footprint_of_targets(iterable[str]) -> footprint_cls
+Returns the footprint of a delta from its declared targets (which are all considered as written)
+  """
+  return footprint_cls(frozenset((target,) for target in targets), frozenset())
+
+def footprint_of_log(log):
+  """footprint_of_log(tuple) -> footprint_cls
+Returns the footprint of a delta from the log of the operations it did on a module variant (see `operations.modules._wrapper__c.stop_recording`)
+  """
+  from pydop.operations.modules import _OP_ADD, _OP_MODIFY, _OP_REMOVE
+  writes = set()
+  uses = set()
+  for op, path, args in log:
+    if(op in (_OP_ADD, _OP_MODIFY, _OP_REMOVE)):
+      target = path + (args[0],)
+      refs = args[-1] if(op != _OP_REMOVE) else None
+    else: # the superclasses are modified
+      target = path
+      refs = args[0]
+    writes.add(target)
+    uses.update(target[:i] for i in range(1, len(target)))
+    for is_path, ref in (refs or ()): # the superclasses in the variant are used
+      if(is_path): uses.add(ref)
+  return footprint_cls(frozenset(writes), frozenset(uses - writes))
+
+def _merge_footprints__(f1, f2):
+  if(f1 is None): return f2
+  return footprint_cls(f1.writes | f2.writes, (f1.uses | f2.uses) - (f1.writes | f2.writes))
+
+def _prefix__(p1, p2):
+  return p2[:len(p1)] == p1
+
+def footprint_overlap(f1, f2):
+  """footprint_overlap(footprint_cls, footprint_cls) -> frozenset[tuple]
+Returns the elements on which two deltas conflict: the elements written by one delta,
+ such that the other delta writes or uses them or one of their sub-elements
+  """
+  res = set()
+  for w1, w2 in ((f1.writes, f2), (f2.writes, f1)):
+    for w in w1:
+      for p in itertools.chain(w2.writes, w2.uses):
+        if(_prefix__(w, p)): res.add(w)
+  return frozenset(res)
+
+def record_footprints(spl, confs):
+  """record_footprints(SPL, iterable[dict | configuration__c]) -> dict[str -> footprint_cls]
+Generates the variants of the products in parameter, records the operations done by every executed delta,
+ and returns the footprint of every executed delta (merged over all the products).
+The base module of the SPL must support recording (like the `operations.modules` variants).
+  """
+  res = {}
+  def before(info, variant, product):
+    variant.start_recording()
+  def after(info, variant, product):
+    res[info.name] = _merge_footprints__(res.get(info.name), footprint_of_log(variant.stop_recording()))
+  replay = spl.m_replay
+  spl.m_replay = None # the replayed plans do not execute their deltas
+  spl.add_hook("before_delta", before)
+  spl.add_hook("after_delta", after)
+  try:
+    for conf in confs:
+      spl(conf)
+  finally:
+    spl.remove_hook("before_delta", before)
+    spl.remove_hook("after_delta", after)
+    spl.m_replay = replay
+  return res
+
+
+################################################################################
+# analyses
+################################################################################
+
+# first, second: the names of the deltas (in execution order), elements: the elements on which they conflict
+delta_conflict_cls = namedtuple("delta_conflict_cls", ("first", "second", "elements"))
+
+
+def _expr_key__(expr):
+  # returns a key identifying the structure of the expression in parameter: two expressions with the same key are equivalent.
+  #  Literals are identified by their type and value (e.g., Lit(1) and Lit("1") have different keys),
+  #  and objects that are not hashable are identified by themselves
+  if(isinstance(expr, Lit)):
+    return (Lit, type(expr.m_content), _object_key__(expr.m_content))
+  elif(isinstance(expr, Var)):
+    return (Var, _object_key__(expr.m_content))
+  elif(isinstance(expr, _expbool__c)):
+    return (type(expr),) + tuple(_expr_key__(sub) for sub in expr.m_content)
+  return (None, _object_key__(expr))
+
+def _object_key__(obj):
+  # returns the object in parameter if it is hashable, and its id otherwise
+  try:
+    hash(obj)
+    return obj
+  except TypeError:
+    return id(obj)
+
+
+class spl_analysis__c(object):
+  """Static analyses of the deltas of an SPL (which must not be modified during the analyses)"""
+  __slots__ = (
+    "m_spl",
+    "m_compiled",  # fm_analysis.compiled_fm__c: the CNF version of the feature model of the SPL
+    "m_solver",    # sat.solver__c: a solver containing the feature model and the translated guards
+    "m_lits",      # dict[str -> int | bool]: the literal of the guard of every delta
+    "m_exprs",     # dict[object -> int | bool]: the literal of every translated expression (identified by its structure, see `_expr_key__`)
+    "m_opaque",    # dict[object -> int]: the variable of every sub-expression that cannot be translated (identified by its structure)
+  )
+  def __init__(self, spl):
+    """spl_analysis__c(SPL) -> spl_analysis__c"""
+    self.m_spl = spl
+    self.m_compiled = spl.m_fm.compiled()
+    self.m_solver = self.m_compiled.new_solver()
+    self.m_lits = {}
+    self.m_exprs = {}
+    self.m_opaque = {}
+
+  def _infos__(self):
+    return {info.name: info for info in self.m_spl.ordering}
+
+  def guard(self, info):
+    """guard(delta_info_cls) -> int | bool
+Returns the literal (in the solver of this analysis) equivalent to the guard of the delta in parameter, or its value if it is constant
+    """
+    res = self.m_lits.get(info.name)
+    if(res is None):
+      res = self.literal(info.guard)
+      self.m_lits[info.name] = res
+    return res
+
+  def literal(self, expr):
+    """literal(object) -> int | bool
+Returns the literal (in the solver of this analysis) equivalent to the boolean expression in parameter, or its value if it is constant
+    """
+    key = _expr_key__(expr)
+    res = self.m_exprs.get(key)
+    if(res is None):
+      solver = self.m_solver
+      cnf = _cnf__c()
+      cnf.m_nb_vars = solver.nb_vars
+      if(isinstance(expr, _expbool__c)):
+        res = cnf.encode(expr, self._var__, (lambda sub: self._opaque__(cnf, sub)))
+      else:
+        res = self._opaque__(cnf, expr)
+      solver.ensure_var(cnf.m_nb_vars)
+      for clause in cnf.m_clauses:
+        solver.add_clause(clause)
+      self.m_exprs[key] = res
+    return res
+
+  def _var__(self, key):
+    res = self.m_compiled.var(key)
+    if(res is None): raise NotImplementedError()
+    return res
+
+  def _opaque__(self, cnf, expr):
+    key = _expr_key__(expr)
+    res = self.m_opaque.get(key)
+    if(res is None):
+      res = cnf.new_var()
+      self.m_opaque[key] = res
+    return res
+
+  def can_be_active(self, *infos):
+    """can_be_active(delta_info_cls, ...) -> bool
+Returns if there exists a valid product activating all the deltas in parameter
+    """
+    lits = []
+    for info in infos:
+      lit = self.guard(info)
+      if(lit is False): return False
+      elif(lit is not True): lits.append(lit)
+    return self.m_solver.solve(lits)
+
+  ##########################################
+  # dead and always active deltas
+
+  def is_dead(self, info):
+    """is_dead(delta_info_cls) -> bool
+Returns if the delta in parameter is never activated: its guard is false in all valid products
+    """
+    return not self.can_be_active(info)
+
+  def is_always_active(self, info):
+    """is_always_active(delta_info_cls) -> bool
+Returns if the delta in parameter is always activated: its guard is true in all valid products
+    """
+    lit = self.guard(info)
+    if(isinstance(lit, bool)): return lit
+    return not self.m_solver.solve((-lit,))
+
+  def dead_deltas(self):
+    """dead_deltas() -> list[str]
+Returns the names of the deltas that are never activated, in execution order
+    """
+    return [info.name for info in self.m_spl.ordering if(self.is_dead(info))]
+
+  def always_active_deltas(self):
+    """always_active_deltas() -> list[str]
+Returns the names of the deltas that are always activated, in execution order
+    """
+    return [info.name for info in self.m_spl.ordering if(self.is_always_active(info))]
+
+  ##########################################
+  # guard simplification
+
+  def _entails__(self, assumptions, lit):
+    # returns if the feature model and the assumptions imply the literal
+    tmp = []
+    for el in assumptions:
+      if(el is False): return True
+      elif(el is not True): tmp.append(el)
+    if(lit is True): return True
+    elif(lit is not False): tmp.append(-lit)
+    return not self.m_solver.solve(tmp)
+
+  def simplify(self, guard):
+    """simplify(object) -> object
+Returns a boolean expression equivalent to the guard in parameter in all the valid products, where
+ the sub-expressions whose value is forced by the feature model are replaced by literals,
+ the conjuncts implied by the other ones (e.g., the checks of the mandatory parents of a feature) are removed,
+ the disjuncts implying the other ones are removed, and the nested conjunctions and disjunctions are flattened.
+A guard that is not a boolean expression is returned unchanged.
+    """
+    if(not isinstance(guard, _expbool__c)): return guard
+    return self._simplify__(guard, ())
+
+  def _is_bool__(self, expr):
+    # returns if the expression in parameter always evaluates to a boolean (in the valid products)
+    if(isinstance(expr, Lit)): return isinstance(expr.m_content, bool)
+    elif(isinstance(expr, Var)): return self.m_compiled.var(expr.m_content) is not None
+    else: return isinstance(expr, (Not, And, Or))
+
+  def _simplify__(self, expr, context):
+    # simplifies the expression in parameter, in the valid products where the literals in `context` are true
+    if(isinstance(expr, Lit)): return expr
+    lit = self.literal(expr)
+    if(self._entails__(context, lit)): return Lit(True)
+    elif(self._entails__(context, _neg__(lit))): return Lit(False)
+    elif(isinstance(expr, (And, Or))):
+      neutral = isinstance(expr, And)
+      subs = []
+      for sub in expr.m_content:
+        sub = self._simplify__(sub, context)
+        if(isinstance(sub, expr.__class__)): subs.extend(sub.m_content)
+        elif(not (isinstance(sub, Lit) and (sub.m_content is neutral))): subs.append(sub)
+      if(any((isinstance(sub, Lit) and (sub.m_content is (not neutral))) for sub in subs)):
+        return Lit(not neutral)
+      # removes the redundant operands, i.e., the conjuncts implied by the other ones and the disjuncts implying the other ones
+      i = 0
+      while(i < len(subs)):
+        lits = [self.literal(sub) for sub in subs]
+        if(neutral):
+          redundant = self._entails__(tuple(context) + tuple(lits[:i]) + tuple(lits[i+1:]), lits[i])
+        else:
+          redundant = self._entails__(tuple(context) + (lits[i],) + tuple(_neg__(el) for el in (lits[:i] + lits[i+1:])), False)
+        if(redundant): del subs[i]
+        else: i += 1
+      if(len(subs) == 0): return Lit(neutral)
+      elif(len(subs) == 1): return subs[0]
+      else: return expr.__class__(*subs)
+    elif(isinstance(expr, Not)):
+      sub = self._simplify__(expr.m_content[0], context)
+      if(isinstance(sub, Lit) and isinstance(sub.m_content, bool)): return Lit(not sub.m_content)
+      elif(isinstance(sub, Not)): return sub.m_content[0]
+      else: return Not(sub)
+    elif(isinstance(expr, (Implies, Iff))):
+      left, right = (self._simplify__(sub, context) for sub in expr.m_content)
+      if(isinstance(expr, Iff) and not (self._is_bool__(left) and self._is_bool__(right))):
+        pass # the operands may not be booleans (Iff is identical to Eq)
+      elif(isinstance(left, Lit) and isinstance(left.m_content, bool)):
+        if(left.m_content): return right
+        elif(isinstance(expr, Implies)): return Lit(True)
+        else: return self._simplify__(Not(right), context)
+      elif(isinstance(right, Lit) and isinstance(right.m_content, bool)):
+        if(right.m_content): return left if(isinstance(expr, Iff)) else Lit(True)
+        else: return self._simplify__(Not(left), context)
+      return expr.__class__(left, right)
+    elif(isinstance(expr, (Xor, Conflict))):
+      res = _expbool__c(tuple(self._simplify__(sub, context) for sub in expr.m_content))
+      res.__class__ = expr.__class__
+      return res
+    return expr
+
+  ##########################################
+  # conflicts and commutativity
+
+  def footprints(self, footprints=None):
+    """footprints(dict[str -> footprint_cls]) -> dict[str -> footprint_cls]
+Returns the footprint of every delta: the one in parameter if given, and otherwise, the one of its declared targets (if any)
+    """
+    res = {}
+    for info in self.m_spl.ordering:
+      f = None if(footprints is None) else footprints.get(info.name)
+      if((f is None) and (info.targets is not None)):
+        f = footprint_of_targets(info.targets)
+      if(f is not None):
+        res[info.name] = f
+    return res
+
+  def conflicts(self, footprints=None):
+    """conflicts(dict[str -> footprint_cls]) -> list[delta_conflict_cls]
+Returns the pairs of deltas that conflict (i.e., one writes an element that the other writes or uses),
+ that are not ordered by the ordering of the SPL, and that can be activated by the same product.
+The execution order of such deltas is unspecified, and may change the generated variants.
+The footprints of the deltas are computed with the `footprints` method (the deltas without footprint are ignored).
+    """
+    order = list(self.m_spl.ordering)
+    footprints = self.footprints(footprints)
+    is_ordered = getattr(self.m_spl.ordering, "is_ordered", None)
+    res = []
+    for i, d1 in enumerate(order):
+      f1 = footprints.get(d1.name)
+      if(f1 is None): continue
+      for d2 in order[i+1:]:
+        f2 = footprints.get(d2.name)
+        if(f2 is None): continue
+        elements = footprint_overlap(f1, f2)
+        if(elements and ((is_ordered is None) or (not is_ordered(d1.name, d2.name))) and self.can_be_active(d1, d2)):
+          res.append(delta_conflict_cls(d1.name, d2.name, elements))
+    return res
+
+  def commutes(self, d1, d2, footprints=None):
+    """commutes(str, str, dict[str -> footprint_cls]) -> bool
+Returns if the two deltas in parameter can be executed in any order (or in parallel):
+ either they cannot be activated by the same product, or their footprints do not conflict.
+Returns False if the footprint of one of the deltas is unknown and they can be activated together.
+    """
+    infos = self._infos__()
+    if(not self.can_be_active(infos[d1], infos[d2])):
+      return True
+    footprints = self.footprints(footprints)
+    f1, f2 = footprints.get(d1), footprints.get(d2)
+    return (f1 is not None) and (f2 is not None) and (not footprint_overlap(f1, f2))
+
+  def commuting_groups(self, footprints=None):
+    """commuting_groups(dict[str -> footprint_cls]) -> list[list[str]]
+Splits the deltas, in execution order, into consecutive groups of pairwise commuting deltas:
+ the deltas of a group can be executed in any order (or in parallel), and the groups must be executed in order.
+    """
+    footprints = self.footprints(footprints)
+    res = []
+    current = []
+    for info in self.m_spl.ordering:
+      f = footprints.get(info.name)
+      ok = True
+      for other in current:
+        if(self.can_be_active(info, other[0])):
+          if((f is None) or (other[1] is None) or footprint_overlap(f, other[1])):
+            ok = False
+            break
+      if(not ok):
+        res.append([other[0].name for other in current])
+        current = []
+      current.append((info, f))
+    if(current):
+      res.append([other[0].name for other in current])
+    return res
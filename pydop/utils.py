@@ -23,6 +23,8 @@
 
 import itertools
 import bisect
+import importlib
+import concurrent.futures
 
 ##########################################
 # the empty object, for get API
@@ -208,6 +210,8 @@ class interval__c(tuple):
       return tuple.__new__(interval__c, (v_min, v_max))
     else: raise _interval_error_((v_min, v_max))
 
+  def __getnewargs__(self): # for pickle and copy
+    return (self[0], self[1],)
   def contains(self, value):
     return ((self[0] <= value) and (value < self[1]))
   def __str__(self):
@@ -263,6 +267,8 @@ class domain__c(tuple):
     for arg in args:
       res = _extend_dlist_interval_(res, interval_of_obj(arg))
     return tuple.__new__(domain__c, res)
+  def __getnewargs__(self): # for pickle and copy
+    return tuple(self)
   def contains(self, value):
     if(bool(self)):
       idx = bisect.bisect(self, value, key=interval_min)
@@ -393,6 +399,60 @@ where `id` is the dimacs integer corresponding to `v`, and `variable_name` is ei
     return self.to_string()
 
 
+################################################################################
+# parallel execution
+################################################################################
+
+def imap_bounded(executor, f, iterable, max_pending):
+  """imap_bounded(concurrent.futures.Executor, callable, iterable, int) -> iterator
+Applies `f` on every element of `iterable` using `executor`, and yields the results in completion order.
+Contrary to `Executor.map`, the iterable is consumed lazily: at most `max_pending` calls are submitted at any time,
+ so the memory used by the input and output is bounded.
+  """
+  pending = set()
+  try:
+    for el in iterable:
+      if(len(pending) >= max_pending):
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+          yield future.result()
+      pending.add(executor.submit(f, el))
+    while(pending):
+      done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+      for future in done:
+        yield future.result()
+  finally:
+    for future in pending:
+      future.cancel()
+
+
+def enumerate_chunks(iterable, chunksize):
+  """enumerate_chunks(iterable, int) -> iterator[list[tuple[int, object]]]
+Yields the elements of `iterable`, together with their index, in lists of `chunksize` elements (the last one can be shorter)
+  """
+  chunk = []
+  for el in enumerate(iterable):
+    chunk.append(el)
+    if(len(chunk) == chunksize):
+      yield chunk
+      chunk = []
+  if(chunk):
+    yield chunk
+
+def import_object(spec):
+  """import_object(str) -> object
+Returns the object at the importable path "module:name" (where `name` can be a dotted path inside the module).
+It is used to give objects to worker processes without pickling them.
+  """
+  module_name, sep, name = spec.partition(':')
+  if((not sep) or (not module_name) or (not name)):
+    raise ValueError(f"ERROR: expected a path of the form \"module:name\" (found \"{spec}\")")
+  res = importlib.import_module(module_name)
+  for attr in name.split('.'):
+    res = getattr(res, attr)
+  return res
+
+
 ################################################################################
 # for debugging
 ################################################################################
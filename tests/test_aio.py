@@ -0,0 +1,149 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+import time
+import asyncio
+import threading
+
+from pydop.fm_diagram import *
+from pydop.spl import SPL, RegistryGraph
+from pydop.mpl import MPL
+from pydop.aio import async_generator__c
+
+
+def mk_spl(delay):
+  calls = []
+  running = [0, 0] # current and maximal number of running generations
+  lock = threading.Lock()
+  fm = FD("A", FDAny(FD("B"), FD("C")))
+  spl = SPL(fm, RegistryGraph(), list)
+  def dA(variant, product):
+    with lock:
+      running[0] += 1
+      running[1] = max(running)
+    time.sleep(delay)
+    calls.append(product["B"])
+    variant.append("A")
+    with lock:
+      running[0] -= 1
+  def dB(variant): variant.append("B")
+  spl.delta("A")(dA)
+  spl.delta("B", after="dA")(dB)
+  return spl, calls, running
+
+
+def test_agenerate():
+  print("==========================================")
+  print("= test_agenerate")
+
+  spl, calls, running = mk_spl(0.05)
+  spl.configure_async(max_concurrency=2)
+  async def main():
+    confs = [{"B": True}, {"A": True}, {"B": True}, {"C": True}, {"B": True, "C": True}, {"B": True}]
+    res = await asyncio.gather(*(spl.agenerate(conf) for conf in confs))
+    assert(res == [["A", "B"], ["A"], ["A", "B"], ["A"], ["A", "B"], ["A", "B"]])
+    assert(res[0] is res[2]) # concurrent requests for the same product share the same generation
+    assert(len(calls) == 4)
+    assert(running[1] == 2)
+    assert(spl.m_async.nb_inflight == 0)
+    assert((await spl.agenerate({"B": True})) is not res[0])
+    try:
+      await spl.agenerate({"D": True})
+      assert(False)
+    except KeyError: pass
+  asyncio.run(main())
+
+
+def test_agenerate_timeout():
+  print("==========================================")
+  print("= test_agenerate_timeout")
+
+  spl, calls, running = mk_spl(0.2)
+  spl.configure_async(max_concurrency=1)
+  async def main():
+    # the timeout of a request does not cancel the other requests for the same product
+    t1 = asyncio.ensure_future(spl.agenerate({"B": True}, timeout=0.05))
+    t2 = asyncio.ensure_future(spl.agenerate({"B": True}))
+    try:
+      await t1
+      assert(False)
+    except asyncio.TimeoutError: pass
+    assert((await t2) == ["A", "B"])
+    # a cancelled request waiting for the semaphore is not executed
+    t1 = asyncio.ensure_future(spl.agenerate({"C": True}))
+    t2 = asyncio.ensure_future(spl.agenerate({"A": True}))
+    await asyncio.sleep(0.05)
+    t2.cancel()
+    assert((await t1) == ["A"])
+    try:
+      await t2
+      assert(False)
+    except asyncio.CancelledError: pass
+    await asyncio.sleep(0.01)
+    assert(len(calls) == 2)
+    assert(spl.m_async.nb_inflight == 0)
+  asyncio.run(main())
+
+  try:
+    async_generator__c(max_concurrency=0)
+    assert(False)
+  except ValueError: pass
+
+
+def test_agenerate_loops():
+  print("==========================================")
+  print("= test_agenerate_loops")
+
+  spl, calls, running = mk_spl(0.02)
+  spl.configure_async(max_concurrency=1)
+  async def main():
+    confs = [{"B": True}, {"C": True}, {"B": True, "C": True}]
+    return await asyncio.gather(*(spl.agenerate(conf) for conf in confs))
+  # the same SPL is used from two successive event loops, with contention on the concurrency limit in both
+  for _ in range(2):
+    assert(asyncio.run(main()) == [["A", "B"], ["A"], ["A", "B"]])
+  assert((len(calls) == 6) and (running[1] == 1))
+  assert(spl.m_async.nb_inflight == 0)
+
+
+def test_mpl_aget_variant():
+  print("==========================================")
+  print("= test_mpl_aget_variant")
+
+  spl, calls, running = mk_spl(0.01)
+  mpl = MPL()
+  mpl.add("spl", spl)
+  async def main():
+    v1 = await mpl.aget_variant("spl", {"B": True})
+    v2 = await mpl.aget_variant("spl", {"B": True})
+    assert((v1 == ["A", "B"]) and (v1 is v2))
+    assert(len(calls) == 1)
+    assert((await mpl.aget_variant("other", {"B": True})) is None)
+    return v1
+  v1 = asyncio.run(main())
+  assert(mpl.get_variant("spl", {"B": True}) is v1)
+
+
+if(__name__ == "__main__"):
+  test_agenerate()
+  test_agenerate_timeout()
+  test_agenerate_loops()
+  test_mpl_aget_variant()
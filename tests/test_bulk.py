@@ -0,0 +1,97 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+from pydop.fm_result import *
+from pydop.fm_constraint import *
+from pydop.fm_diagram import *
+from pydop.bulk import *
+
+import io
+import pickle
+
+
+def mk_fm():
+  fm = FD("R",
+    FDOptional(FD("X", FDAlternative(FD("P"), FD("Q")))),
+    FDOr(FD("Y"), FD("Z")),
+    Implies("X", "Y"),
+    n=Int(0, 10)
+  )
+  fm.check()
+  return fm
+
+
+def test_readers():
+  print("==========================================")
+  print("= test_readers")
+
+  stream = io.StringIO("X,P,Y,n,l\ntrue,TRUE,,3,\"[1, 2]\"\n,,1,2.5,\n")
+  confs = tuple(read_configurations(stream, "csv"))
+  assert(confs == ({"X": True, "P": True, "n": 3, "l": [1, 2]}, {"Y": 1, "n": 2.5}))
+
+  stream = io.StringIO("{\"X\": true, \"n\": 1}\n\n[\"Z\", \"X\"]\n")
+  confs = tuple(read_configurations(stream, "jsonl"))
+  assert(confs == ({"X": True, "n": 1}, {"Z": True, "X": True}))
+
+
+def test_validate_stream():
+  print("==========================================")
+  print("= test_validate_stream")
+
+  fm = mk_fm()
+  assert(pickle.loads(pickle.dumps(fm)).check() is not None) # the FM is sent once to every worker
+  confs = [
+    {"X": True, "P": True, "Y": True, "n": 3},  # valid
+    {"X": True, "P": True, "Q": True, "Y": True, "n": 3}, # P and Q are alternative
+    {"Z": True, "n": 12}, # n is out of bounds
+    {"W": True}, # W is not declared
+  ] * 5
+
+  for workers in (0, 2):
+    results = sorted(validate_stream(fm, iter(confs), product=True, workers=workers, chunksize=3), key=(lambda r: r["index"]))
+    assert(len(results) == len(confs))
+    for i, res in enumerate(results):
+      assert(res["index"] == i)
+      assert(res["valid"] == ((i % 4) == 0))
+      if(res["valid"]):
+        assert(res["product"]["/R/0/X/0/P"] is True)
+        assert(res["product"]["/R/n"] == 3)
+      else:
+        assert("errors" in res)
+
+  res = validate_configuration(fm, {"X": True, "P": True, "Y": True, "n": 3}, close=False)
+  assert(not res["valid"]) # not closed: missing features
+  res_short = validate_configuration(fm, {"X": True, "P": True, "Y": True, "n": 3}, close=False, max_reasons=2)
+  assert(res_short["errors"].split("\n") == res["errors"].split("\n")[:2] + ["..."])
+
+  # the rows that do not describe a configuration are reported as invalid, and the stream continues
+  stream = io.StringIO("{\"X\": true, \"P\": true, \"Y\": true, \"n\": 3}\n{\"X\": tru\n\n3\n{\"Z\": true, \"n\": 1}\n")
+  for workers in (0, 2):
+    stream.seek(0)
+    results = sorted(validate_stream(fm, read_jsonl(stream), workers=workers, chunksize=2), key=(lambda r: r["index"]))
+    assert([(res["index"], res["valid"]) for res in results] == [(0, True), (1, False), (2, False), (3, True)])
+    assert(("line 2" in results[1]["errors"]) and ("line 4" in results[2]["errors"]))
+
+
+
+if(__name__ == "__main__"):
+  test_readers()
+  test_validate_stream()
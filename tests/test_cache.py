@@ -0,0 +1,167 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+from pydop.cache import lru_cache__c, lfu_cache__c, ttl_cache__c, size_cache__c, deep_getsizeof, disk_cache__c
+
+import os
+import tempfile
+
+
+def test_lru_cache():
+  print("==========================================")
+  print("= test_lru_cache")
+
+  cache = lru_cache__c(2)
+  cache.put("a", 1)
+  cache.put("b", 2)
+  assert(cache.get("a") == 1)
+  cache.put("c", 3) # "b" is the least recently used entry
+  assert("b" not in cache)
+  assert(cache.get("b", 0) == 0)
+  assert((cache.get("a"), cache.get("c")) == (1, 3))
+  assert((cache.hits, cache.misses) == (3, 1))
+  cache.put("a", 4)
+  cache.put("d", 5)
+  assert(("a" in cache) and ("c" not in cache) and (len(cache) == 2))
+  cache.clear()
+  assert(len(cache) == 0)
+
+  cache = lru_cache__c(0)
+  cache.put("a", 1)
+  assert(len(cache) == 0)
+  cache = lru_cache__c(None)
+  for i in range(1000):
+    cache.put(i, i)
+  assert(len(cache) == 1000)
+  assert(cache.remove(0) and (not cache.remove(0)) and (len(cache) == 999))
+
+
+def test_lfu_cache():
+  print("==========================================")
+  print("= test_lfu_cache")
+
+  cache = lfu_cache__c(2)
+  cache.put("a", 1)
+  cache.put("b", 2)
+  assert((cache.get("a"), cache.get("a"), cache.get("b")) == (1, 1, 2))
+  cache.put("c", 3) # "b" is used less than "a"
+  assert(("b" not in cache) and ("a" in cache) and ("c" in cache))
+  cache.put("d", 4) # "c" and "d" are used once, and "c" is the oldest
+  assert(("c" not in cache) and (cache.get("a") == 1))
+  cache.put("d", 5)
+  assert((cache.get("d"), cache.get("x", 0)) == (5, 0))
+  assert((cache.hits, cache.misses) == (5, 1))
+  assert(cache.remove("a") and (not cache.remove("a")) and (len(cache) == 1))
+  cache.put("e", 6)
+  cache.put("f", 7) # "e" is the least frequently used entry
+  assert(("d" in cache) and ("e" not in cache) and ("f" in cache))
+  cache.clear()
+  assert(len(cache) == 0)
+  cache = lfu_cache__c(0)
+  cache.put("a", 1)
+  assert(len(cache) == 0)
+
+
+def test_ttl_cache():
+  print("==========================================")
+  print("= test_ttl_cache")
+
+  now = [0.0]
+  cache = ttl_cache__c(10, timer=(lambda: now[0]))
+  cache.put("a", 1)
+  now[0] = 5.0
+  cache.put("b", 2)
+  assert((cache.get("a"), cache.get("b")) == (1, 2))
+  now[0] = 12.0
+  assert((cache.get("a"), cache.get("b")) == (None, 2))
+  assert(("a" not in cache) and (len(cache) == 1))
+  cache.put("b", 3) # the expiration time of "b" is reset
+  now[0] = 20.0
+  assert(cache.get("b") == 3)
+  assert(cache.remove("b") and (len(cache) == 0))
+
+  cache = ttl_cache__c(10, maxsize=2, timer=(lambda: now[0]))
+  for key in "abc":
+    cache.put(key, key)
+  assert(("a" not in cache) and (len(cache) == 2))
+
+
+def test_size_cache():
+  print("==========================================")
+  print("= test_size_cache")
+
+  cache = size_cache__c(10, sizeof=len)
+  cache.put("a", "xxxx")
+  cache.put("b", "xxxx")
+  assert(cache.get("a") == "xxxx")
+  cache.put("c", "xxxx") # "b" is the least recently used entry
+  assert(("b" not in cache) and (cache.size == 8))
+  cache.put("d", "x" * 11) # too large
+  assert(("d" not in cache) and (len(cache) == 2))
+  cache.put("a", "x" * 10)
+  assert(("c" not in cache) and (cache.size == 10))
+  assert(cache.remove("a") and (cache.size == 0))
+
+  # the default estimation of the size is deep
+  data = {"a": ["x" * 1000, "y" * 1000]}
+  assert(deep_getsizeof(data) > 2000)
+  assert(deep_getsizeof(data) > deep_getsizeof(["x" * 1000]))
+  cache = size_cache__c(deep_getsizeof(data) + 100)
+  cache.put("a", data)
+  cache.put("b", data)
+  assert(("a" not in cache) and ("b" in cache))
+
+
+def test_disk_cache():
+  print("==========================================")
+  print("= test_disk_cache")
+
+  with tempfile.TemporaryDirectory() as directory:
+    cache = disk_cache__c(os.path.join(directory, "variants"))
+    assert(cache.get("abcd") is None)
+    cache.put("abcd", b"data")
+    cache.put("abef", b"")
+    cache.put("0123", b"other")
+    assert((cache.get("abcd"), cache.get("abef"), cache.get("xyz", 0)) == (b"data", b"", 0))
+    assert((cache.hits, cache.misses) == (2, 2))
+    assert(os.path.isfile(os.path.join(directory, "variants", "ab", "abcd")))
+    cache.put("abcd", b"new")
+    assert(sorted(cache.keys()) == ["0123", "abcd", "abef"])
+
+    # the entries are persistent
+    cache = disk_cache__c(os.path.join(directory, "variants"))
+    assert(("abcd" in cache) and (cache.get("abcd") == b"new") and (len(cache) == 3))
+    assert(cache.remove("abcd") and (not cache.remove("abcd")))
+    for key in ("", "../x", ".tmp"):
+      try:
+        cache.put(key, b"")
+        assert(False)
+      except ValueError: pass
+    cache.clear()
+    assert(len(cache) == 0)
+
+
+if(__name__ == "__main__"):
+  test_lru_cache()
+  test_lfu_cache()
+  test_ttl_cache()
+  test_size_cache()
+  test_disk_cache()
@@ -0,0 +1,144 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+from pydop.fm_constraint import *
+from pydop.fm_diagram import *
+from pydop.configurator import *
+
+
+def mk_fm():
+  return FD('A',
+    FDAnd('B', FDXor(FD('B0'), FD('B1')), FDXor(FD('B2'), FD('B3'))),
+    FDAny('C', FD('C0'), FD('C1')),
+    FDOr('D', FD('D0'), FD('D1')),
+    FDXor('E', FD('E0'), FD('E1')),
+    Implies(And('B/B0', 'C/C0'), Not('E1')),
+    F=List(size=(1,4), spec=Int(3,5))
+  )
+
+
+def test_session():
+  print("==========================================")
+  print("= test_session")
+
+  fm = mk_fm()
+  fm.check()
+  for target in (fm, fm.freeze()):
+    session = ConfiguratorSession(target)
+    assert(session.value('A') is True)
+    assert(session.value('B') is True)
+    assert(session.value('B0') is None)
+    assert(session.forced() == {'/A': True, '/A/B': True, '/A/C': True, '/A/D': True, '/A/E': True})
+    nb_free = len(session.free())
+
+    # propagation
+    session.select('B0').select('C0')
+    assert(session.value('B1') is False)
+    assert(session.value('C') is True)
+    assert(session.value('E1') is False)
+    assert(session.value('E0') is True)
+    assert(session.changes() == {'/A/C/C0': True, '/A/E/E1': False, '/A/E/E0': True})
+    assert(session.forced()['/A/E/E0'] is True)
+    assert('/A/B/0/B0' not in session.forced())
+
+    # conflicts leave the session unchanged
+    try:
+      session.select('E1')
+      assert(False)
+    except ValueError: pass
+    assert(session.value('E1') is False)
+    assert(len(session.decisions()) == 2)
+    try:
+      session.select('Z')
+      assert(False)
+    except KeyError: pass
+    try:
+      session.select('F')
+      assert(False)
+    except KeyError: pass
+
+    # selecting an implied feature is still a decision
+    session.select('E0')
+    assert(session.changes() == {})
+    assert(session.undo())
+    assert(session.redo())
+    assert(session.decisions()[-1] == ('select', '/A/E/E0', True))
+
+    # undo / redo
+    assert(session.undo() and session.undo())
+    assert(session.value('C0') is None)
+    assert(session.value('E1') is None)
+    assert(session.value('B1') is False)
+    assert(session.redo())
+    assert(session.value('E1') is False)
+    session.deselect('D0')
+    assert(session.value('D1') is True)
+    assert(not session.redo())
+    assert(session.decisions() == [('select', '/A/B/0/B0', True), ('select', '/A/C/C0', True), ('deselect', '/A/D/D0', False)])
+
+    # attributes
+    session.set_attribute('F', (3, 4))
+    try:
+      session.set_attribute('F', (3,))
+      assert(False)
+    except ValueError: pass
+    prod = session.product()
+    assert(bool(target(prod)))
+    assert(prod['B0'] and prod['C0'] and prod['D1'] and (not prod['D0']) and (prod['F'] == (3, 4)))
+    assert(session.undo())
+    try: # the root feature is selected, so its attribute must be valid
+      session.set_attribute('F', (3, 6))
+      assert(False)
+    except ValueError: pass
+
+    session.reset()
+    assert(len(session.free()) == nb_free)
+    assert(not session.undo())
+
+
+def test_session_consistency():
+  print("==========================================")
+  print("= test_session_consistency")
+
+  # propagation does not detect all the inconsistencies
+  fm = FD('A', FDAny(FD('D'), FD('P'), FD('Q')),
+    Implies('D', Or('P', 'Q')), Implies('D', Or('P', Not('Q'))), Implies('D', Or(Not('P'), 'Q')), Implies('D', Or(Not('P'), Not('Q'))))
+  fm.check()
+  session = ConfiguratorSession(fm)
+  session.select('D')
+  assert(session.value('P') is None)
+  assert(not session.is_consistent())
+  try:
+    session.product()
+    assert(False)
+  except ValueError: pass
+  session.undo()
+  session.select('P')
+  assert(session.is_consistent())
+  assert(not session.is_complete())
+  prod = session.product()
+  assert(bool(fm(prod)))
+  assert(prod['P'] and (prod['D'] is False) and (prod['Q'] is False))
+
+
+if(__name__ == "__main__"):
+  test_session()
+  test_session_consistency()
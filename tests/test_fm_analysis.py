@@ -0,0 +1,128 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+from pydop.fm_result import *
+from pydop.fm_configuration import *
+from pydop.fm_constraint import *
+from pydop.fm_diagram import *
+from pydop.fm_frozen import *
+from pydop.fm_analysis import *
+
+
+def mk_fm():
+  return FD('A',
+    FDAnd('B', FDXor(FD('B0'), FD('B1')), FDXor(FD('B2'), FD('B3'))),
+    FDAny('C', FD('C0'), FD('C1')),
+    FDOr('D', FD('D0'), FD('D1')),
+    FDXor('E', FD('E0'), FD('E1')),
+    Implies(And('B/B0', 'C/C0'), Not('E1')),
+    F=List(size=(1,4), spec=Int(3,5))
+  )
+
+conf_base  = {'A':True, 'B': True, 'B0': True, 'B2': True, 'C': True, 'D': True, 'D0': True, 'E': True, 'E0': True, 'F':(3,)}
+
+
+def test_compiled_semantics():
+  print("==========================================")
+  print("= test_compiled_semantics")
+
+  # every model of the compiled feature model is a valid product
+  fm = mk_fm()
+  fm.check()
+  compiled = fm.compiled()
+  assert(fm.compiled() is compiled)
+  solver = compiled.new_solver()
+  for phase in (False, True):
+    for v in range(1, compiled.nb_vars + 1):
+      solver.set_phase(v, phase)
+    assert(solver.solve([compiled.m_att_vars[0]]))
+    model = solver.model()
+    conf = {name: model[i+1] for i, name in enumerate(compiled.m_frozen.m_names) if(name is not None)}
+    conf['F'] = (3,)
+    assert(bool(fm(fm.link_configuration(conf)[0])))
+
+
+def test_explain():
+  print("==========================================")
+  print("= test_explain")
+
+  fm = mk_fm()
+  fm.check()
+  tests = (
+    ((conf_base, {'B1': True}), ()),
+    ((conf_base, {'B0': True, 'B1': True}), ("/A/B/0", "/A/B/0/B0 is selected", "/A/B/0/B1 is selected")),
+    ((conf_base, {'E0': True, 'E1': True}), ("/A/E", "/A/E/E0 is selected", "/A/E/E1 is selected")),
+    ((conf_base, {'F':(3,4,5)}), ("attribute /A/F", "is not valid")),
+    ((conf_base, {'C0': True, 'E1': True}), ("Implies", "/A/C/C0 is selected", "/A/E/E1 is selected")),
+  )
+  for target in (fm, fm.freeze()):
+    for confs, expected in tests:
+      conf, errors = target.close_configuration(*confs)
+      assert(not bool(errors))
+      res = target.explain(conf)
+      assert(bool(res) == bool(expected))
+      assert(bool(target(conf)) == (not bool(expected)))
+      assert(len(res) <= 5)
+      for el in expected:
+        assert(el in str(res))
+
+  # explanations are minimal: one constraint is enough to explain the error
+  conf = {name: False for name in ('B1', 'B3', 'C1', 'D1', 'E1')}
+  conf.update(conf_base)
+  conf.update({'C': False, 'C0': True})
+  res = fm.explain(conf)
+  assert(len(res.constraints) == 1)
+  assert(len(res.assignments) == 2)
+  assert("/A/C is not selected" in res.assignments)
+
+
+def test_repair():
+  print("==========================================")
+  print("= test_repair")
+
+  fm = mk_fm()
+  fm.check()
+  conf = dict(conf_base)
+  conf.update({'B1': True, 'C0': True, 'E1': True})
+  for target in (fm, fm.freeze()):
+    assert(not bool(target(target.close_configuration(conf)[0])))
+    res = target.repair(conf)
+    assert(bool(target(res)))
+    product = {str(key).split('/')[-1]: value for key, value in target.export_configuration(res).items()}
+    assert(product['B0'] and (not product['B1']) and product['E0'] and (not product['E1']))
+    # with a high cost on changing B1 and E1
+    res = target.repair(conf, cost={'B1': 10, 'E1': 10})
+    product = {str(key).split('/')[-1]: value for key, value in target.export_configuration(res).items()}
+    assert(bool(target(res)))
+    assert((not product['B0']) and product['B1'] and (not product['E0']) and product['E1'])
+    # partial configuration
+    res = target.repair({'E1': True, 'F': (4,)})
+    assert(bool(target(res)))
+    assert(target.export_configuration(res)['/A/E/E1'])
+    # no valid product with an invalid mandatory attribute
+    assert(target.repair({'A': True, 'F': (9,)}) is None)
+
+
+
+if(__name__ == "__main__"):
+  test_compiled_semantics()
+  test_explain()
+  test_repair()
@@ -90,6 +90,35 @@ def test_configuration():
 
 
 
+def test_frozen_configuration():
+  print("==========================================")
+  print("= test_frozen_configuration")
+
+  conf_d = {"a": True, "bb": [1, 2], "ccc": 3}
+  conf = mk_configuration(conf_d)
+  frozen = conf.freeze()
+  assert(isinstance(frozen, frozen_configuration__c))
+  assert(frozen.freeze() is frozen)
+  assert(frozen == conf)
+  assert(conf == frozen)
+  assert(hash(frozen) == hash(conf))
+  assert(frozen.m_dict is not conf.m_dict)
+
+  # equality and hash do not depend on the order of the items
+  other = mk_configuration({"ccc": 3, "bb": [1, 2], "a": True}).freeze()
+  assert(frozen == other)
+  assert(hash(frozen) == hash(other))
+  assert(len({frozen: 1, other: 2}) == 1)
+
+  other = mk_configuration({"a": True, "bb": [1, 2], "ccc": 4}).freeze()
+  assert(frozen != other)
+
+  # unlinked configurations can be hashed
+  assert(hash(configuration__c({"a": 1})) == hash(configuration__c({"a": 1}).freeze()))
+
+
+
 if(__name__ == "__main__"):
   test_configuration()
+  test_frozen_configuration()
 
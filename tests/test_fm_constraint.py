@@ -22,6 +22,8 @@
 from pydop.fm_constraint import *
 from pydop.utils import dimacs__c
 
+import random
+
 
 def test_constraint():
   print("==========================================")
@@ -141,7 +143,37 @@ def test_constraint_dimacs():
 
 
 
+def test_constraint_compile():
+  print("==========================================")
+  print("= test_constraint_compile")
+
+  # the compiled constraints compute the same value as their evaluation
+  rng = random.Random(0)
+  names = ("b0", "b1", "b2", "b3")
+  def mk_bool(depth):
+    if((depth == 0) or (rng.random() < 0.2)):
+      return rng.choice(tuple(map(Var, names)) + (Lit(True), Lit(False)))
+    kind = rng.randrange(8)
+    if(kind == 0): return Not(mk_bool(depth-1))
+    elif(kind == 1): return Implies(mk_bool(depth-1), mk_bool(depth-1))
+    elif(kind == 2): return Iff(mk_bool(depth-1), mk_bool(depth-1))
+    elif(kind == 3): return rng.choice((Lt, Leq, Eq, Geq, Gt))("i0", rng.choice(("i1", Lit(2))))
+    cls = (And, Or, Xor, Conflict)[kind - 4]
+    return cls(*(mk_bool(depth-1) for _ in range(rng.randrange(4))))
+
+  for _ in range(300):
+    c = mk_bool(4)
+    f = c.compile()
+    for _ in range(10):
+      prod = {name: rng.random() < 0.5 for name in names}
+      prod["i0"] = rng.randrange(4)
+      prod["i1"] = rng.randrange(4)
+      assert(bool(f(prod)) == bool(c(prod)))
+  assert(And().compile()({}) is True)
+  assert(Or().compile()({}) is False)
+
 
 if(__name__ == "__main__"):
   test_constraint()
+  test_constraint_compile()
   # test_constraint_dimacs()
@@ -0,0 +1,161 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+from pydop.fm_result import *
+from pydop.fm_configuration import *
+from pydop.fm_constraint import *
+from pydop.fm_diagram import *
+from pydop.fm_frozen import *
+
+import pickle
+
+
+def mk_fm():
+  return FD('A',
+    FDAnd('B', FDXor(FD('B0'), FD('B1')), FDXor(FD('B2'), FD('B3'))),
+    FDAny('C', FD('C0'), FD('C1')),
+    FDOr('D', FD('D0'), FD('D1')),
+    FDXor('E', FD('E0'), FD('E1')),
+    Implies(And('B/B0', 'C/C0'), Not('E1')),
+    F=List(size=(1,4), spec=Int(3,5))
+  )
+
+
+def test_slots():
+  print("==========================================")
+  print("= test_slots")
+
+  fm = FD('A', FDOptional(FD('B', tag_b=1)), tag_a="a")
+  assert(not hasattr(fm, "__dict__"))
+  assert(fm.tag_a == "a")
+  assert(fm.children[0].children[0].tag_b == 1)
+  assert(isinstance(fm.children, tuple))
+  try:
+    fm.tag_b
+    assert(False)
+  except AttributeError: pass
+  try:
+    FD('A', children=1)
+    assert(False)
+  except ValueError: pass
+
+
+def test_frozen_structure():
+  print("==========================================")
+  print("= test_frozen_structure")
+
+  fm = mk_fm()
+  assert(not bool(fm.check()))
+  frozen = fm.freeze()
+  assert(len(frozen) == 17)
+  assert(frozen.m_names[0] == 'A')
+  assert(frozen.m_parents[0] == -1)
+  # the children of every node are contiguous, and refer back to it
+  for i in range(len(frozen)):
+    for j in range(frozen.m_child_start[i], frozen.m_child_end[i]):
+      assert(frozen.m_parents[j] == i)
+  assert(frozen.m_att_names == ('F',))
+  assert(str(frozen.m_att_paths[0]) == "/A/F")
+  assert(not bool(frozen.check()))
+
+
+def test_frozen_eval():
+  print("==========================================")
+  print("= test_frozen_eval")
+
+  fm = mk_fm()
+  fm.check()
+  frozen = fm.freeze()
+
+  conf_base  = {'A':True, 'B': True, 'B0': True, 'B2': True, 'C': True, 'D': True, 'D0': True, 'E': True, 'E0': True, 'F':(3,)}
+  tests = (
+    ((conf_base, ), True),
+    ((conf_base, {'B1': True}), True),
+    ((conf_base, {'B0': True, 'B1': True}), False),
+    ((conf_base, {'C0': True, 'C1': True}), True),
+    ((conf_base, {'D0': False}), False),
+    ((conf_base, {'E0': True, 'E1': True}), False),
+    ((conf_base, {'F':(3,4,5)}), False),
+    ((conf_base, {'C0': True, 'E1': True}), False),
+    ((conf_base, {'B1': True}, {'B0': True}), True),
+  )
+
+  for confs, expected in tests:
+    conf, errors = fm.close_configuration(*confs)
+    conf_frozen, errors_frozen = frozen.close_configuration(*confs)
+    assert(not bool(errors_frozen))
+    assert(str(conf) == str(conf_frozen))
+    res = frozen(conf_frozen)
+    assert(bool(res) == expected)
+    assert(bool(fm(conf)) == expected)
+    if(not expected):
+      assert(isinstance(res.m_reason, reason_flat__c))
+      assert("/A" in str(res.m_reason))
+      assert(res.m_reason.to_dict()["ref"] == "/A")
+
+  c, errors = frozen.link_constraint(And('B0', 'E0'))
+  assert(not bool(errors))
+  conf, _ = frozen.close_configuration(conf_base)
+  assert(bool(c(conf)))
+
+
+def test_frozen_dimacs():
+  print("==========================================")
+  print("= test_frozen_dimacs")
+
+  fm = FD("R", FDOptional(FD("X", FDAlternative("P", "Q"))), FDOr(FD("Y"), FD("Z")), Implies("X", "Y"))
+  fm.check()
+  frozen = fm.freeze()
+  assert(fm.to_dimacs().to_string() == frozen.to_dimacs().to_string())
+  frozen = pickle.loads(pickle.dumps(frozen))
+  assert(fm.to_dimacs().to_string() == frozen.to_dimacs().to_string())
+
+
+def test_frozen_fingerprint():
+  print("==========================================")
+  print("= test_frozen_fingerprint")
+
+  def checked(fm):
+    fm.check()
+    return fm
+  fm = checked(mk_fm())
+  frozen = fm.freeze()
+  assert(fm.fingerprint() == frozen.fingerprint() == checked(mk_fm()).fingerprint())
+  assert(pickle.loads(pickle.dumps(frozen)).fingerprint() == frozen.fingerprint())
+  others = (
+    FD('A', FDAny(FD('B'), FD('C'))),
+    FD('A', FDOr(FD('B'), FD('C'))),
+    FD('A', FDAny(FD('B'), FD('D'))),
+    FD('A', FDAny(FD('B'), FD('C')), Implies('B', 'C')),
+    FD('A', FDAny(FD('B'), FD('C')), x=Int(0, 3)),
+    FD('A', FDAny(FD('B'), FD('C')), x=Int(0, 4)),
+  )
+  res = [checked(other).fingerprint() for other in others]
+  assert(len(set(res)) == len(res))
+
+
+
+if(__name__ == "__main__"):
+  test_slots()
+  test_frozen_structure()
+  test_frozen_eval()
+  test_frozen_dimacs()
+  test_frozen_fingerprint()
@@ -189,6 +189,43 @@ def test_reason_tree():
 
 
 
+def test_reason_render():
+  print("==========================================")
+  print("= test_reason_render")
+
+  errors = reason_tree__c("root", 0)
+  errors.add_reason_value_mismatch("val", 1, 2)
+  for i in range(3):
+    errors.add_reason_sub(eval_result__c(False, reason_tree__c(f"sub_{i}", 0).add_reason_value_none("a").add_reason_value_none("b")))
+  lines = list(errors.render())
+  assert("\n".join(lines) == str(errors))
+  assert(len(lines) == 15)
+  assert(list(errors.render(max_items=3)) == lines[:3] + ["..."])
+  assert(list(errors.render(max_items=15)) == lines)
+  assert(list(errors.render(max_depth=1)) == ["root: (", " val is 1 (expected: 2)", " sub_0: ... (2 reasons)", " sub_1: ... (2 reasons)", " sub_2: ... (2 reasons)", ")"])
+
+  d = errors.to_dict()
+  assert(d["ref"] == "root")
+  assert(d["reasons"] == [{"kind": "value_mismatch", "ref": "val", "value": 1, "expected": 2}])
+  assert(d["subs"][1] == {"ref": "sub_1", "reasons": [{"kind": "value_none", "ref": "a"}, {"kind": "value_none", "ref": "b"}], "subs": []})
+  assert(errors.to_dict(max_depth=1)["subs"][0] == {"ref": "sub_0", "truncated": 2})
+
+  ## flat version: node 0 has a local reason and a sub node 1, with a local reason
+  names = ("n0", "n1", "n2")
+  flat = reason_flat__c(names.__getitem__)
+  assert(not bool(flat))
+  flat.add_reason(2, 2, (1, 2)) # dependencies (code 2) of n2 over n1 and n2
+  flat.close_node(1, 0)
+  flat.add_reason(0, 0, True, False) # value mismatch (code 0)
+  flat.close_node(0, 0)
+  assert(len(flat) == 2)
+  assert(str(flat) == "n0: (\n n0 is True (expected: False)\n n1: n2 should be True due to dependencies (found: \"n1\", \"n2\")\n)")
+  assert(flat.to_dict(max_depth=1)["subs"] == [{"ref": "n1", "truncated": 1}])
+  flat.truncate(0)
+  assert(not bool(flat))
+
+
+
 def test_eval_result():
   print("==========================================")
   print("= test_eval_result")
@@ -206,5 +243,6 @@ def test_eval_result():
 if(__name__ == "__main__"):
   test_declaration()
   test_reason_tree()
+  test_reason_render()
   test_eval_result()
 
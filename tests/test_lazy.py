@@ -0,0 +1,132 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+from pydop.fm_constraint import *
+from pydop.fm_diagram import *
+from pydop.spl import SPL, RegistryGraph
+from pydop.operations.modules import VariantModule
+from pydop.lazy import lazy_variant__c, materialize, pending
+
+
+def mk_spl(log):
+  fm = FD("A", FDAny(FD("B"), FD("C"), FD("D")))
+  spl = SPL(fm, RegistryGraph(), VariantModule("pydop_test_lazy_base"))
+
+  @spl.delta("A", targets="Base")
+  def dBase(variant):
+    log.append("dBase")
+    class Base(object):
+      def name(self): return "base"
+    variant.add(Base)
+
+  @spl.delta("B", after="dBase", targets=("Base", "Sub"))
+  def dB(variant):
+    log.append("dB")
+    class Sub(variant.Base.m_obj):
+      def name(self): return "sub"
+    variant.add(Sub)
+    variant.Base.add("b", True)
+
+  @spl.delta("C", after="dB", targets="Other")
+  def dC(variant):
+    log.append("dC")
+    def Other(): return "other"
+    variant.add(Other)
+
+  @spl.delta("D", after="dC")
+  def dD(variant): # no declared target
+    log.append("dD")
+    variant.add("d", 1)
+
+  @spl.delta("A", after="dD", targets="Last")
+  def dLast(variant):
+    log.append("dLast")
+    variant.add("Last", len(log))
+  return spl
+
+
+def test_lazy():
+  print("==========================================")
+  print("= test_lazy")
+
+  log = []
+  spl = mk_spl(log)
+  variant = spl.generate_lazy({"B": True, "C": True})
+  assert(isinstance(variant, lazy_variant__c))
+  assert((log == []) and (pending(variant) == ("dBase", "dB", "dC", "dLast")))
+
+  # accessing Other only executes dC
+  assert(variant.Other() == "other")
+  assert(log == ["dC"])
+  # accessing Sub executes dB, and dBase before it as they share a target
+  assert(variant.Sub().name() == "sub")
+  assert(variant.Base().b)
+  assert(log == ["dC", "dBase", "dB"])
+  assert(pending(variant) == ("dLast",))
+  real = materialize(variant)
+  assert((log == ["dC", "dBase", "dB", "dLast"]) and (real.Last.m_obj == 4))
+  assert(pending(variant) == ())
+  assert(materialize(real) is real)
+
+  # the deltas without targets, and the ones before them, are executed immediately
+  log.clear()
+  variant = spl.generate_lazy({"B": True, "D": True})
+  assert(log == ["dBase", "dB", "dD"])
+  assert(pending(variant) == ("dLast",))
+  assert(variant.d.m_obj == 1)
+  assert(log == ["dBase", "dB", "dD"])
+  assert(variant.Last.m_obj == 4)
+
+  # same result as the eager generation
+  log.clear()
+  eager = spl({"B": True, "C": True})
+  assert(eager.Sub().name() == "sub" and eager.Other() == "other" and eager.Last.m_obj == 4)
+
+
+def test_lazy_errors():
+  print("==========================================")
+  print("= test_lazy_errors")
+
+  fm = FD("A", FDAny(FD("B"), FD("C")))
+  spl = SPL(fm, RegistryGraph(), dict)
+  @spl.delta("B", targets="x")
+  def dB(variant): variant["x"] = 1
+  @spl.delta("C", after="dB", targets=("x", "y"))
+  def dC(variant): raise ValueError("dC")
+
+  variant = spl.generate_lazy({"B": True, "C": True})
+  try:
+    variant["y"]
+    assert(False)
+  except ValueError: pass
+  # dB was executed before the failure, and is not pending anymore
+  assert(pending(variant) == ())
+  assert(variant["x"] == 1)
+
+  variant = spl.generate_lazy({"B": True})
+  variant["z"] = 2
+  assert(pending(variant) == ("dB",))
+  assert(materialize(variant) == {"x": 1, "z": 2})
+
+
+if(__name__ == "__main__"):
+  test_lazy()
+  test_lazy_errors()
@@ -0,0 +1,140 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+from pydop.operations.modules import VariantModule
+
+
+class Greeter(object):
+  def hello(self): return "hello"
+
+
+def mk_variant():
+  res = VariantModule("pydop_test_modules_base")() # not importable: the base module is empty
+  res.add(Greeter)
+  return res
+
+
+def test_copy_on_write():
+  print("==========================================")
+  print("= test_copy_on_write")
+
+  variant = mk_variant()
+  variant.Greeter.add("x", 1)
+  variant.Greeter.remove("hello")
+  assert(hasattr(Greeter, "hello") and (not hasattr(Greeter, "x")))
+  assert(variant.Greeter().x == 1)
+  assert(not hasattr(variant.Greeter(), "hello"))
+
+
+def test_snapshot():
+  print("==========================================")
+  print("= test_snapshot")
+
+  variant = mk_variant()
+  variant.Greeter.add("x", 1)
+  other = variant.snapshot()
+  @other.Greeter.modify
+  def hello(self): return "hello!"
+  @variant.Greeter.modify
+  def __str__(self): return "greeter"
+  other.Greeter.add("y", 2)
+  variant.Greeter.remove("x")
+  assert(other.Greeter().hello() == "hello!")
+  assert((other.Greeter().x, other.Greeter().y) == (1, 2))
+  assert(variant.Greeter().hello() == "hello")
+  assert((str(variant.Greeter()) == "greeter") and (str(other.Greeter()) != "greeter"))
+  assert(not hasattr(variant.Greeter(), "x"))
+  assert(not hasattr(variant.Greeter(), "y"))
+  assert(Greeter().hello() == "hello")
+  try:
+    variant.Greeter.snapshot()
+    assert(False)
+  except Exception: pass
+
+
+def test_modify_renamed():
+  print("==========================================")
+  print("= test_modify_renamed")
+
+  variant = mk_variant()
+  def greet(self): return "greet"
+  def bye(self): return "bye"
+  variant.Greeter.add(greet)
+  # the replacing function does not reference the original one: no other element is modified
+  variant.Greeter.modify("hello", bye)
+  assert((variant.Greeter().hello(), variant.Greeter().greet()) == ("bye", "greet"))
+  assert(not hasattr(variant.Greeter(), "bye"))
+  variant.Greeter.modify("greet", greet)
+  assert((variant.Greeter().hello(), variant.Greeter().greet()) == ("bye", "greet"))
+  assert(Greeter().hello() == "hello")
+
+
+def test_record_replay():
+  print("==========================================")
+  print("= test_record_replay")
+
+  class Root(object): pass
+  class Mixin(object):
+    def mixed(self): return "mixed"
+
+  variant = mk_variant()
+  variant.start_recording()
+  variant.add("x", 1)
+  class Other(Root): pass
+  variant.add(Other)
+  variant.Greeter.add("y", 2)
+  @variant.Greeter.modify
+  def hello(self): return "hi"
+  def greet(self): return "greet"
+  def renamed(self): return "renamed"
+  variant.Greeter.add(greet)
+  variant.Greeter.modify("greet", renamed)
+  variant.Other.set_extends(Mixin)
+  variant.remove("x")
+  log = variant.stop_recording()
+  assert(len(log) == 8)
+  assert([path for _, path, _ in log] == [(), (), ("Greeter",), ("Greeter",), ("Greeter",), ("Greeter",), ("Other",), ()])
+  assert(log[5][2][:3] == ("greet", renamed, "greet")) # the original element is not saved
+  assert(variant.stop_recording() == ())
+
+  other = mk_variant()
+  other.replay(log)
+  for res in (variant, other):
+    assert(not hasattr(res.m_obj, "x"))
+    assert((res.Greeter().y, res.Greeter().hello(), res.Other().mixed()) == (2, "hi", "mixed"))
+    assert((res.Greeter().greet() == "renamed") and (not hasattr(res.Greeter(), "renamed")))
+  assert(other.Greeter.m_obj is not variant.Greeter.m_obj)
+  # the replayed values are copied before being modified
+  other.Other.add("z", 3)
+  assert((other.Other().z == 3) and (not hasattr(variant.Other.m_obj, "z")))
+  assert(Other.__bases__ == (Root,))
+  assert(Greeter().hello() == "hello")
+  try:
+    other.Greeter.replay(log)
+    assert(False)
+  except Exception: pass
+
+
+if(__name__ == "__main__"):
+  test_copy_on_write()
+  test_snapshot()
+  test_modify_renamed()
+  test_record_replay()
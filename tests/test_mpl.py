@@ -0,0 +1,142 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+from pydop.fm_diagram import *
+from pydop.spl import SPL, RegistryGraph
+from pydop.mpl import MPL
+from pydop.cache import lru_cache__c, lfu_cache__c, disk_cache__c
+
+import os
+import subprocess
+import sys
+import tempfile
+
+
+def mk_spl(calls):
+  fm = FD("A", FDAny(FD("B"), FD("C")))
+  spl = SPL(fm, RegistryGraph(), list)
+  def dA(variant, product):
+    calls.append((product["B"], product["C"]))
+    variant.append("A")
+  def dB(variant): variant.append("B")
+  spl.delta("A")(dA)
+  spl.delta("B", after="dA")(dB)
+  return spl
+
+
+def test_mpl_cache():
+  print("==========================================")
+  print("= test_mpl_cache")
+
+  calls = []
+  mpl = MPL(cache_factory=(lambda spl_id: lru_cache__c(2)))
+  mpl.add("spl", mk_spl(calls))
+  v1 = mpl.get_variant("spl", {"B": True})
+  assert((v1 == ["A", "B"]) and (mpl.get_variant("spl", {"B": True}) is v1))
+  mpl.get_variant("spl", {"C": True})
+  mpl.get_variant("spl", {"B": True, "C": True}) # the product {"B": True} is the least recently used
+  assert((len(calls) == 3) and (len(mpl.get_spl("spl").cache) == 2))
+  v2 = mpl.get_variant("spl", {"B": True})
+  assert((v2 == v1) and (v2 is not v1) and (len(calls) == 4))
+  assert((mpl.get_spl("spl").cache.hits, mpl.get_spl("spl").cache.misses) == (1, 4))
+
+  # explicit invalidation
+  mpl.invalidate("spl", {"B": True})
+  assert(mpl.get_variant("spl", {"B": True}) is not v2)
+  assert(len(calls) == 5)
+  mpl.invalidate("spl")
+  assert(len(mpl.get_spl("spl").cache) == 0)
+  mpl.add("other", mk_spl(calls))
+  mpl.get_variant("spl", {"B": True})
+  mpl.get_variant("other", {"B": True})
+  mpl.invalidate()
+  assert((len(mpl.get_spl("spl").cache) == 0) and (len(mpl.get_spl("other").cache) == 0))
+
+  # the cache factory receives the id of the SPLs
+  mpl = MPL(cache_factory=(lambda spl_id: lfu_cache__c(1) if(spl_id == "small") else lru_cache__c(None)))
+  mpl.add("small", mk_spl(calls))
+  mpl.add("large", mk_spl(calls))
+  assert(isinstance(mpl.get_spl("small").cache, lfu_cache__c) and (mpl.get_spl("large").cache.maxsize is None))
+
+
+def test_mpl_shared_cache():
+  print("==========================================")
+  print("= test_mpl_shared_cache")
+
+  with tempfile.TemporaryDirectory() as directory:
+    # two MPLs, with different feature model objects, simulate two processes
+    calls1, calls2 = [], []
+    mpl1, mpl2 = MPL(), MPL()
+    mpl1.add("spl", mk_spl(calls1))
+    mpl2.add("spl", mk_spl(calls2))
+    mpl1.set_shared_cache(directory)
+    mpl2.set_shared_cache(disk_cache__c(directory))
+    assert(mpl1.get_spl("spl").stable_key({"B": True}) == mpl2.get_spl("spl").stable_key({"B": True}))
+    assert(mpl1.get_spl("spl").stable_key({"B": True}) != mpl1.get_spl("spl").stable_key({"C": True}))
+    v1 = mpl1.get_variant("spl", {"B": True})
+    v2 = mpl2.get_variant("spl", {"B": True})
+    assert((v1 == v2 == ["A", "B"]) and (len(calls1) == 1) and (len(calls2) == 0))
+    assert(len(mpl2.shared_cache) == 1)
+
+    # the SPLs added after the shared cache is set use it, and the key depends on the id of the SPL
+    mpl2.add("other", mk_spl(calls2))
+    assert(mpl2.get_spl("other").stable_key({"B": True}) != mpl2.get_spl("spl").stable_key({"B": True}))
+    mpl2.get_variant("other", {"B": True})
+    assert((len(calls2) == 1) and (len(mpl1.shared_cache) == 2))
+
+    # the in-memory cache is still used first, and the shared cache can be disabled
+    mpl2.invalidate()
+    mpl2.get_variant("spl", {"C": True})
+    mpl2.set_shared_cache(None)
+    mpl2.get_variant("spl", {"B": True})
+    assert((len(calls2) == 3) and (len(mpl1.shared_cache) == 3) and (mpl2.shared_cache is None))
+
+
+_stable_key_script = """
+from pydop.fm_diagram import *
+from pydop.spl import SPL, RegistryGraph
+from pydop.mpl import MPL
+spl = SPL(FD("A", FDAny(FD("B")), tags=Class(frozenset)), RegistryGraph(), list)
+spl.delta("B")(lambda variant: variant.append("B"))
+mpl = MPL()
+mpl.add("spl", spl)
+tags = frozenset(("alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", ("iota", frozenset(("kappa", "lambda")))))
+print(mpl.get_spl("spl").stable_key({"B": True, "tags": tags}))
+"""
+
+def test_mpl_stable_key_hash_seed():
+  print("==========================================")
+  print("= test_mpl_stable_key_hash_seed")
+
+  # the key does not depend on the hash seed of the process (e.g., on the order of the elements of sets)
+  path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  keys = []
+  for seed in ("0", "1", "2"):
+    env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=path)
+    res = subprocess.run([sys.executable, "-c", _stable_key_script], env=env, capture_output=True, text=True, check=True)
+    keys.append(res.stdout.strip())
+  assert(keys[0] and (keys[0] == keys[1] == keys[2]))
+
+
+if(__name__ == "__main__"):
+  test_mpl_cache()
+  test_mpl_shared_cache()
+  test_mpl_stable_key_hash_seed()
@@ -0,0 +1,115 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+from pydop.fm_constraint import *
+from pydop.fm_diagram import *
+from pydop.spl import SPL, RegistryGraph
+from pydop.profiler import profile__c
+import pydop.profiler
+
+import json
+import tracemalloc
+
+from test_spl import mk_spl
+
+
+def test_profile():
+  print("==========================================")
+  print("= test_profile")
+
+  spl = mk_spl()
+  assert(spl.profile is None)
+  spl({"B": True}) # not profiled
+  profile = spl.enable_profiling()
+  assert(spl.profile is profile)
+  confs = [{"B": True, "C": True}, {"B": True}, {"A": True}, {"C": True, "D": True}]
+  for conf in confs:
+    spl(conf)
+  spl({"B": True, "C": True}) # the plan is in cache: the guards are not evaluated again
+  assert(profile.nb_variants == 5)
+  counts = {stats.name: stats.count for stats in profile}
+  assert(counts == {"dB": 3, "dC": 3, "dBC": 2, "dnB": 2, "dD": 1, "dNone": 0})
+  for stats in profile:
+    assert(0 <= stats.max <= stats.total)
+    assert(stats.mean <= stats.max)
+  assert(profile["dB"].guard_count == 1) # {"B": True} was planned before profiling, and the guard is indexed by B
+  assert(profile["dNone"].count == 0 and profile["dNone"].guard_count == 2) # the guard of dNone is not evaluated without B, C or D
+
+  # generate_many is also profiled
+  profile.reset()
+  spl.generate_many([{"B": True, "C": True}, {"B": True}])
+  assert(profile.nb_variants == 2)
+  assert({stats.name: stats.count for stats in profile} == {"dB": 1, "dC": 1, "dBC": 1})
+
+  # dumps
+  data = json.loads(profile.to_json())
+  assert(data["variants"] == 2)
+  assert(sorted(stats["name"] for stats in data["deltas"]) == ["dB", "dBC", "dC"])
+  assert([stats.name for stats in profile.sorted("count", limit=2)] == [stats.name for stats in profile.sorted("count")[:2]])
+  lines = profile.table().splitlines()
+  assert(len(lines) == 5)
+  assert(lines[0].split()[0] == "delta")
+
+  assert(spl.disable_profiling() is profile)
+  assert(spl.profile is None)
+  spl({"B": True})
+  assert(profile.nb_variants == 2)
+  assert(spl.disable_profiling() is None)
+
+
+def test_profile_memory():
+  print("==========================================")
+  print("= test_profile_memory")
+
+  fm = FD("A", FDAny(FD("B"), FD("C")))
+  spl = SPL(fm, RegistryGraph(), list)
+  def dB(variant): variant.append(bytearray(100000))
+  def dC(variant): variant.append(len(bytearray(200000)))
+  spl.delta("B")(dB)
+  spl.delta("C")(dC)
+
+  assert(not tracemalloc.is_tracing())
+  profile = spl.enable_profiling(memory=True)
+  assert(tracemalloc.is_tracing())
+  spl({"B": True, "C": True})
+  assert(profile["dB"].memory >= 100000)
+  assert(profile["dC"].memory < 100000) # the bytearray is released
+  assert(profile["dC"].memory_peak >= 200000)
+  assert("memory" in profile.table())
+  spl.disable_profiling()
+  assert(not tracemalloc.is_tracing())
+
+  # without tracemalloc.reset_peak (python 3.8), the peak is approximated by the memory still allocated
+  has_reset_peak = pydop.profiler._has_reset_peak__
+  pydop.profiler._has_reset_peak__ = False
+  try:
+    profile = spl.enable_profiling(memory=True)
+    spl({"B": True, "C": True})
+    assert(profile["dB"].memory_peak >= 100000)
+    assert(0 <= profile["dC"].memory_peak < 100000)
+  finally:
+    spl.disable_profiling()
+    pydop.profiler._has_reset_peak__ = has_reset_peak
+
+
+if(__name__ == "__main__"):
+  test_profile()
+  test_profile_memory()
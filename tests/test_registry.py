@@ -61,6 +61,38 @@ def test_RegistryGraph_2():
   assert (succs["d4"] == frozenset())
 
 
+def test_RegistryGraph_freeze():
+  reg = RegistryGraph()
+  d = { f"d{i}": info_cls(f"d{i}") for i in range(5) }
+  reg.add(d["d0"])
+  reg.add(d["d1"], after=("d0", "d3"))
+  reg.add(d["d2"], after=("d1", "d4"))
+
+  # undeclared deltas are reported at once
+  try:
+    reg.freeze()
+    assert(False)
+  except Exception as e:
+    assert("\"d3\", \"d4\" not declared" in str(e))
+  reg.add(d["d3"])
+  reg.add(d["d4"])
+
+  # the linearization is computed once per modification
+  order = reg.freeze()
+  assert(isinstance(order, tuple))
+  assert(reg.freeze() is order)
+  assert(tuple(reg) == order)
+  pos = {el.name: i for i, el in enumerate(order)}
+  assert(pos["d0"] < pos["d1"] < pos["d2"])
+  assert(pos["d3"] < pos["d1"] < pos["d2"])
+  reg.add_order("d2", "d4")
+  try:
+    reg.freeze()
+    assert(False)
+  except Exception as e:
+    assert("cycle" in str(e))
+
+
 def test_RegistryCategory():
   categories = (1,2,3,)
   def get_category(delta_info, *args, **kwargs):
@@ -82,6 +114,7 @@ def test_RegistryCategory():
 if(__name__ == '__main__'):
   test_RegistryGraph_1()
   test_RegistryGraph_2()
+  test_RegistryGraph_freeze()
   test_RegistryCategory()
 
 
@@ -0,0 +1,122 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+from pydop.sat import *
+
+import random
+import itertools
+
+
+def brute_force(nb_vars, clauses, assumptions=()):
+  for values in itertools.product((False, True), repeat=nb_vars):
+    sat = lambda lit: values[abs(lit)-1] if(lit > 0) else (not values[abs(lit)-1])
+    if(all(sat(lit) for lit in assumptions) and all(any(sat(lit) for lit in clause) for clause in clauses)):
+      return True
+  return False
+
+
+def test_solver_random():
+  print("==========================================")
+  print("= test_solver_random")
+
+  rnd = random.Random(0)
+  for _ in range(1000):
+    nb_vars = rnd.randint(1, 8)
+    clauses = [[rnd.choice((1, -1)) * rnd.randint(1, nb_vars) for _ in range(rnd.randint(1, 3))] for _ in range(rnd.randint(1, 30))]
+    assumptions = [rnd.choice((1, -1)) * v for v in rnd.sample(range(1, nb_vars + 1), rnd.randint(0, min(3, nb_vars)))]
+    solver = solver__c(clauses)
+    res = solver.solve(assumptions)
+    assert(res == brute_force(nb_vars, clauses, assumptions))
+    if(res):
+      model = solver.model()
+      assert(all(model[abs(lit)] == (lit > 0) for lit in assumptions))
+      assert(all(any(model[abs(lit)] == (lit > 0) for lit in clause) for clause in clauses))
+    else:
+      core = solver.core()
+      assert(set(core) <= set(assumptions))
+      assert(not brute_force(nb_vars, clauses, core))
+
+
+def test_solver_incremental():
+  print("==========================================")
+  print("= test_solver_incremental")
+
+  solver = solver__c([(1, 2), (-1, 3)])
+  assert(solver.solve())
+  assert(solver.solve((-3,)))
+  assert(solver.model()[2])
+  solver.add_clause((-2,))
+  assert(not solver.solve((-3,)))
+  assert(solver.core() == [-3])
+  assert(solver.solve())
+
+  assert(solver.value(1) is True) # facts, deduced from (-2)
+  assert(solver.value(3) is True)
+
+  # manual decision levels
+  solver = solver__c([(-1, 2), (-2, 3), (-4, -3)])
+  assert(solver.assume(1))
+  assert(solver.value(3) is True)
+  assert(solver.value(4) is False)
+  assert(not solver.assume(4))
+  assert(solver.level == 1)
+  assert(solver.trail() == [1, 2, 3, -4])
+  solver.retract()
+  assert(solver.level == 0)
+  assert(solver.value(3) is None)
+
+  # the core of a conflict found during search only contains the responsible assumptions
+  solver = solver__c([(1, 2), (-1, 3), (-4, 5, 6), (-4, 5, -6), (-4, -5, 6), (-4, -5, -6), (7, 8)])
+  assert(not solver.solve((8, 4, 7, -3)))
+  assert(solver.core() == [4])
+  solver = solver__c([(-1, 2, 3), (-1, 2, -3), (-1, -2, 3), (-1, -2, -3), (-4, -5, 6), (-4, -5, -6), (7, 8)])
+  assert(not solver.solve((7, 1, 4, 9)))
+  assert(solver.core() == [1])
+
+
+def test_solver_minimize():
+  print("==========================================")
+  print("= test_solver_minimize")
+
+  rnd = random.Random(1)
+  for _ in range(200):
+    nb_vars = rnd.randint(1, 7)
+    clauses = [[rnd.choice((1, -1)) * rnd.randint(1, nb_vars) for _ in range(rnd.randint(1, 3))] for _ in range(rnd.randint(1, 20))]
+    soft = {rnd.choice((1, -1)) * v: rnd.randint(0, 5) for v in rnd.sample(range(1, nb_vars + 1), rnd.randint(0, nb_vars))}
+    expected = None
+    for values in itertools.product((False, True), repeat=nb_vars):
+      sat = lambda lit: values[abs(lit)-1] == (lit > 0)
+      if(all(any(sat(lit) for lit in clause) for clause in clauses)):
+        cost = sum(w for lit, w in soft.items() if(not sat(lit)))
+        if((expected is None) or (cost < expected)): expected = cost
+    solver = solver__c(clauses)
+    res = solver.minimize(soft)
+    assert(res == expected)
+    if(res is not None):
+      model = solver.model()
+      assert(sum(w for lit, w in soft.items() if(model[abs(lit)] != (lit > 0))) == res)
+
+
+
+if(__name__ == "__main__"):
+  test_solver_random()
+  test_solver_incremental()
+  test_solver_minimize()
@@ -0,0 +1,484 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+from pydop.fm_constraint import *
+from pydop.fm_diagram import *
+from pydop.fm_configuration import product__c
+from pydop.spl import SPL, RegistryGraph, RegistryCategory, delta_info_cls
+from pydop.mpl import MPL
+from pydop.operations.modules import VariantModule
+
+import random
+import tempfile
+
+
+def mk_spl(dC=None, fm=None):
+  if(fm is None):
+    fm = FD("A", FDAny(FD("B"), FD("C"), FD("D")), Implies("D", "C"))
+  spl = SPL(fm, RegistryGraph(), list)
+
+  def dB(variant): variant.append("B")
+  if(dC is None):
+    def dC(variant): variant.append("C")
+  def dBC(variant): variant.append("BC")
+  def dnB(variant): variant.append("nB")
+  def dD(variant, product): variant.append(f"D{product['C']}")
+  def dNone(): return ["reset"]
+
+  spl.delta("B")(dB)
+  spl.delta(Or("C", "D"), after="dB")(dC)
+  spl.delta(And("B", "C"), after="dC")(dBC)
+  spl.delta(Not("B"), after="dBC")(dnB)
+  spl.delta("D", after="dnB")(dD)
+  spl.delta(And("B", "C", "D"), after="dD")(dNone)
+  return spl
+
+
+def test_spl_generation():
+  print("==========================================")
+  print("= test_spl_generation")
+
+  spl = mk_spl()
+  # the guards are compiled at registration
+  for info in spl.ordering:
+    assert(isinstance(info, delta_info_cls))
+    assert(info.check is not None)
+  assert(delta_info_cls(None, None, "d", 0).check is None)
+
+  tests = (
+    ({"A": True}, ["nB"]),
+    ({"B": True}, ["B"]),
+    ({"B": True, "C": True}, ["B", "C", "BC"]),
+    ({"C": True, "D": True}, ["C", "nB", "DTrue"]),
+    ({"B": True, "C": True, "D": True}, ["reset"]),
+  )
+  for conf, expected in tests:
+    assert(spl(conf) == expected)
+    conf, errors = spl.close_configuration(conf)
+    assert(not bool(errors))
+    for info in spl.ordering:
+      assert(bool(info.check(conf.m_dict)) == bool(info.guard(conf)))
+
+  try:
+    spl({"D": True, "C": False})
+    assert(False)
+  except Exception: pass
+
+
+def test_spl_plan():
+  print("==========================================")
+  print("= test_spl_plan")
+
+  spl = mk_spl()
+  conf = {"B": True, "C": True}
+  assert([info.name for info in spl.plan(conf)] == ["dB", "dC", "dBC"])
+  assert(spl.m_plans.misses == 1)
+  assert(spl(conf) == ["B", "C", "BC"])
+  assert(spl.m_plans.hits == 1)
+  prod, _ = spl.close_configuration(conf)
+  assert(spl(prod) == ["B", "C", "BC"])
+  assert(spl.m_plans.hits == 2)
+
+  # modifying the ordering invalidates the plans
+  def dE(variant): variant.append("E")
+  spl.delta("C", after="dBC")(dE)
+  assert(spl(conf) == ["B", "C", "BC", "E"])
+  assert(len(spl.m_plans) == 1)
+  def dF(variant): variant.append("F")
+  spl.delta("B")(dF)
+  assert(sorted(spl(conf)) == ["B", "BC", "C", "E", "F"])
+  spl.ordering.add_order("dF", "dB")
+  assert(spl(conf) == ["F", "B", "C", "BC", "E"])
+
+  # invalid products are never cached
+  for _ in range(2):
+    try:
+      spl.plan({"D": True, "C": False})
+      assert(False)
+    except Exception: pass
+  assert(len(spl.m_plans) == 1)
+
+  spl = SPL(spl.m_fm, spl.ordering, list, plan_cache_size=0)
+  assert(spl(conf) == ["F", "B", "C", "BC", "E"])
+  assert(len(spl.m_plans) == 0)
+
+
+def test_spl_guard_index():
+  print("==========================================")
+  print("= test_spl_guard_index")
+
+  spl = mk_spl()
+  fm = spl.m_fm
+  index = {str(fm.m_dom[key]): sorted(info.name for info in infos) for key, infos in spl.m_guard_index.items()}
+  assert(index == {"/A/0/B": ["dB", "dBC", "dNone"], "/A/0/C": ["dBC", "dC", "dNone"], "/A/0/D": ["dC", "dD", "dNone"]})
+  assert([info.name for info in spl.m_guard_always] == ["dnB"])
+
+  # the plans computed with the index are the same as the ones computed by evaluating all the guards
+  rng = random.Random(0)
+  names = tuple(f"F{i}" for i in range(8))
+  def mk_guard(depth):
+    if((depth == 0) or (rng.random() < 0.3)):
+      return rng.choice(names)
+    kind = rng.randrange(6)
+    if(kind == 0): return Not(mk_guard(depth-1))
+    elif(kind == 1): return Implies(mk_guard(depth-1), mk_guard(depth-1))
+    elif(kind == 2): return Gt("size", rng.randrange(4))
+    elif(kind == 3): return Lit(rng.random() < 0.5)
+    return (And, Or)[kind - 4](*(mk_guard(depth-1) for _ in range(rng.randrange(1, 4))))
+
+  for target in (FD("A", FDAny(*(FD(name) for name in names)), size=Int(0, 4)),):
+    for frozen in (False, True):
+      fm = target.freeze() if(frozen) else target
+      for reg in (RegistryGraph(), RegistryCategory((0, 1), (lambda info, *args, **kwargs: len(info.name) % 2))):
+        spl = SPL(fm, reg, list)
+        for i in range(60):
+          def d(variant): pass
+          spl.delta(mk_guard(3), name=f"d{i}")(d)
+        assert(0 < len(spl.m_guard_always) < 60)
+        for _ in range(50):
+          conf = {name: (rng.random() < 0.2) for name in names}
+          conf["A"] = True
+          conf["size"] = rng.randrange(4)
+          prod, _ = spl.close_configuration(conf)
+          expected = [info.name for info in reg if(bool(info.guard(prod)))]
+          assert([info.name for info in spl.plan(prod)] == expected)
+
+
+def test_spl_generate_many():
+  print("==========================================")
+  print("= test_spl_generate_many")
+
+  # same variants as the ones generated one by one (mk_spl contains deltas taking the product, or returning a new variant)
+  spl = mk_spl()
+  confs = [
+    {"B": True, "C": True}, {"B": True}, {"A": True}, {"B": True, "C": True}, {"C": True, "D": True},
+    {"C": True}, {"B": True, "C": True, "D": True}, {"C": True, "D": True}]
+  expected = [spl(conf) for conf in confs]
+  res = spl.generate_many(confs)
+  assert(res == expected)
+  assert(len(set(map(id, res))) == len(res))
+  assert(spl.generate_many([]) == [])
+
+  # the deltas of common prefixes are executed once
+  counts = {}
+  def mk_delta(name):
+    def d(variant):
+      counts[name] = counts.get(name, 0) + 1
+      variant.append(name)
+    return d
+  fm = FD("A", FDAny(FD("B"), FD("C"), FD("D")))
+  spl = SPL(fm, RegistryGraph(), list)
+  spl.delta("A", name="base")(mk_delta("base"))
+  spl.delta("B", name="dB", after="base")(mk_delta("dB"))
+  spl.delta("C", name="dC", after="dB")(mk_delta("dC"))
+  spl.delta("D", name="dD", after="dC")(mk_delta("dD"))
+  confs = [{"B": True, "C": True}, {"B": True, "C": True, "D": True}, {"B": True, "D": True}, {"C": True}]
+  res = spl.generate_many(confs)
+  assert(res == [["base", "dB", "dC"], ["base", "dB", "dC", "dD"], ["base", "dB", "dD"], ["base", "dC"]])
+  assert(counts == {"base": 1, "dB": 1, "dC": 2, "dD": 2})
+
+
+def test_spl_generate_parallel():
+  print("==========================================")
+  print("= test_spl_generate_parallel")
+
+  spl = mk_spl()
+  confs = [{"B": True, "C": True}, {"B": True}, {"A": True}, {"C": True, "D": True}, {"B": True, "C": True, "D": True}]
+  confs.append(spl.close_configuration({"B": True})[0]) # linked configurations are exported to the workers
+  expected = [spl(conf) for conf in confs]
+  for workers, factory, chunksize in ((0, None, 2), (2, None, 1), (2, "test_spl:mk_spl", 4)):
+    res = dict(spl.generate_parallel(confs, workers=workers, factory=factory, chunksize=chunksize))
+    assert(res == dict(enumerate(expected)))
+  res = dict(spl.generate_parallel(confs, workers=0, serializer=len))
+  assert(res == {i: len(variant) for i, variant in enumerate(expected)})
+
+
+def test_spl_disk_cache():
+  print("==========================================")
+  print("= test_spl_disk_cache")
+
+  confs = [{"B": True, "C": True}, {"B": True}, {"A": True}, {"C": True, "D": True}, {"B": True, "C": True, "D": True}]
+  with tempfile.TemporaryDirectory() as directory:
+    spl = mk_spl()
+    spl.set_disk_cache(directory)
+    expected = [spl(conf) for conf in confs]
+    assert((spl.disk_cache.hits, spl.disk_cache.misses, len(spl.disk_cache)) == (0, 5, 5))
+    assert([spl(conf) for conf in confs] == expected)
+    assert(spl.disk_cache.hits == 5)
+    assert(spl({"A": True}, ["x"]) == ["x", "nB"]) # a base module in parameter bypasses the cache
+    assert(spl.disk_cache.hits == 5)
+
+    # the variants are reused by a new SPL with the same feature model and deltas
+    spl = mk_spl()
+    keys = [spl.variant_key(conf) for conf in confs]
+    spl.set_disk_cache(directory)
+    hits = spl.disk_cache.hits
+    assert([spl(conf) for conf in confs] == expected)
+    assert(spl.disk_cache.hits == hits + 5)
+
+    # modifying a delta only invalidates the products activating it
+    def dC(variant): variant.append("C2")
+    spl = mk_spl(dC)
+    spl.set_disk_cache(directory)
+    changed = [spl.variant_key(conf) != key for conf, key in zip(confs, keys)]
+    assert(changed == [True, False, False, True, True])
+    assert(spl(confs[0]) == ["B", "C2", "BC"])
+    assert(spl(confs[1]) == expected[1])
+    assert(len(spl.disk_cache) == 6)
+
+    # modifying the feature model invalidates all the products
+    spl = mk_spl(fm=mk_spl().m_fm.freeze())
+    assert([spl.variant_key(conf) for conf in confs] == keys)
+    spl = mk_spl(fm=FD("A", FDAny(FD("B"), FD("C"), FD("D"))))
+    assert(all(spl.variant_key(conf) != key for conf, key in zip(confs, keys)))
+
+    spl.set_disk_cache(None)
+    assert(spl.disk_cache is None)
+
+
+def test_spl_hooks():
+  print("==========================================")
+  print("= test_spl_hooks")
+
+  spl = mk_spl()
+  assert(spl.m_hooks is None)
+  log = []
+  def on_plan(product, plan):
+    log.append(("plan", [info.name for info in plan]))
+  def before(info, variant, product):
+    log.append(("before", info.name, list(variant)))
+  def after(info, variant, product):
+    log.append(("after", info.name, list(variant)))
+  def on_variant(variant, product):
+    return tuple(variant)
+  for event, f in (("on_plan", on_plan), ("before_delta", before), ("after_delta", after), ("on_variant", on_variant)):
+    assert(spl.add_hook(event, f) is f)
+
+  assert(spl({"B": True}) == ("B",))
+  assert(log == [("plan", ["dB"]), ("before", "dB", []), ("after", "dB", ["B"])])
+
+  # the hooks can modify the plan and the variant
+  spl.add_hook("on_plan", lambda product, plan: [info for info in plan if(info.name != "dC")])
+  spl.add_hook("after_delta", lambda info, variant, product: variant + ["|"])
+  log.clear()
+  assert(spl({"B": True, "C": True}) == ("B", "|", "BC", "|"))
+  assert(log[0] == ("plan", ["dB", "dC", "dBC"]))
+  assert([entry[1] for entry in log[1:]] == ["dB", "dB", "dBC", "dBC"])
+  res = spl.generate_many([{"B": True, "C": True}, {"B": True}])
+  assert(res == [("B", "|", "BC", "|"), ("B", "|")])
+
+  # errors
+  errors = []
+  spl.add_hook("on_error", lambda e, info, variant, product: errors.append((type(e), info.name)))
+  def dE(variant): raise KeyError("E")
+  spl.delta("D", after="dD")(dE)
+  try:
+    spl({"C": True, "D": True})
+    assert(False)
+  except KeyError: pass
+  assert(errors == [(KeyError, "dE")])
+  try:
+    spl.add_hook("on_delta", before)
+    assert(False)
+  except ValueError: pass
+
+  # removing all the hooks restores the default generation
+  spl = mk_spl()
+  spl.add_hook("on_variant", on_variant)
+  spl.remove_hook("on_variant", on_variant)
+  assert(spl.m_hooks is None)
+  assert(spl({"B": True}) == ["B"])
+  try:
+    spl.remove_hook("on_variant", on_variant)
+    assert(False)
+  except ValueError: pass
+
+
+def test_spl_validate():
+  print("==========================================")
+  print("= test_spl_validate")
+
+  class counting_fm__c(object):
+    # counts the closures and validations done by the feature model
+    def __init__(self, fm):
+      self.fm = fm
+      self.closed = 0
+      self.validated = 0
+    def close_configuration(self, *confs):
+      self.closed += 1
+      return self.fm.close_configuration(*confs)
+    def __call__(self, conf):
+      self.validated += 1
+      return self.fm(conf)
+    def __getattr__(self, name):
+      return getattr(self.fm, name)
+
+  fm = counting_fm__c(mk_spl().m_fm)
+  spl = mk_spl(fm=fm)
+  prod = spl.validate({"B": True, "C": True})
+  assert(isinstance(prod, product__c) and prod.is_product_of(fm))
+  assert((fm.closed, fm.validated) == (1, 1))
+  assert(prod == spl.close_configuration({"B": True, "C": True})[0])
+  assert(spl(prod) == ["B", "C", "BC"])
+  assert(spl.close_configuration(prod)[0] is prod)
+  assert((fm.closed, fm.validated) == (2, 1))
+
+  # the products are trusted even when their plan is not in cache
+  spl = mk_spl(fm=fm)
+  spl = SPL(fm, spl.ordering, list, plan_cache_size=0)
+  assert(spl(prod) == ["B", "C", "BC"])
+  assert((fm.closed, fm.validated) == (2, 1))
+  # the deltas receive validated products
+  received = []
+  spl.add_hook("on_plan", lambda product, plan: received.append(product))
+  spl({"C": True, "D": True})
+  assert(isinstance(received[-1], product__c) and (fm.validated == 2))
+
+  # the products of another feature model are validated again
+  other_fm = counting_fm__c(fm.fm)
+  other = SPL(other_fm, spl.ordering, list)
+  assert(other(prod) == ["B", "C", "BC"])
+  assert(other_fm.validated == 1)
+  assert(other.validate(prod).is_product_of(other_fm))
+
+  # MPLs
+  mpl = MPL()
+  mpl.add("spl", spl)
+  closed, validated = fm.closed, fm.validated
+  assert(mpl["spl", prod] == ["B", "C", "BC"])
+  assert(mpl.get_variant("spl", prod) is mpl["spl", prod])
+  assert((fm.closed, fm.validated) == (closed, validated))
+  try:
+    spl.validate({"D": True, "C": False})
+    assert(False)
+  except Exception: pass
+
+
+def test_spl_replay():
+  print("==========================================")
+  print("= test_spl_replay")
+
+  fm = FD("A", FDAny(FD("B"), FD("C")), size=Int(0, 10))
+  spl = SPL(fm, RegistryGraph(), VariantModule("pydop_test_spl_replay_base"))
+  calls = []
+  @spl.delta("A")
+  def dBase(variant):
+    calls.append("dBase")
+    class Base(object):
+      def name(self): return "base"
+      def other(self): return "other"
+    variant.add(Base)
+  @spl.delta("B", after="dBase")
+  def dB(variant):
+    calls.append("dB")
+    def name_B(self): return "B"
+    variant.Base.modify("name", name_B)
+  @spl.delta("C", after="dBase")
+  def dC(variant, product):
+    calls.append("dC")
+    variant.add("size", product["size"])
+
+  spl.set_replay()
+  v1 = spl({"B": True, "size": 1})
+  v2 = spl({"B": True, "size": 2}) # same plan: the operations are replayed
+  assert(calls == ["dBase", "dB"])
+  assert(v1.Base().name() == v2.Base().name() == "B")
+  assert(v1.Base().other() == v2.Base().other() == "other")
+  assert(not (hasattr(v1.Base(), "name_B") or hasattr(v2.Base(), "name_B")))
+  assert(v1.m_obj is not v2.m_obj)
+
+  # the plans with a delta taking the product are specific to their product
+  calls.clear()
+  v1 = spl({"C": True, "size": 1})
+  v2 = spl({"C": True, "size": 2})
+  v3 = spl({"C": True, "size": 1})
+  assert(calls == ["dBase", "dC", "dBase", "dC"])
+  assert((v1.size.m_obj, v2.size.m_obj, v3.size.m_obj) == (1, 2, 1))
+
+  # modifying the ordering invalidates the logs
+  calls.clear()
+  @spl.delta("B", after="dB")
+  def dB2(variant):
+    calls.append("dB2")
+  spl({"B": True, "size": 1})
+  assert(calls == ["dBase", "dB", "dB2"])
+
+  spl.set_replay(0)
+  calls.clear()
+  spl({"B": True, "size": 1})
+  assert(calls == ["dBase", "dB", "dB2"])
+  assert(mk_spl()({"B": True}) == ["B"]) # variants without recording are generated as usual
+
+
+def test_spl_replay_extends():
+  print("==========================================")
+  print("= test_spl_replay_extends")
+
+  def mk(name):
+    fm = FD("A", FDAny(FD("B"), FD("C")), size=Int(0, 10))
+    spl = SPL(fm, RegistryGraph(), VariantModule(name))
+    @spl.delta("A")
+    def d1(variant):
+      class Root(object): pass
+      variant.add(Root)
+      class Base(variant.Root):
+        def name(self): return "base"
+      class Other(variant.Root): pass
+      variant.add(Base)
+      variant.add(Other)
+    @spl.delta("A", after="d1")
+    def d2(variant):
+      @variant.Base.modify
+      def name(self): return "modified"
+      variant.Root.add("r", 1)
+    @spl.delta("A", after="d2")
+    def d3(variant):
+      class Child(variant.Root): pass
+      variant.add(Child)
+      variant.Other.set_extends(variant.Base)
+    return spl
+  def relations(variant):
+    names = ("Root", "Base", "Other", "Child")
+    return {(n1, n2): issubclass(getattr(variant.m_obj, n1), getattr(variant.m_obj, n2)) for n1 in names for n2 in names}
+
+  spl_ref = mk("pydop_test_spl_replay_extends_ref")
+  spl = mk("pydop_test_spl_replay_extends")
+  spl.set_replay()
+  v1 = spl({"B": True, "size": 1})
+  v2 = spl({"B": True, "size": 2}) # replayed
+  assert(relations(v1) == relations(v2) == relations(spl_ref({"B": True, "size": 1})))
+  # the classes of the replayed variant inherit from the classes of the replayed variant
+  assert(issubclass(v2.Other.m_obj, v2.Base.m_obj) and (not issubclass(v2.Other.m_obj, v1.Base.m_obj)))
+  assert(issubclass(v2.Child.m_obj, v2.Root.m_obj) and (not issubclass(v2.Child.m_obj, v1.Root.m_obj)))
+  assert(v2.Other().name() == "modified")
+
+
+if(__name__ == "__main__"):
+  test_spl_generation()
+  test_spl_plan()
+  test_spl_guard_index()
+  test_spl_generate_many()
+  test_spl_generate_parallel()
+  test_spl_disk_cache()
+  test_spl_hooks()
+  test_spl_validate()
+  test_spl_replay()
+  test_spl_replay_extends()
@@ -0,0 +1,241 @@
+# This file is part of the pydop library.
+# Copyright (c) 2021 ONERA.
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, version 3.
+# 
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program. If not, see
+# <http://www.gnu.org/licenses/>.
+# 
+
+# Author: Michael Lienhardt
+# Maintainer: Michael Lienhardt
+# email: michael.lienhardt@onera.fr
+
+from pydop.fm_constraint import *
+from pydop.fm_diagram import *
+from pydop.spl import SPL, RegistryGraph, RegistryCategory
+from pydop.spl_analysis import *
+from pydop.lazy import materialize
+from pydop.operations.modules import VariantModule
+
+
+def mk_fm():
+  return FD("A", FDAny(FD("B"), FD("C")), FDXor(FD("X"), FD("Y")), size=Int(0, 10))
+
+def noop(variant): pass
+
+
+def test_guards():
+  print("==========================================")
+  print("= test_guards")
+
+  spl = SPL(mk_fm(), RegistryGraph())
+  guards = {"d0": "A", "d1": And("X", "Y"), "d2": Or("B", Gt("size", 3)), "d3": Gt("size", 3), "d4": Lit(False), "d5": Eq("size", 4)}
+  for name, guard in guards.items():
+    spl.delta(guard, name=name)(noop)
+  analysis = spl_analysis__c(spl)
+  infos = {info.name: info for info in spl.ordering}
+  assert(analysis.can_be_active(infos["d0"]))
+  assert(not analysis.can_be_active(infos["d1"]))
+  assert(not analysis.can_be_active(infos["d4"]))
+  assert(analysis.can_be_active(infos["d2"], infos["d3"]))
+  assert(analysis.can_be_active(infos["d3"], infos["d5"])) # the comparisons are opaque
+  # the same untranslatable sub-expression has the same variable
+  spl.delta(Not(Gt("size", 3)), name="d6")(noop)
+  assert(not analysis.can_be_active(infos["d3"], {info.name: info for info in spl.ordering}["d6"]))
+
+  # literals that print the same but are different are not confused
+  spl = SPL(FD("R", a=Enum([1, "1", 2])), RegistryGraph())
+  spl.delta(And(Eq("a", 1), Not(Eq("a", Lit("1")))), name="d0")(noop)
+  spl.delta(And(Eq("a", 1), Eq("a", Lit("1"))), name="d1")(noop)
+  analysis = spl_analysis__c(spl)
+  infos = {info.name: info for info in spl.ordering}
+  assert(analysis.can_be_active(infos["d0"]))
+  assert(analysis.can_be_active(infos["d1"])) # the comparisons are opaque
+
+
+def test_conflicts():
+  print("==========================================")
+  print("= test_conflicts")
+
+  spl = SPL(mk_fm(), RegistryGraph())
+  spl.delta("A", name="dBase", targets="Base")(noop)
+  spl.delta("B", name="dB1", after="dBase", targets="Base")(noop)
+  spl.delta("C", name="dB2", after="dBase", targets=("Base", "Misc"))(noop)
+  spl.delta("X", name="dX", targets="Other")(noop)
+  spl.delta("Y", name="dY", targets="Other")(noop)
+  spl.delta("B", name="dMisc", targets="Misc2")(noop)
+  spl.delta("B", name="dUnknown")(noop)
+
+  analysis = spl_analysis__c(spl)
+  conflicts = analysis.conflicts()
+  assert(conflicts == [delta_conflict_cls("dB1", "dB2", frozenset({("Base",)}))])
+  assert(analysis.commutes("dX", "dY")) # never activated together
+  assert(analysis.commutes("dB1", "dMisc"))
+  assert(not analysis.commutes("dB1", "dB2"))
+  assert(not analysis.commutes("dB1", "dUnknown"))
+  assert(analysis.commutes("dX", "dUnknown") is False)
+  # the footprints in parameter replace the declared targets
+  footprints = {"dB2": footprint_of_targets(("Misc",))}
+  assert(analysis.conflicts(footprints) == [])
+  groups = analysis.commuting_groups()
+  assert(sum(groups, []) == [info.name for info in spl.ordering])
+  for group in groups:
+    for i, d1 in enumerate(group):
+      for d2 in group[:i]:
+        assert(analysis.commutes(d1, d2))
+
+  # categories: the deltas of a category are not ordered
+  reg = RegistryCategory((0, 1), (lambda info, *args, **kwargs: kwargs.get("cat", 0)))
+  spl = SPL(mk_fm(), reg)
+  spl.delta("B", name="d1", targets="Base")(noop)
+  spl.delta("C", name="d2", targets="Base", cat=1)(noop)
+  spl.delta("C", name="d3", targets="Base", cat=1)(noop)
+  assert(reg.is_ordered("d1", "d2") and (not reg.is_ordered("d2", "d3")))
+  assert([(c.first, c.second) for c in spl_analysis__c(spl).conflicts()] == [("d2", "d3")])
+
+
+def test_recorded_footprints():
+  print("==========================================")
+  print("= test_recorded_footprints")
+
+  spl = SPL(mk_fm(), RegistryGraph(), VariantModule("pydop_test_spl_analysis_base"))
+  @spl.delta("A")
+  def dBase(variant):
+    class Greeter(object): pass
+    variant.add(Greeter)
+  @spl.delta("B", after="dBase")
+  def dx(variant): variant.Greeter.add("x", 1)
+  @spl.delta("C", after="dBase")
+  def dy(variant): variant.Greeter.add("y", 1)
+  @spl.delta("X", after="dBase")
+  def drm(variant): variant.remove("Greeter")
+
+  spl.set_replay()
+  footprints = record_footprints(spl, [{"B": True, "C": True, "Y": True, "size": 1}, {"X": True, "size": 1}])
+  assert(spl.m_hooks is None and spl.m_replay is not None)
+  assert(footprints["dx"] == footprint_cls(frozenset({("Greeter", "x")}), frozenset({("Greeter",)})))
+  assert(footprints["drm"].writes == frozenset({("Greeter",)}))
+  assert(footprint_overlap(footprints["dx"], footprints["dy"]) == frozenset())
+  assert(footprint_overlap(footprints["dx"], footprints["drm"]) == frozenset({("Greeter",)}))
+  analysis = spl_analysis__c(spl)
+  conflicts = analysis.conflicts(footprints)
+  assert(sorted((c.first, c.second) for c in conflicts) == [("dx", "drm"), ("dy", "drm")])
+  assert(analysis.commutes("dx", "dy", footprints))
+
+
+def test_dead_always():
+  print("==========================================")
+  print("= test_dead_always")
+
+  calls = []
+  def mk(name):
+    def delta(variant):
+      calls.append(name)
+      variant.append(name)
+    return delta
+  def mk_spl(bm_factory):
+    spl = SPL(mk_fm(), RegistryGraph(), bm_factory, analyze_guards=True)
+    spl.delta("A", name="dBase")(mk("dBase"))
+    spl.delta(Or("X", "Y"), name="dXY", after="dBase")(mk("dXY"))
+    spl.delta(And("X", "Y"), name="dDead", after="dXY")(mk("dDead"))
+    spl.delta("B", name="dB", after="dXY")(mk("dB"))
+    spl.delta(Implies("C", "A"), name="dLast", after="dB")(mk("dLast"))
+    return spl
+  spl = mk_spl(list)
+  assert(spl.dead_deltas == {"dDead"})
+  assert(spl.always_active_deltas == {"dBase", "dXY", "dLast"})
+  analysis = spl_analysis__c(spl)
+  assert(analysis.dead_deltas() == ["dDead"])
+  assert(analysis.always_active_deltas() == ["dBase", "dXY", "dLast"])
+  conf = {"B": True, "X": True, "size": 1}
+  assert([info.name for info in spl.plan(conf)] == ["dBase", "dXY", "dB", "dLast"])
+  assert(spl(conf) == ["dBase", "dXY", "dB", "dLast"])
+
+  # folding the always active prefix in the base module
+  key = spl.variant_key(conf)
+  assert(spl.fold_always_active() == ["dBase", "dXY"])
+  assert(spl.fold_always_active() == [])
+  assert(spl.variant_key(conf) == key)
+  del calls[:]
+  assert([info.name for info in spl.plan(conf)] == ["dB", "dLast"])
+  assert(spl(conf) == ["dBase", "dXY", "dB", "dLast"])
+  assert(spl({"Y": True, "size": 1}) == ["dBase", "dXY", "dLast"])
+  assert(calls == ["dB", "dLast", "dLast"])
+  # the folded deltas are executed on the base modules given in parameter
+  assert(spl(conf, ["base"]) == ["base", "dBase", "dXY", "dB", "dLast"])
+  assert(materialize(spl.generate_lazy(conf, ["base"])) == ["base", "dBase", "dXY", "dB", "dLast"])
+  # the key depends on the base module factory
+  other = mk_spl(lambda: ["other"])
+  other.fold_always_active()
+  assert(other.variant_key(conf) != key)
+
+  # guards comparing attributes are neither pruned nor folded when they can hold
+  spl = SPL(FD("R", a=Enum([1, "1", 2])), RegistryGraph(), list, analyze_guards=True)
+  spl.delta("R", name="d0")(mk("d0"))
+  spl.delta(And(Eq(Var("a"), Lit(1)), Not(Eq(Var("a"), Lit("1")))), name="d1", after="d0")(mk("d1"))
+  spl.delta(Eq(Var("a"), Lit("1")), name="d2", after="d1")(mk("d2"))
+  assert(spl.dead_deltas == set())
+  assert(spl.always_active_deltas == {"d0"})
+  assert(spl({"R": True, "a": 1}) == ["d0", "d1"])
+  assert(spl.fold_always_active() == ["d0"])
+  assert(spl({"R": True, "a": 1}) == ["d0", "d1"])
+  assert(spl({"R": True, "a": "1"}) == ["d0", "d2"])
+  assert(spl({"R": True, "a": 2}) == ["d0"])
+
+
+def test_simplify():
+  print("==========================================")
+  print("= test_simplify")
+
+  fm = FD("A", FDAnd(FD("M", FDAny(FD("C"), FD("D")))), FDXor(FD("X"), FD("Y")), size=Int(0, 10))
+  guards = {
+    "d0": And("A", "M", "C"), "d1": Or("X", "Y"), "d2": And("X", "Y"), "d3": Or("C", And("C", "D")), "d4": Not(Not("D")),
+    "d5": And("M", Gt("size", 3)), "d6": Implies("M", "C"), "d7": Iff("size", True), "d8": Implies("C", "X"),
+  }
+  expected = {
+    "d0": Var("C"), "d1": Lit(True), "d2": Lit(False), "d3": Var("C"), "d4": Var("D"),
+    "d5": Gt("size", 3), "d6": Var("C"), "d7": Iff("size", True), "d8": Implies("C", "X"),
+  }
+  spl = SPL(fm, RegistryGraph(), simplify_guards=True)
+  spl_ref = SPL(fm, RegistryGraph())
+  for name, guard in guards.items():
+    spl.delta(guard, name=name)(noop)
+    spl_ref.delta(guard, name=name)(noop)
+  for info in spl.ordering:
+    assert(str(info.guard) == str(fm.link_constraint(expected[info.name])[0]))
+  for conf in ({"C": True, "X": True, "size": 5}, {"D": True, "Y": True, "size": 1}, {"C": True, "D": True, "X": True, "size": 0}):
+    assert(sorted(info.name for info in spl.plan(conf)) == sorted(info.name for info in spl_ref.plan(conf)))
+
+  # guards comparing attributes: the simplified guards are equivalent to the original ones on every product
+  fm = FD("R", FDAny(FD("B")), a=Enum([1, "1", 2]))
+  guards = {
+    "d0": And(Eq(Var("a"), Lit(1)), Not(Eq(Var("a"), Lit("1")))), "d1": Or(Eq(Var("a"), Lit(1)), Eq(Var("a"), Lit("1"))),
+    "d2": And("B", Eq(Var("a"), Lit("1")), Not(Eq(Var("a"), Lit(1)))), "d3": Or("B", Not("B"), Eq(Var("a"), Lit(2))),
+  }
+  spl = SPL(fm, RegistryGraph(), simplify_guards=True)
+  spl_ref = SPL(fm, RegistryGraph())
+  for name, guard in guards.items():
+    spl.delta(guard, name=name)(noop)
+    spl_ref.delta(guard, name=name)(noop)
+  assert(str({info.name: info.guard for info in spl.ordering}["d3"]) == str(Lit(True)))
+  for b in (True, False):
+    for a in (1, "1", 2):
+      conf = {"R": True, "B": b, "a": a}
+      assert(sorted(info.name for info in spl.plan(conf)) == sorted(info.name for info in spl_ref.plan(conf)))
+
+
+if(__name__ == "__main__"):
+  test_guards()
+  test_conflicts()
+  test_recorded_footprints()
+  test_dead_always()
+  test_simplify()